@@ -0,0 +1,408 @@
+"""Benchmark ftp_utils transfers against a local in-process FTP server.
+
+The default ``strategies`` suite generates synthetic trees (many tiny files,
+a few huge files, deep nesting), serves them with ``LoopbackFTPServer`` and
+times walking, sizing, downloading and uploading them with the serial and
+the concurrent helpers. Every run reports files/s, MB/s and the number of
+FTP commands, i.e. round trips, counted by the server. ``--latency`` adds a
+delay per command to look like a remote server.
+
+The ``blocksize`` suite measures download MB/s of a single file for a list
+of transfer block sizes, against the local server or a given one.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from ftplib import FTP
+from pathlib import Path
+from typing import Callable
+
+import ftp_utils
+from ftp_loopback_server import LoopbackFTPServer
+
+MB = 1024 * 1024
+
+
+@contextmanager
+def local_ftp_server(root: str, latency: float = 0.0):
+    """Serve ``root`` anonymously on a loopback port."""
+    with LoopbackFTPServer(root, latency=latency) as server:
+        yield server
+
+
+def _write_random(path: Path, size: int) -> None:
+    """Write ``size`` random bytes, so compression cannot shortcut them."""
+    with open(path, "wb") as f:
+        while size > 0:
+            chunk = min(size, MB)
+            f.write(os.urandom(chunk))
+            size -= chunk
+
+
+def make_tiny_files(root: Path, scale: float) -> None:
+    """Many 1 KiB files spread over 10 folders."""
+    for i in range(max(1, int(2000 * scale))):
+        folder = root / f"dir{i % 10:02d}"
+        folder.mkdir(exist_ok=True)
+        _write_random(folder / f"file{i:05d}.bin", 1024)
+
+
+def make_huge_files(root: Path, scale: float) -> None:
+    """A few large files in a single folder."""
+    for i in range(3):
+        _write_random(root / f"huge{i}.bin", max(1, int(64 * MB * scale)))
+
+
+def make_deep_tree(root: Path, scale: float) -> None:
+    """Binary tree of folders 7 levels deep with small files in each."""
+    files_per_dir = max(1, int(2 * scale))
+
+    def fill(folder: Path, depth: int) -> None:
+        for i in range(files_per_dir):
+            _write_random(folder / f"file{i}.bin", 16 * 1024)
+        if depth:
+            for branch in ("l", "r"):
+                child = folder / branch
+                child.mkdir()
+                fill(child, depth - 1)
+
+    fill(root, 6)
+
+
+SHAPES: dict[str, Callable[[Path, float], None]] = {
+    "tiny": make_tiny_files,
+    "huge": make_huge_files,
+    "deep": make_deep_tree,
+}
+
+OPERATIONS = ("walk", "size", "download", "upload")
+
+
+@dataclass
+class BenchResult:
+    """Best timing of one operation with one strategy on one tree shape."""
+
+    shape: str
+    operation: str
+    strategy: str
+    seconds: float
+    files: int
+    nbytes: int
+    round_trips: int
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.seconds
+
+    @property
+    def mb_per_second(self) -> float | None:
+        """None for operations that move no file data."""
+        if not self.nbytes:
+            return None
+        return self.nbytes / self.seconds / 1e6
+
+    def row(self) -> str:
+        mb_per_second = self.mb_per_second
+        return (
+            f"{self.shape:<6} {self.operation:<9} {self.strategy:<11} "
+            f"{self.seconds:>8.3f} {self.files_per_second:>10.0f} "
+            f"{'-' if mb_per_second is None else f'{mb_per_second:.1f}':>8} "
+            f"{self.round_trips:>11}"
+        )
+
+
+HEADER = (
+    f"{'shape':<6} {'operation':<9} {'strategy':<11} {'seconds':>8} "
+    f"{'files/s':>10} {'MB/s':>8} {'round trips':>11}"
+)
+
+
+def _strategies(
+    operation: str, workers: int, local_tree: Path, work_dir: Path
+) -> dict[str, Callable[[ftp_utils.FTPConnectionPool], None]]:
+    """Serial and concurrent ftp_utils calls implementing ``operation``."""
+    remote_tree = "/" + local_tree.name
+    if operation == "walk":
+        return {
+            "serial": lambda pool: ftp_utils.build_remote_tree(
+                pool, remote_tree
+            ),
+            f"{workers} workers": lambda pool: (
+                ftp_utils.build_remote_tree_concurrent(
+                    pool, remote_tree, workers
+                )
+            ),
+        }
+    if operation == "size":
+        return {
+            "serial": lambda pool: ftp_utils.get_ftp_folder_size(
+                pool, remote_tree
+            ),
+            f"{workers} workers": lambda pool: ftp_utils.get_ftp_folder_size(
+                pool, remote_tree, workers=workers
+            ),
+        }
+    if operation == "download":
+        return {
+            "serial": lambda pool: ftp_utils.download_ftp_folder(
+                pool, remote_tree, str(work_dir)
+            ),
+            f"{workers} workers": lambda pool: (
+                ftp_utils.download_ftp_folder_parallel(
+                    pool, remote_tree, str(work_dir), workers
+                )
+            ),
+        }
+    if operation == "upload":
+        return {
+            "serial": lambda pool: ftp_utils.upload_ftp_folder(
+                pool, str(local_tree), "/uploaded"
+            ),
+            f"{workers} workers": lambda pool: (
+                ftp_utils.upload_ftp_folder_parallel(
+                    pool, str(local_tree), "/uploaded", workers
+                )
+            ),
+        }
+    raise ValueError(f"Unknown operation {operation}")
+
+
+def bench_strategies(
+    shapes: list[str],
+    operations: list[str],
+    workers: int,
+    scale: float,
+    latency: float,
+    repeat: int,
+) -> list[BenchResult]:
+    """
+    Time every operation with every strategy on every tree shape.
+
+    Args:
+        shapes: Names of ``SHAPES`` to generate
+        operations: Subset of ``OPERATIONS`` to time
+        workers: Number of concurrent sessions for the concurrent strategies
+        scale: Multiplier of the number or size of generated files
+        latency: Seconds the server waits before answering each command
+        repeat: Number of runs per measurement, the fastest is kept
+
+    Returns:
+        One result per shape, operation and strategy
+    """
+    results = []
+    print(HEADER)
+    for shape in shapes:
+        with tempfile.TemporaryDirectory() as tmp:
+            served = Path(tmp) / "served"
+            local_tree = served / shape
+            local_tree.mkdir(parents=True)
+            SHAPES[shape](local_tree, scale)
+            files = [p for p in local_tree.rglob("*") if p.is_file()]
+            nbytes = sum(p.stat().st_size for p in files)
+            work_dir = Path(tmp) / "work"
+
+            with local_ftp_server(str(served), latency) as server:
+                for operation in operations:
+                    moves_data = operation in ("download", "upload")
+                    strategies = _strategies(
+                        operation, workers, local_tree, work_dir
+                    )
+                    for strategy, run in strategies.items():
+                        best, round_trips = float("inf"), 0
+                        for _ in range(repeat):
+                            # Start from empty targets and fresh sessions
+                            shutil.rmtree(work_dir, ignore_errors=True)
+                            shutil.rmtree(
+                                served / "uploaded", ignore_errors=True
+                            )
+                            work_dir.mkdir()
+                            (served / "uploaded").mkdir()
+                            pool = ftp_utils.FTPConnectionPool(
+                                *server.address, max_sessions=workers
+                            )
+                            server.reset_stats()
+                            t0 = time.perf_counter()
+                            run(pool)
+                            elapsed = time.perf_counter() - t0
+                            pool.close()
+                            if elapsed < best:
+                                best = elapsed
+                                round_trips = server.reset_stats().get(
+                                    "commands", 0
+                                )
+                        result = BenchResult(
+                            shape,
+                            operation,
+                            strategy,
+                            best,
+                            len(files),
+                            nbytes if moves_data else 0,
+                            round_trips,
+                        )
+                        print(result.row(), flush=True)
+                        results.append(result)
+    return results
+
+
+def bench_blocksize(
+    host: str,
+    port: int,
+    user: str,
+    password: str,
+    remote_file: str,
+    blocksizes: list[int],
+    repeat: int,
+    with_progress: bool,
+) -> None:
+    """Download ``remote_file`` with every block size and print MB/s."""
+    ftp = FTP()
+    ftp.connect(host, port)
+    ftp.login(user, password)
+    ftp.voidcmd("TYPE I")
+    size = ftp.size(remote_file)
+    progress = (lambda event: None) if with_progress else None
+
+    print(f"{remote_file}: {size / 1e6:.1f} MB, best of {repeat}")
+    print(f"{'blocksize':>10} {'MB/s':>10}")
+    with tempfile.TemporaryDirectory() as out:
+        local_file = Path(out) / Path(remote_file).name
+        for blocksize in blocksizes:
+            best = float("inf")
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                ftp_utils.download_ftp_file(
+                    ftp,
+                    remote_file,
+                    local_file,
+                    progress_callback=(
+                        ftp_utils.ProgressAggregator(progress, size)
+                        if progress
+                        else None
+                    ),
+                    file_size=size,
+                    blocksize=blocksize,
+                )
+                best = min(best, time.perf_counter() - t0)
+            print(f"{blocksize:>10} {size / best / 1e6:>10.1f}")
+    ftp.quit()
+
+
+def _comma_list(choices):
+    def parse(value: str) -> list[str]:
+        items = [item for item in value.split(",") if item]
+        unknown = set(items) - set(choices)
+        if unknown:
+            raise argparse.ArgumentTypeError(
+                f"unknown {', '.join(sorted(unknown))}, "
+                f"choose from {', '.join(choices)}"
+            )
+        return items
+
+    return parse
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--suite", choices=("strategies", "blocksize"), default="strategies"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="local server delay per command in milliseconds",
+    )
+
+    strategies = parser.add_argument_group("strategies suite")
+    strategies.add_argument(
+        "--shapes",
+        type=_comma_list(tuple(SHAPES)),
+        default=list(SHAPES),
+        help=f"comma separated tree shapes, from {', '.join(SHAPES)}",
+    )
+    strategies.add_argument(
+        "--operations",
+        type=_comma_list(OPERATIONS),
+        default=list(OPERATIONS),
+        help=f"comma separated operations, from {', '.join(OPERATIONS)}",
+    )
+    strategies.add_argument("--workers", type=int, default=4)
+    strategies.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="multiplier of the number or size of generated files",
+    )
+
+    blocksize = parser.add_argument_group("blocksize suite")
+    blocksize.add_argument(
+        "--host", help="FTP server, the local server if omitted"
+    )
+    blocksize.add_argument("--port", type=int, default=21)
+    blocksize.add_argument("--user", default="anonymous")
+    blocksize.add_argument("--password", default="")
+    blocksize.add_argument(
+        "--remote-file",
+        help="file to download, required with --host; a generated one on "
+        "the local server",
+    )
+    blocksize.add_argument(
+        "--size", type=int, default=256, help="generated file size in MB"
+    )
+    blocksize.add_argument(
+        "--blocksizes",
+        type=lambda s: [int(b) for b in s.split(",")],
+        default=[8192, 65536, 262144, 1048576],
+        help="comma separated block sizes in bytes",
+    )
+    blocksize.add_argument(
+        "--progress",
+        action="store_true",
+        help="attach a ProgressAggregator as in a real transfer",
+    )
+    args = parser.parse_args()
+    if args.suite == "blocksize" and args.host and not args.remote_file:
+        parser.error("--remote-file is required with --host")
+
+    if args.suite == "strategies":
+        bench_strategies(
+            args.shapes,
+            args.operations,
+            args.workers,
+            args.scale,
+            args.latency / 1000,
+            args.repeat,
+        )
+    elif args.host:
+        bench_blocksize(
+            args.host,
+            args.port,
+            args.user,
+            args.password,
+            args.remote_file,
+            args.blocksizes,
+            args.repeat,
+            args.progress,
+        )
+    else:
+        with tempfile.TemporaryDirectory() as root:
+            _write_random(Path(root) / "bench.bin", args.size * MB)
+            with local_ftp_server(root, args.latency / 1000) as server:
+                bench_blocksize(
+                    *server.address,
+                    "anonymous",
+                    "",
+                    "bench.bin",
+                    args.blocksizes,
+                    args.repeat,
+                    args.progress,
+                )
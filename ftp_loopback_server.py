@@ -0,0 +1,469 @@
+"""In-process FTP server stand-in on loopback for benchmarking ftp_utils."""
+
+import hashlib
+import logging
+import socket
+import socketserver
+import threading
+import time
+import zlib
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# HASH algorithm names mapped to hashlib names
+_HASH_ALGORITHMS = {
+    "SHA-1": "sha1",
+    "SHA-256": "sha256",
+    "SHA-512": "sha512",
+    "MD5": "md5",
+}
+
+
+def _file_digest(path: Path, algorithm: str) -> str:
+    """Hex digest of a file for the HASH and X* commands."""
+    if algorithm == "CRC32":
+        crc = 0
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                crc = zlib.crc32(chunk, crc)
+        return format(crc, "08x")
+    digest = hashlib.new(_HASH_ALGORITHMS[algorithm])
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _FTPHandler(socketserver.StreamRequestHandler):
+    """
+    One control connection, serving the subset of RFC 959 and extensions
+    used by ftp_utils.
+
+    Only passive data connections are supported. Every command is counted
+    in the server's ``stats`` so benchmarks can report round trips.
+    """
+
+    def setup(self) -> None:
+        super().setup()
+        # Replies are small writes, without this the second of two replies
+        # waits for the delayed ACK of the first (about 40 ms on Linux)
+        self.connection.setsockopt(
+            socket.IPPROTO_TCP, socket.TCP_NODELAY, 1
+        )
+        self.cwd = "/"
+        self.rest = 0
+        self.pasv: socket.socket | None = None
+        self.mode_z = False
+        self.type = "A"
+        self.hash_algorithm = "SHA-256"
+
+    def finish(self) -> None:
+        if self.pasv is not None:
+            self.pasv.close()
+        super().finish()
+
+    def reply(self, line: str) -> None:
+        """Send a reply line on the control connection."""
+        self.wfile.write((line + "\r\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def resolve(self, path: str) -> tuple[Path, str]:
+        """Map a client path to a local path and a normalised virtual path."""
+        if not path:
+            path = self.cwd
+        if not path.startswith("/"):
+            path = self.cwd.rstrip("/") + "/" + path
+        parts: list[str] = []
+        for part in path.split("/"):
+            if part in ("", "."):
+                continue
+            if part == "..":
+                if parts:
+                    parts.pop()
+                continue
+            parts.append(part)
+        return self.server.root.joinpath(*parts), "/" + "/".join(parts)
+
+    def open_data(self) -> socket.socket | None:
+        """Accept the data connection announced by the last PASV/EPSV."""
+        if self.pasv is None:
+            self.reply("425 Use PASV or EPSV first")
+            return None
+        conn, _ = self.pasv.accept()
+        self.pasv.close()
+        self.pasv = None
+        return conn
+
+    def handle(self) -> None:
+        self.reply("220 Loopback FTP server ready")
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                break
+            line = raw.decode("utf-8").rstrip("\r\n")
+            command, _, arg = line.partition(" ")
+            command = command.upper()
+            self.server.count("commands")
+            self.server.count(command)
+            if self.server.latency:
+                # Emulate the round trip time of a remote server
+                time.sleep(self.server.latency)
+            handler = getattr(self, "do_" + command, None)
+            if handler is None or command in self.server.disabled:
+                self.reply("502 Command not implemented")
+                continue
+            try:
+                if handler(arg) is False:
+                    break
+            except (OSError, ValueError) as e:
+                self.reply(f"550 {e}")
+
+    def do_USER(self, arg: str) -> None:
+        self.reply("331 Password required")
+
+    def do_PASS(self, arg: str) -> None:
+        self.reply("230 Logged in")
+
+    def do_QUIT(self, arg: str) -> bool:
+        self.reply("221 Goodbye")
+        return False
+
+    def do_NOOP(self, arg: str) -> None:
+        self.reply("200 OK")
+
+    def do_TYPE(self, arg: str) -> None:
+        self.type = arg.split()[0].upper() if arg else "A"
+        self.reply("200 Type set")
+
+    def binary_only(self, command: str) -> bool:
+        """Refuse ``command`` in ASCII type on a ``strict_type`` server."""
+        if self.server.strict_type and self.type == "A":
+            self.reply(f"550 {command} not allowed in ASCII mode")
+            return False
+        return True
+
+    def do_SYST(self, arg: str) -> None:
+        self.reply("215 UNIX Type: L8")
+
+    def do_FEAT(self, arg: str) -> None:
+        features = ["MDTM", "SIZE", "REST STREAM", "UTF8"]
+        if "MLSD" not in self.server.disabled:
+            features.append("MLST type*;size*;modify*;")
+        if self.server.mode_z:
+            features.append("MODE Z")
+        if "HASH" not in self.server.disabled:
+            features.append("HASH SHA-256*;SHA-1;SHA-512;MD5;CRC32")
+        lines = ["211-Features:"] + [f" {f}" for f in features]
+        self.wfile.write("".join(l + "\r\n" for l in lines).encode("utf-8"))
+        self.reply("211 End")
+
+    def do_OPTS(self, arg: str) -> None:
+        option, _, value = arg.partition(" ")
+        if option.upper() == "HASH" and value:
+            value = value.upper()
+            if value != "CRC32" and value not in _HASH_ALGORITHMS:
+                self.reply("501 Unknown algorithm")
+                return
+            self.hash_algorithm = value
+        self.reply("200 OK")
+
+    def do_MODE(self, arg: str) -> None:
+        if arg.upper() == "Z" and self.server.mode_z:
+            self.mode_z = True
+            self.reply("200 MODE Z ok")
+        elif arg.upper() == "S":
+            self.mode_z = False
+            self.reply("200 MODE S ok")
+        else:
+            self.reply("504 Mode not supported")
+
+    def do_PWD(self, arg: str) -> None:
+        self.reply(f'257 "{self.cwd}" is the current directory')
+
+    def do_CWD(self, arg: str) -> None:
+        path, virtual = self.resolve(arg)
+        if not path.is_dir():
+            self.reply("550 Not a directory")
+        else:
+            self.cwd = virtual
+            self.reply("250 OK")
+
+    def do_CDUP(self, arg: str) -> None:
+        self.do_CWD("..")
+
+    def do_MKD(self, arg: str) -> None:
+        path, virtual = self.resolve(arg)
+        if path.exists():
+            self.reply("550 File exists")
+        else:
+            path.mkdir()
+            self.reply(f'257 "{virtual}" created')
+
+    def do_DELE(self, arg: str) -> None:
+        path, _ = self.resolve(arg)
+        path.unlink()
+        self.reply("250 Deleted")
+
+    def do_SIZE(self, arg: str) -> None:
+        path, _ = self.resolve(arg)
+        if not self.binary_only("SIZE"):
+            return
+        if not path.is_file():
+            self.reply("550 Not a regular file")
+        else:
+            self.reply(f"213 {path.stat().st_size}")
+
+    def do_MDTM(self, arg: str) -> None:
+        path, _ = self.resolve(arg)
+        if not path.exists():
+            self.reply("550 No such file")
+        else:
+            mtime = time.gmtime(path.stat().st_mtime)
+            self.reply("213 " + time.strftime("%Y%m%d%H%M%S", mtime))
+
+    def do_REST(self, arg: str) -> None:
+        if not self.binary_only("REST"):
+            return
+        self.rest = int(arg)
+        self.reply(f"350 Restarting at {self.rest}")
+
+    def _listen(self) -> int:
+        if self.pasv is not None:
+            self.pasv.close()
+        self.pasv = socket.socket()
+        self.pasv.bind(("127.0.0.1", 0))
+        self.pasv.listen(1)
+        return self.pasv.getsockname()[1]
+
+    def do_PASV(self, arg: str) -> None:
+        port = self._listen()
+        self.reply(
+            "227 Entering Passive Mode "
+            f"(127,0,0,1,{port >> 8},{port & 0xFF})"
+        )
+
+    def do_EPSV(self, arg: str) -> None:
+        port = self._listen()
+        self.reply(f"229 Entering Extended Passive Mode (|||{port}|)")
+
+    def _send_lines(self, lines: list[str]) -> None:
+        conn = self.open_data()
+        if conn is None:
+            return
+        self.reply("150 Here comes the listing")
+        with conn:
+            data = "".join(line + "\r\n" for line in lines)
+            conn.sendall(data.encode("utf-8"))
+        self.reply("226 Transfer complete")
+
+    def do_MLSD(self, arg: str) -> None:
+        path, _ = self.resolve(arg)
+        if not path.is_dir():
+            self.reply("550 Not a directory")
+            return
+        lines = []
+        for child in sorted(path.iterdir()):
+            st = child.stat()
+            kind = "dir" if child.is_dir() else "file"
+            modify = time.strftime("%Y%m%d%H%M%S", time.gmtime(st.st_mtime))
+            lines.append(
+                f"type={kind};size={st.st_size};modify={modify}; {child.name}"
+            )
+        self._send_lines(lines)
+
+    def do_NLST(self, arg: str) -> None:
+        path, _ = self.resolve(arg)
+        if not path.is_dir():
+            self.reply("550 Not a directory")
+            return
+        self._send_lines([child.name for child in sorted(path.iterdir())])
+
+    def do_LIST(self, arg: str) -> None:
+        path, _ = self.resolve(arg)
+        if not path.is_dir():
+            self.reply("550 Not a directory")
+            return
+        lines = []
+        for child in sorted(path.iterdir()):
+            st = child.stat()
+            mtime = time.gmtime(st.st_mtime)
+            if self.server.list_style == "windows":
+                stamp = time.strftime("%m-%d-%y  %I:%M%p", mtime)
+                size = "<DIR>" if child.is_dir() else str(st.st_size)
+                lines.append(f"{stamp} {size:>14} {child.name}")
+            else:
+                stamp = time.strftime("%b %d %H:%M", mtime)
+                perm = "drwxr-xr-x" if child.is_dir() else "-rw-r--r--"
+                lines.append(
+                    f"{perm}   1 owner    group {st.st_size:>12} "
+                    f"{stamp} {child.name}"
+                )
+        self._send_lines(lines)
+
+    def do_RETR(self, arg: str) -> None:
+        path, _ = self.resolve(arg)
+        if not path.is_file():
+            self.reply("550 No such file")
+            return
+        conn = self.open_data()
+        if conn is None:
+            return
+        self.reply("150 Opening data connection")
+        compressor = zlib.compressobj() if self.mode_z else None
+        try:
+            with conn, open(path, "rb") as f:
+                f.seek(self.rest)
+                self.rest = 0
+                for chunk in iter(lambda: f.read(256 * 1024), b""):
+                    if compressor is not None:
+                        chunk = compressor.compress(chunk)
+                    conn.sendall(chunk)
+                    self.server.count("bytes_sent", len(chunk))
+                if compressor is not None:
+                    conn.sendall(compressor.flush())
+        except OSError:
+            # The client closed the data connection early
+            self.reply("426 Connection closed; transfer aborted")
+            return
+        self.reply("226 Transfer complete")
+
+    def _store(self, arg: str, append: bool) -> None:
+        path, _ = self.resolve(arg)
+        conn = self.open_data()
+        if conn is None:
+            return
+        self.reply("150 Ok to send data")
+        decompressor = zlib.decompressobj() if self.mode_z else None
+        if append:
+            mode = "ab"
+        elif self.rest and path.exists():
+            mode = "r+b"
+        else:
+            mode = "wb"
+        with conn, open(path, mode) as f:
+            if self.rest and not append:
+                f.seek(self.rest)
+                f.truncate()
+            self.rest = 0
+            for chunk in iter(lambda: conn.recv(256 * 1024), b""):
+                self.server.count("bytes_received", len(chunk))
+                if decompressor is not None:
+                    chunk = decompressor.decompress(chunk)
+                f.write(chunk)
+            if decompressor is not None:
+                f.write(decompressor.flush())
+        self.reply("226 Transfer complete")
+
+    def do_STOR(self, arg: str) -> None:
+        self._store(arg, append=False)
+
+    def do_APPE(self, arg: str) -> None:
+        self._store(arg, append=True)
+
+    def do_ABOR(self, arg: str) -> None:
+        self.reply("226 Abort successful")
+
+    def do_HASH(self, arg: str) -> None:
+        path, _ = self.resolve(arg)
+        if not path.is_file():
+            self.reply("550 No such file")
+            return
+        digest = _file_digest(path, self.hash_algorithm)
+        size = path.stat().st_size
+        self.reply(f"213 {self.hash_algorithm} 0-{size} {digest} {arg}")
+
+    def _x_hash(self, arg: str, algorithm: str) -> None:
+        path, _ = self.resolve(arg)
+        if not path.is_file():
+            self.reply("550 No such file")
+            return
+        self.reply(f"250 {_file_digest(path, algorithm).upper()}")
+
+    def do_XMD5(self, arg: str) -> None:
+        self._x_hash(arg, "MD5")
+
+    def do_XCRC(self, arg: str) -> None:
+        self._x_hash(arg, "CRC32")
+
+    def do_XSHA1(self, arg: str) -> None:
+        self._x_hash(arg, "SHA-1")
+
+    def do_XSHA256(self, arg: str) -> None:
+        self._x_hash(arg, "SHA-256")
+
+
+class LoopbackFTPServer(socketserver.ThreadingTCPServer):
+    """
+    Anonymous FTP server serving a local folder on a loopback port.
+
+    Meant for benchmarks and local experiments, not for real use: there is
+    no authentication and no active mode. Used as a context manager it
+    serves from a background thread::
+
+        with LoopbackFTPServer(root, latency=0.005) as server:
+            ftp = FTP()
+            ftp.connect(*server.address)
+            ftp.login()
+
+    Args:
+        root: Folder served as ``/``
+        disabled: Commands answered with 502, e.g. ``("MLSD",)`` to exercise
+            the LIST fallback
+        list_style: ``"unix"`` or ``"windows"`` LIST output
+        mode_z: Accept ``MODE Z`` and advertise it in FEAT
+        latency: Seconds slept before answering each command
+        strict_type: Refuse SIZE and REST in ASCII type, the type a session
+            starts in, as vsftpd and ProFTPD do
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        root: str | Path,
+        disabled: tuple[str, ...] = (),
+        list_style: str = "unix",
+        mode_z: bool = False,
+        latency: float = 0.0,
+        strict_type: bool = False,
+    ):
+        super().__init__(("127.0.0.1", 0), _FTPHandler)
+        self.root = Path(root)
+        self.disabled = {command.upper() for command in disabled}
+        self.list_style = list_style
+        self.mode_z = mode_z
+        self.latency = latency
+        self.strict_type = strict_type
+        self.stats: dict[str, int] = {}
+        self._stats_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def address(self) -> tuple[str, int]:
+        """Host and port to connect to."""
+        return self.server_address[0], self.server_address[1]
+
+    def count(self, key: str, n: int = 1) -> None:
+        """Add ``n`` to the ``key`` counter of ``stats``."""
+        with self._stats_lock:
+            self.stats[key] = self.stats.get(key, 0) + n
+
+    def reset_stats(self) -> dict[str, int]:
+        """Return the counters collected so far and start from zero."""
+        with self._stats_lock:
+            stats, self.stats = self.stats, {}
+        return stats
+
+    def __enter__(self) -> "LoopbackFTPServer":
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="loopback-ftpd", daemon=True
+        )
+        self._thread.start()
+        logger.debug("Serving %s on %s:%d", self.root, *self.address)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+        self.server_close()
@@ -1,33 +1,115 @@
 """Module providing helper functions for FTP operations."""
 
+import asyncio
+import fnmatch
+import functools
+import hashlib
+import json
 import logging
-from ftplib import FTP, error_perm, error_temp
-from pathlib import Path
+import os
+import queue
+import re
+import threading
+import time
+import weakref
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone, tzinfo
+from ftplib import (
+    FTP,
+    FTP_TLS,
+    all_errors,
+    error_perm,
+    error_proto,
+    error_reply,
+    error_temp,
+)
+from pathlib import Path, PurePosixPath
+from typing import Callable, Iterator
 
 logger = logging.getLogger(__name__)
 
+# MLSD capability per connection, so it is probed once and not per directory
+_mlsd_support: "weakref.WeakKeyDictionary[FTP, bool]" = (
+    weakref.WeakKeyDictionary()
+)
+
 
 def is_mlsd_supported(ftp: FTP) -> bool:
     """
     Check if the FTP server supports the MLSD command.
 
+    The result is cached per connection, so only the first call sends a
+    command to the server.
+
     Args:
         ftp: FTP connection
 
     Returns:
         bool: True if MLSD is supported, False otherwise
     """
+    supported = _mlsd_support.get(ftp)
+    if supported is not None:
+        return supported
+
+    _set_transfer_mode(ftp, "S")
     try:
         # Try to execute MLSD on the current directory
         # We only need to see if it executes without error
         list(ftp.mlsd(".", facts=["type"]))
-        return True
+        supported = True
     except (error_perm, error_temp) as e:
         logger.debug("MLSD not supported: %s", e)
-        return False
+        supported = False
     except Exception as e:  # pylint: disable=broad-except
         logger.debug("Unexpected error when testing MLSD support: %s", e)
+        supported = False
+
+    _mlsd_support[ftp] = supported
+    return supported
+
+
+# Data channel mode per connection, stream ("S") unless MODE Z was sent
+_transfer_mode: "weakref.WeakKeyDictionary[FTP, str]" = (
+    weakref.WeakKeyDictionary()
+)
+
+# Connections whose server refused MODE Z, so it is only asked once
+_mode_z_refused: "weakref.WeakSet[FTP]" = weakref.WeakSet()
+
+
+def _set_transfer_mode(ftp: FTP, mode: str) -> bool:
+    """
+    Switch the data channel to deflate (``"Z"``) or stream (``"S"``) mode.
+
+    The mode stays set on the connection for every later data command, so
+    MODE is only sent when it changes. Compressed file transfers switch to
+    ``"Z"``, everything else in this module reading a data connection
+    (listings, ranged and relayed transfers) switches back to ``"S"`` first.
+
+    Args:
+        ftp: FTP connection
+        mode: ``"Z"`` or ``"S"``
+
+    Returns:
+        bool: False if the server does not support MODE Z, True otherwise
+    """
+    if _transfer_mode.get(ftp, "S") == mode:
+        return True
+    if mode == "Z" and ftp in _mode_z_refused:
         return False
+    try:
+        ftp.voidcmd(f"MODE {mode}")
+    except error_perm as e:
+        if mode != "Z":
+            raise
+        logger.info("MODE Z not supported, using stream mode: %s", e)
+        _mode_z_refused.add(ftp)
+        return False
+    _transfer_mode[ftp] = mode
+    return True
 
 
 def is_remote_folder(ftp: FTP, name: str) -> bool:
@@ -41,6 +123,7 @@ def is_remote_folder(ftp: FTP, name: str) -> bool:
     Returns:
         bool: True if path is a folder, False if file
     """
+    _set_transfer_mode(ftp, "S")
     try:
         # Try using MLSD command first (RFC 3659)
         for item, facts in ftp.mlsd(path="", facts=["type"]):
@@ -77,34 +160,730 @@ def is_remote_folder(ftp: FTP, name: str) -> bool:
     return False
 
 
-def get_ftp_folder_size(ftp: FTP, remote_path: str) -> int:
+class FTPConnectionPool:
     """
-    Recursively calculate total size of an FTP folder including subdirectories.
+    Pool of logged-in FTP sessions to one server.
+
+    Sessions are handed out by ``session()`` (or ``acquire``/``release``),
+    health-checked with NOOP when they have been idle for more than
+    ``check_after`` seconds and transparently replaced when the check fails.
+    At most ``max_sessions`` sessions are checked out at the same time.
+    With ``keepalive_interval`` set, a background thread also sends NOOP on
+    idle sessions so the server's idle timeout does not close them.
+
+    The pool can be passed wherever the ``download_*``/``upload_*`` helpers
+    take an FTP connection or an FTP factory.
+
+    Args:
+        host: Server host name
+        port: Server port
+        user: Login user name
+        passwd: Login password
+        acct: Login account
+        timeout: Socket timeout in seconds for new connections
+        max_sessions: Maximum number of sessions checked out concurrently
+        check_after: Idle seconds after which a session is checked with NOOP
+        keepalive_interval: Seconds between keepalive NOOPs, None to disable
+        ftp_class: FTP class to instantiate, e.g. ``ftplib.FTP_TLS``
+        acquire_timeout: Seconds the helpers wait for a free session before
+            raising TimeoutError, None to wait forever
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 21,
+        user: str = "",
+        passwd: str = "",
+        acct: str = "",
+        timeout: float | None = None,
+        max_sessions: int = 4,
+        check_after: float = 15.0,
+        keepalive_interval: float | None = None,
+        ftp_class: type[FTP] = FTP,
+        acquire_timeout: float | None = 600.0,
+    ):
+        if max_sessions < 1:
+            raise ValueError(
+                f"max_sessions must be at least 1, got {max_sessions}"
+            )
+        self.host = host
+        self.port = port
+        self.user = user
+        self.passwd = passwd
+        self.acct = acct
+        self.timeout = timeout
+        self.max_sessions = max_sessions
+        self.check_after = check_after
+        self.ftp_class = ftp_class
+        self.acquire_timeout = acquire_timeout
+        # Idle sessions with the monotonic time they were last known good
+        self._idle: list[tuple[FTP, float]] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_sessions)
+        self._closed = threading.Event()
+        self._keepalive = None
+        if keepalive_interval:
+            self._keepalive = threading.Thread(
+                target=self._keepalive_loop,
+                args=(keepalive_interval,),
+                name=f"ftp-keepalive-{host}",
+                daemon=True,
+            )
+            self._keepalive.start()
+
+    def __call__(self) -> FTP:
+        """Check out a session, so the pool can serve as an FTP factory."""
+        return self.acquire(self.acquire_timeout)
+
+    def __enter__(self) -> "FTPConnectionPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def connect(self) -> FTP:
+        """Open and log in a new session, bypassing the pool."""
+        logger.debug("Connecting to FTP server %s:%s", self.host, self.port)
+        if self.timeout is None:
+            ftp = self.ftp_class()
+        else:
+            ftp = self.ftp_class(timeout=self.timeout)
+        try:
+            ftp.connect(self.host, self.port)
+            ftp.login(self.user, self.passwd, self.acct)
+            if isinstance(ftp, FTP_TLS):
+                ftp.prot_p()
+        except BaseException:
+            ftp.close()
+            raise
+        return ftp
+
+    @staticmethod
+    def _is_alive(ftp: FTP) -> bool:
+        """Check a session with NOOP."""
+        try:
+            ftp.voidcmd("NOOP")
+            return True
+        except all_errors as e:
+            logger.debug("FTP session failed health check: %s", e)
+            return False
+
+    @staticmethod
+    def _quit(ftp: FTP) -> None:
+        """Log out of a session, closing it if the server does not answer."""
+        try:
+            ftp.quit()
+        except all_errors:
+            ftp.close()
+
+    def acquire(self, timeout: float | None = None) -> FTP:
+        """
+        Check out a logged-in session, waiting for a free slot if needed.
+
+        Args:
+            timeout: Seconds to wait for a free slot, None to wait forever
+
+        Returns:
+            FTP: Healthy session, to be handed back with ``release``
+
+        Raises:
+            TimeoutError: If no slot became free within ``timeout``
+        """
+        if self._closed.is_set():
+            raise RuntimeError("FTP connection pool is closed")
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(
+                f"No free FTP session to {self.host}:{self.port} "
+                f"after {timeout} s"
+            )
+        try:
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        break
+                    ftp, last_used = self._idle.pop()
+                if time.monotonic() - last_used < self.check_after:
+                    return ftp
+                if self._is_alive(ftp):
+                    return ftp
+                ftp.close()
+            return self.connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(
+        self, ftp: FTP, discard: bool = False, check: bool = False
+    ) -> None:
+        """
+        Hand a session back to the pool.
+
+        Args:
+            ftp: Session obtained from ``acquire``
+            discard: Close the session instead of keeping it for reuse
+            check: Health-check the session before it is handed out again
+        """
+        try:
+            if not discard and _transfer_mode.get(ftp, "S") != "S":
+                # Hand sessions out in the default stream mode
+                try:
+                    _set_transfer_mode(ftp, "S")
+                except all_errors:
+                    discard = True
+            last_used = float("-inf") if check else time.monotonic()
+            if discard or not self._requeue(ftp, last_used):
+                self._quit(ftp)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def session(self, timeout: float | None = None) -> Iterator[FTP]:
+        """
+        Context manager checking out a session for the duration of a block.
+
+        A session that raised a connection error is closed. After any other
+        error it is kept but health-checked before the next checkout.
+        """
+        ftp = self.acquire(timeout)
+        try:
+            yield ftp
+        except (OSError, EOFError):
+            self.release(ftp, discard=True)
+            raise
+        except BaseException:
+            self.release(ftp, check=True)
+            raise
+        else:
+            self.release(ftp)
+
+    def _keepalive_loop(self, interval: float) -> None:
+        """Send NOOP on sessions that have been idle for ``interval``."""
+        while not self._closed.wait(interval):
+            with self._lock:
+                now = time.monotonic()
+                stale = [s for s in self._idle if now - s[1] >= interval]
+                self._idle = [s for s in self._idle if now - s[1] < interval]
+            for ftp, _ in stale:
+                if not self._is_alive(ftp):
+                    ftp.close()
+                elif not self._requeue(ftp, time.monotonic()):
+                    self._quit(ftp)
+
+    def _requeue(self, ftp: FTP, last_used: float) -> bool:
+        """
+        Put a session back on the idle list unless the pool is closed.
+
+        ``close`` sets the closed flag before draining the idle list under
+        the lock, so a session requeued here is never left behind.
+
+        Returns:
+            bool: Whether the session was requeued
+        """
+        with self._lock:
+            if self._closed.is_set():
+                return False
+            self._idle.append((ftp, last_used))
+            return True
+
+    def close(self) -> None:
+        """Log out of all idle sessions and stop the keepalive thread."""
+        self._closed.set()
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for ftp, _ in idle:
+            self._quit(ftp)
+
+
+@contextmanager
+def _ftp_session(ftp: FTP | FTPConnectionPool) -> Iterator[FTP]:
+    """Yield ``ftp`` itself, or a session checked out of a pool."""
+    if isinstance(ftp, FTPConnectionPool):
+        with ftp.session(ftp.acquire_timeout) as session:
+            yield session
+    else:
+        yield ftp
+
+
+def _server_location(ftp: FTP | FTPConnectionPool) -> str:
+    """Describe the server and working directory for error messages."""
+    with _ftp_session(ftp) as session:
+        return f"{session.host}:{session.port}/{session.pwd()}"
+
+
+def _accepts_pool(func):
+    """Let a helper taking an FTP connection also take a connection pool."""
+
+    @functools.wraps(func)
+    def wrapper(ftp, *args, **kwargs):
+        with _ftp_session(ftp) as session:
+            return func(session, *args, **kwargs)
+
+    return wrapper
+
+
+@dataclass(frozen=True)
+class RemoteEntry:
+    """
+    A file or directory recorded in a ``RemoteTree`` snapshot.
+
+    ``modify`` is in UTC when it comes from MLSD, and in the server's local
+    time, ``modify_utc`` being False, when it was parsed from LIST output.
+    """
+
+    path: str
+    type: str
+    size: int | None = None
+    modify: str | None = None
+    modify_utc: bool = True
+
+    @property
+    def is_dir(self) -> bool:
+        """True if the entry is a directory."""
+        return self.type == "dir"
+
+
+@dataclass
+class RemoteTree:
+    """
+    Snapshot of a remote file or folder built by a single listing walk.
+
+    Sizing, type checks and download plans are all answered from the
+    snapshot without further round trips to the server.
+
+    Attributes:
+        root: Entry for the remote path the snapshot was built from
+        entries: Every file and directory below the root, parents first
+    """
+
+    root: RemoteEntry
+    entries: list[RemoteEntry] = field(default_factory=list)
+
+    @property
+    def is_dir(self) -> bool:
+        """True if the snapshot root is a directory."""
+        return self.root.is_dir
+
+    @property
+    def total_size(self) -> int:
+        """Total size in bytes of all files in the snapshot."""
+        if not self.is_dir:
+            return self.root.size or 0
+        return sum(entry.size or 0 for entry in self.files())
+
+    def files(self) -> Iterator[RemoteEntry]:
+        """Iterate over the file entries below the root."""
+        return (entry for entry in self.entries if not entry.is_dir)
+
+    def dirs(self) -> Iterator[RemoteEntry]:
+        """Iterate over the directory entries below the root."""
+        return (entry for entry in self.entries if entry.is_dir)
+
+    def relative_path(self, entry: RemoteEntry) -> str:
+        """Return ``entry.path`` relative to the snapshot root."""
+        return str(PurePosixPath(entry.path).relative_to(self.root.path))
+
+    def download_plan(
+        self, local_base_path: str
+    ) -> tuple[list[Path], list[tuple[RemoteEntry, Path]]]:
+        """
+        Map the snapshot onto a local folder.
+
+        Args:
+            local_base_path: Base path where the root folder is created
+
+        Returns:
+            Local directories to create (parents first) and
+            (remote file entry, local file path) pairs to download
+        """
+        local_path = Path(local_base_path) / PurePosixPath(self.root.path).name
+        if not self.is_dir:
+            return [], [(self.root, local_path)]
+
+        local_dirs = [local_path]
+        local_files = []
+        for entry in self.entries:
+            target = local_path / self.relative_path(entry)
+            if entry.is_dir:
+                local_dirs.append(target)
+            else:
+                local_files.append((entry, target))
+        return local_dirs, local_files
+
+
+def _join_remote(remote_path: str, name: str) -> str:
+    """Join a remote folder path and an entry name."""
+    return f"{remote_path.rstrip('/')}/{name}" if remote_path else name
+
+
+def _parse_modify(
+    modify: str | None, tz: tzinfo = timezone.utc
+) -> datetime | None:
+    """Parse a ``modify`` fact (YYYYMMDDHHMMSS[.sss]) given in ``tz``."""
+    if not modify:
+        return None
+    try:
+        return datetime.strptime(modify[:14], "%Y%m%d%H%M%S").replace(
+            tzinfo=tz
+        )
+    except ValueError:
+        return None
+
+
+@dataclass(frozen=True)
+class RemoteFilter:
+    """
+    Selection of remote files applied while a remote tree is walked.
+
+    Patterns are ``fnmatch`` globs matched against the entry name, or
+    against its path relative to the walked folder when they contain a
+    ``/``. A directory matching ``exclude`` is pruned with everything below
+    it and never listed. A file is selected when it matches one of
+    ``include`` (any file if empty), none of ``exclude`` and the size and
+    modification time bounds. Files whose size or modification time the
+    server did not report pass the corresponding bounds.
+
+    Naive datetimes are taken as local time. Servers without MLSD only give
+    modification times in LIST output, in their own local time and to the
+    minute (to the day for files older than six months). Those times are
+    read in ``server_tz``, or as UTC if it is not set, so time bounds are
+    then only as accurate as the server's UTC offset.
+
+    Attributes:
+        include: Globs a file must match one of
+        exclude: Globs of files and directories to leave out
+        min_size: Smallest selected file size in bytes
+        max_size: Largest selected file size in bytes
+        newer_than: Only files modified at or after this time
+        older_than: Only files modified before this time
+        server_tz: Time zone of the server's LIST output, e.g.
+            ``zoneinfo.ZoneInfo("Europe/Paris")``
+    """
+
+    include: tuple[str, ...] = ()
+    exclude: tuple[str, ...] = ()
+    min_size: int | None = None
+    max_size: int | None = None
+    newer_than: datetime | None = None
+    older_than: datetime | None = None
+    server_tz: tzinfo | None = None
+
+    @staticmethod
+    def _matches(patterns: tuple[str, ...], rel_path: str) -> bool:
+        name = rel_path.rsplit("/", 1)[-1]
+        return any(
+            fnmatch.fnmatchcase(rel_path if "/" in pattern else name, pattern)
+            for pattern in patterns
+        )
+
+    def prunes(self, rel_path: str) -> bool:
+        """True if the directory at ``rel_path`` is excluded."""
+        return self._matches(self.exclude, rel_path)
+
+    def selects(self, entry: RemoteEntry, rel_path: str) -> bool:
+        """True if the file ``entry`` at ``rel_path`` is selected."""
+        if self.include and not self._matches(self.include, rel_path):
+            return False
+        if self._matches(self.exclude, rel_path):
+            return False
+        if entry.size is not None:
+            if self.min_size is not None and entry.size < self.min_size:
+                return False
+            if self.max_size is not None and entry.size > self.max_size:
+                return False
+        if self.newer_than is not None or self.older_than is not None:
+            tz = timezone.utc
+            if not entry.modify_utc and self.server_tz is not None:
+                tz = self.server_tz
+            modified = _parse_modify(entry.modify, tz)
+            if modified is not None:
+                if self.newer_than is not None:
+                    if modified < self.newer_than.astimezone(timezone.utc):
+                        return False
+                if self.older_than is not None:
+                    if modified >= self.older_than.astimezone(timezone.utc):
+                        return False
+        return True
+
+    def apply(
+        self, remote_path: str, entries: list[RemoteEntry]
+    ) -> list[RemoteEntry]:
+        """
+        Keep the entries of one listing that are selected or not pruned.
+
+        Args:
+            remote_path: Folder the walk started from
+            entries: Entries listed in one directory below ``remote_path``
+
+        Returns:
+            Selected files and directories still to be walked
+        """
+        prefix = len(_join_remote(remote_path, ""))
+        return [
+            entry
+            for entry in entries
+            if (
+                not self.prunes(entry.path[prefix:])
+                if entry.is_dir
+                else self.selects(entry, entry.path[prefix:])
+            )
+        ]
+
+
+def _drop_empty_dirs(entries: list[RemoteEntry]) -> list[RemoteEntry]:
+    """Remove directories left without any file below them by a filter."""
+    keep = set()
+    for entry in entries:
+        if not entry.is_dir:
+            parent = entry.path.rpartition("/")[0]
+            while parent and parent not in keep:
+                keep.add(parent)
+                parent = parent.rpartition("/")[0]
+    return [
+        entry for entry in entries if not entry.is_dir or entry.path in keep
+    ]
+
+
+# LIST output formats, tried in order until one matches a server's output
+_LIST_PATTERNS = {
+    # drwxr-xr-x   2 owner group      4096 Jan 31 12:00 name
+    "unix": re.compile(
+        r"^(?P<kind>[-dlbcpsD])[-rwxsStTlL+.@]{9,10}\s+\d+\s+"
+        r"(?:\S+\s+){1,2}?(?P<size>\d+)\s+"
+        r"(?P<month>[A-Za-z]{3})\s+(?P<day>\d{1,2})\s+"
+        r"(?:(?P<hour>\d{1,2}):(?P<minute>\d{2})|(?P<year>\d{4}))\s+"
+        r"(?P<name>.+)$"
+    ),
+    # 01-31-24  12:00PM       <DIR>          name
+    "windows": re.compile(
+        r"^(?P<month>\d{2})-(?P<day>\d{2})-(?P<year>\d{2}(?:\d{2})?)\s+"
+        r"(?P<hour>\d{1,2}):(?P<minute>\d{2})(?P<ampm>[AaPp][Mm])?\s+"
+        r"(?:(?P<dir><DIR>)|(?P<size>\d+))\s+(?P<name>.+)$"
+    ),
+}
+_MONTHS = {
+    name: number
+    for number, name in enumerate(
+        "jan feb mar apr may jun jul aug sep oct nov dec".split(),
+        start=1,
+    )
+}
+# Detected LIST format per connection, None if LIST output is not parseable
+_list_dialect: "weakref.WeakKeyDictionary[FTP, str | None]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _list_modify(match: re.Match, dialect: str) -> str | None:
+    """Convert a LIST timestamp to an MLSD style ``modify`` fact."""
+    hour = int(match["hour"] or 0)
+    minute = int(match["minute"] or 0)
+    if dialect == "windows":
+        month, year = int(match["month"]), int(match["year"])
+        if year < 100:
+            year += 2000 if year < 70 else 1900
+        if match["ampm"]:
+            hour = hour % 12 + (12 if match["ampm"].upper() == "PM" else 0)
+    else:
+        month = _MONTHS.get(match["month"].lower())
+        if month is None:
+            return None
+        now = datetime.now(timezone.utc)
+        if match["year"]:
+            year = int(match["year"])
+        else:
+            # Recent files omit the year, they are less than a year old
+            year = now.year
+            if (month, int(match["day"])) > (now.month, now.day + 1):
+                year -= 1
+    try:
+        stamp = datetime(year, month, int(match["day"]), hour, minute)
+    except ValueError:
+        return None
+    return stamp.strftime("%Y%m%d%H%M%S")
+
+
+def parse_list_line(
+    line: str, dialect: str | None = None
+) -> tuple[str, dict[str, str]] | None:
+    """
+    Parse one line of LIST output in Unix or Windows/IIS format.
+
+    Args:
+        line: Line of LIST output
+        dialect: ``"unix"`` or ``"windows"``, both are tried if not given
+
+    Returns:
+        ``(name, facts)`` shaped like an MLSD entry, with ``type`` (``file``,
+        ``dir`` or ``link``), ``size`` for files and ``modify`` facts (in
+        the server's local time, unlike MLSD), or None for lines such as
+        ``total 42`` that are not entries
+    """
+    dialects = [dialect] if dialect else list(_LIST_PATTERNS)
+    for name in dialects:
+        match = _LIST_PATTERNS[name].match(line)
+        if match is None:
+            continue
+        entry_name = match["name"]
+        if name == "windows":
+            kind = "dir" if match["dir"] else "file"
+        else:
+            kind = {"d": "dir", "-": "file", "l": "link"}.get(
+                match["kind"], "other"
+            )
+            if kind == "link":
+                entry_name = entry_name.split(" -> ", 1)[0]
+        facts = {"type": kind}
+        if kind == "file" and match["size"] is not None:
+            facts["size"] = match["size"]
+        modify = _list_modify(match, name)
+        if modify is not None:
+            facts["modify"] = modify
+        return entry_name, facts
+    return None
+
+
+def _detect_list_dialect(lines: list[str]) -> str | None:
+    """Return the LIST format the first parseable line is written in."""
+    for line in lines:
+        for dialect, pattern in _LIST_PATTERNS.items():
+            if pattern.match(line):
+                return dialect
+    return None
+
+
+def _list_cwd_with_list(
+    ftp: FTP, remote_path: str
+) -> list[RemoteEntry] | None:
+    """
+    List the current directory with one LIST command.
+
+    Returns:
+        Entries of the directory, or None if the server's LIST output could
+        not be parsed
+    """
+    lines = []
+    ftp.retrlines("LIST", lines.append)
+
+    if ftp not in _list_dialect:
+        if not lines:
+            # Nothing to detect the format from yet
+            return []
+        _list_dialect[ftp] = _detect_list_dialect(lines)
+        logger.debug("Detected LIST dialect: %s", _list_dialect[ftp])
+    dialect = _list_dialect[ftp]
+    if dialect is None:
+        return None
+
+    entries = []
+    for line in lines:
+        parsed = parse_list_line(line, dialect)
+        if parsed is None:
+            continue
+        name, facts = parsed
+        if name in (".", ".."):
+            continue
+        kind = facts["type"]
+        if kind == "link":
+            kind = "dir" if _is_cwd_dir(ftp, name) else "file"
+        if kind not in ("file", "dir"):
+            continue
+        entries.append(
+            RemoteEntry(
+                _join_remote(remote_path, name),
+                kind,
+                int(facts["size"]) if "size" in facts else None,
+                facts.get("modify"),
+                modify_utc=False,
+            )
+        )
+    return entries
+
+
+def _is_cwd_dir(ftp: FTP, name: str) -> bool:
+    """Probe with CWD whether ``name`` in the current directory is a folder."""
+    folder_dir = ftp.pwd()
+    try:
+        ftp.cwd(name)
+    except (error_perm, error_temp):
+        return False
+    ftp.cwd(folder_dir)
+    return True
+
+
+def _binary_size(ftp: FTP, remote_file: str) -> int | None:
+    """
+    SIZE of a remote file in binary type.
+
+    Many servers refuse SIZE in ASCII type, the type a session starts in and
+    the one ftplib leaves behind after a listing.
+    """
+    ftp.voidcmd("TYPE I")
+    return ftp.size(remote_file)
+
+
+def _list_cwd_with_nlst(ftp: FTP, remote_path: str) -> list[RemoteEntry]:
+    """List the current directory with NLST, CWD probing and SIZE."""
+    try:
+        item_names = ftp.nlst()
+    except (error_perm, error_temp):
+        # If NLST fails, directory might be empty
+        item_names = []
+
+    entries = []
+    if item_names:
+        # Listings switch to ASCII type, where SIZE may be refused
+        ftp.voidcmd("TYPE I")
+    for item in item_names:
+        name = PurePosixPath(item).name
+        if name in (".", ".."):
+            continue
+        if _is_cwd_dir(ftp, name):
+            entries.append(RemoteEntry(_join_remote(remote_path, name), "dir"))
+            continue
+        try:
+            size = ftp.size(name)
+        except (error_perm, error_temp):
+            # If we can't get the size, we record it as unknown
+            logger.debug("Could not get size for item: %s", name)
+            size = None
+        entries.append(
+            RemoteEntry(_join_remote(remote_path, name), "file", size)
+        )
+    return entries
 
-    This function first tries to use MLSD (RFC 3659) which provides size information directly.
-    If MLSD is not supported, it falls back to using NLST and SIZE commands.
+
+def _list_remote_dir(ftp: FTP, remote_path: str) -> list[RemoteEntry]:
+    """
+    List one remote directory with type, size and modify facts.
+
+    Uses MLSD when the connection supports it. Otherwise the directory is
+    listed with a single LIST parsed in the server's (cached) Unix or
+    Windows format, and only if that format is not recognised with NLST,
+    CWD probing for the type and SIZE for files.
 
     Args:
         ftp: FTP connection
         remote_path: Remote folder path
 
     Returns:
-        int: Total size in bytes
+        Entries directly inside the folder
     """
-    total_size = 0
-
+    _set_transfer_mode(ftp, "S")
     if is_mlsd_supported(ftp):
-        # Use MLSD method (modern approach with size information)
         try:
-            for item, facts in ftp.mlsd(remote_path, facts=["type", "size"]):
-                if facts["type"] == "dir":
-                    # Recursively get size of subdirectories
-                    total_size += get_ftp_folder_size(
-                        ftp, f"{remote_path}/{item}"
-                    )
-                elif "size" in facts:
-                    total_size += int(facts["size"])
-            return total_size
+            return [
+                RemoteEntry(
+                    _join_remote(remote_path, name),
+                    facts["type"],
+                    int(facts["size"]) if "size" in facts else None,
+                    facts.get("modify"),
+                )
+                for name, facts in ftp.mlsd(
+                    remote_path, facts=["type", "size", "modify"]
+                )
+                if facts.get("type") in ("file", "dir")
+            ]
         except (error_perm, error_temp) as e:
             logger.debug(
                 "MLSD failed for %s despite being supported: %s",
@@ -113,251 +892,1786 @@ def get_ftp_folder_size(ftp: FTP, remote_path: str) -> int:
             )
             # Fall through to fallback method
 
-    # Fallback to using NLST and SIZE commands
+    # Fallback to LIST, or NLST, CWD and SIZE, inside the directory
+    original_dir = ftp.pwd()
+    ftp.cwd(remote_path)
     try:
-        original_dir = ftp.pwd()
+        entries = None
+        if _list_dialect.get(ftp, "") is not None:
+            try:
+                entries = _list_cwd_with_list(ftp, remote_path)
+            except error_perm as e:
+                logger.debug("LIST not supported: %s", e)
+                _list_dialect[ftp] = None
+            except error_temp as e:
+                logger.debug("LIST failed for %s: %s", remote_path, e)
+        if entries is None:
+            entries = _list_cwd_with_nlst(ftp, remote_path)
+    finally:
+        ftp.cwd(original_dir)
+    return entries
+
+
+@_accepts_pool
+def build_remote_tree(
+    ftp: FTP | FTPConnectionPool,
+    remote_path: str,
+    file_filter: RemoteFilter | None = None,
+) -> RemoteTree:
+    """
+    Snapshot a remote file or folder with a single recursive listing walk.
 
-        # Change to the target directory
-        ftp.cwd(remote_path)
+    With a ``file_filter`` the snapshot only holds the selected files and
+    the directories leading to them, and pruned directories are not listed.
 
-        # List all items in the directory
+    Args:
+        ftp: FTP connection or FTPConnectionPool
+        remote_path: Remote file or folder path
+        file_filter: RemoteFilter selecting files and pruning directories
+            during the walk
+
+    Returns:
+        RemoteTree: Snapshot of the path and, for folders, everything below
+
+    Raises:
+        FileNotFoundError: If the path is neither a folder nor a file
+    """
+    try:
+        children = _list_remote_dir(ftp, remote_path)
+    except (error_perm, error_temp) as e:
+        # Not listable as a folder, so it should be a file
+        logger.debug("Could not list %s as a folder: %s", remote_path, e)
         try:
-            items = ftp.nlst()
-        except (error_perm, error_temp):
-            # If NLST fails, directory might be empty
-            items = []
+            size = _binary_size(ftp, remote_path)
+        except (error_perm, error_temp) as size_error:
+            raise FileNotFoundError(
+                f"{remote_path} not found on FTP server "
+                f"{ftp.host}:{ftp.port}/{ftp.pwd()}"
+            ) from size_error
+        return RemoteTree(RemoteEntry(remote_path, "file", size))
+
+    def select(entries: list[RemoteEntry]) -> list[RemoteEntry]:
+        if file_filter is None:
+            return entries
+        return file_filter.apply(remote_path, entries)
+
+    tree = RemoteTree(RemoteEntry(remote_path, "dir"))
+    pending = [select(children)]
+    while pending:
+        for entry in pending.pop():
+            tree.entries.append(entry)
+            if entry.is_dir:
+                pending.append(select(_list_remote_dir(ftp, entry.path)))
+    if file_filter is not None:
+        tree.entries = _drop_empty_dirs(tree.entries)
+    return tree
+
+
+def get_ftp_folder_size(
+    ftp: FTP | FTPConnectionPool,
+    remote_path: str,
+    tree: RemoteTree | None = None,
+    workers: int = 1,
+    file_filter: RemoteFilter | None = None,
+) -> int:
+    """
+    Recursively calculate total size of an FTP folder including subdirectories.
+
+    The size comes from a ``RemoteTree`` snapshot, which uses MLSD (RFC 3659)
+    when supported and falls back to NLST and SIZE commands otherwise. With
+    a connection pool and ``workers`` > 1 the directories are listed
+    concurrently, see ``build_remote_tree_concurrent``.
+
+    Args:
+        ftp: FTP connection or FTPConnectionPool
+        remote_path: Remote folder path
+        tree: Snapshot of ``remote_path`` to reuse instead of walking again
+        workers: Number of concurrent listing sessions when ``ftp`` is a pool
+        file_filter: RemoteFilter selecting the files to count
+
+    Returns:
+        int: Total size in bytes
+    """
+    if tree is None:
+        if isinstance(ftp, FTPConnectionPool) and workers > 1:
+            tree = build_remote_tree_concurrent(
+                ftp, remote_path, workers, file_filter
+            )
+        else:
+            tree = build_remote_tree(ftp, remote_path, file_filter)
+    return tree.total_size
+
+
+# ftplib defaults to 8 KiB, which makes fast links CPU-bound in callbacks
+DEFAULT_BLOCKSIZE = 256 * 1024
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
 
-        # Process each item
-        for item in items:
+def _preallocate(f, offset: int, file_size: int | None) -> bool:
+    """
+    Reserve disk space for the rest of a download with ``posix_fallocate``.
+
+    Returns:
+        bool: True if the file was extended to ``file_size``
+    """
+    if (
+        file_size is None
+        or file_size <= offset
+        or not hasattr(os, "posix_fallocate")
+    ):
+        return False
+    try:
+        os.posix_fallocate(f.fileno(), offset, file_size - offset)
+        return True
+    except OSError as e:
+        # Not supported by every file system, it is only an optimisation
+        logger.debug("Could not preallocate %s: %s", f.name, e)
+        return False
+
+
+@dataclass(frozen=True)
+class ProgressEvent:
+    """
+    Structured progress update emitted by a ``ProgressAggregator``.
+
+    Attributes:
+        current: Bytes transferred so far
+        total: Total bytes expected, 0 if unknown
+        elapsed: Seconds since the aggregator was created
+        rate: Smoothed throughput in bytes per second
+        name: File being transferred, or a status note
+    """
+
+    current: int
+    total: int
+    elapsed: float
+    rate: float
+    name: str | None = None
+
+    @property
+    def eta(self) -> float | None:
+        """Estimated seconds until ``total`` is reached, None if unknown."""
+        if self.rate <= 0 or self.total <= 0:
+            return None
+        return max(self.total - self.current, 0) / self.rate
+
+    @property
+    def message(self) -> str:
+        """Human readable summary, only formatted when asked for."""
+        text = (
+            f"{self.current}/{self.total} bytes, "
+            f"{self.rate / 1e6:.2f} MB/s"
+        )
+        eta = self.eta
+        if eta is not None:
+            text += f", ETA {eta:.0f} s"
+        return f"{self.name} - {text}" if self.name else text
+
+
+class ProgressAggregator:
+    """
+    Coalesce per-block transfer updates into throttled ``ProgressEvent``s.
+
+    ``update`` only adds to a counter unless at least ``min_bytes`` have
+    accumulated or ``min_interval`` seconds have passed since the last
+    event, so it is cheap to call for every block. It is thread-safe, so one
+    aggregator can be shared by concurrent transfers.
+
+    An aggregator can be passed as ``progress_callback`` to every transfer
+    helper; the helpers never flush an aggregator they were given, so call
+    ``flush`` once the transfer is done. Plain callbacks taking
+    ``(current, total, message=...)`` are wrapped in one automatically.
+
+    Args:
+        callback: Called with each ProgressEvent
+        total: Total bytes expected, 0 if unknown
+        current: Bytes already transferred
+        min_interval: Minimum seconds between two events
+        min_bytes: Bytes after which an event is emitted regardless of time
+        smoothing: Weight of the latest interval in the throughput average
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[ProgressEvent], None],
+        total: int = 0,
+        current: int = 0,
+        min_interval: float = 0.5,
+        min_bytes: int = 4 * 1024 * 1024,
+        smoothing: float = 0.3,
+    ):
+        self.callback = callback
+        self.total = total
+        self.current = current
+        self.name = None
+        self.min_interval = min_interval
+        self.min_bytes = min_bytes
+        self.smoothing = smoothing
+        self._start = self._last_time = time.monotonic()
+        self._last_current = current
+        self._rate = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, nbytes: int, name: str | None = None) -> None:
+        """Add ``nbytes`` transferred, emitting an event if one is due."""
+        with self._lock:
+            self.current += nbytes
+            if name is not None:
+                self.name = name
+            now = time.monotonic()
+            if (
+                abs(self.current - self._last_current) < self.min_bytes
+                and now - self._last_time < self.min_interval
+            ):
+                return
+            self._emit(now)
+
+    def flush(self, name: str | None = None) -> None:
+        """Emit an event now, e.g. at the start or end of a transfer."""
+        with self._lock:
+            if name is not None:
+                self.name = name
+            self._emit(time.monotonic())
+
+    def _emit(self, now: float) -> None:
+        elapsed = now - self._last_time
+        if elapsed > 0:
+            rate = (self.current - self._last_current) / elapsed
+            self._rate = (
+                rate
+                if self._rate == 0
+                else self.smoothing * rate + (1 - self.smoothing) * self._rate
+            )
+        self._last_time = now
+        self._last_current = self.current
+        self.callback(
+            ProgressEvent(
+                self.current,
+                self.total,
+                now - self._start,
+                self._rate,
+                self.name,
+            )
+        )
+
+
+class _FileProgress:
+    """Per-file view of a shared ``ProgressAggregator`` that can roll back."""
+
+    def __init__(self, parent: ProgressAggregator | None):
+        self.parent = parent
+        self.current = 0
+
+    def update(self, nbytes: int, name: str | None = None) -> None:
+        """Count ``nbytes`` for this file and forward them to the parent."""
+        self.current += nbytes
+        if self.parent is not None:
+            self.parent.update(nbytes, name)
+
+    def rollback(self) -> None:
+        """Withdraw the bytes reported so far, e.g. before a retry."""
+        if self.parent is not None:
+            self.parent.update(-self.current)
+        self.current = 0
+
+
+def _as_progress(
+    progress_callback, total_size: int = 0, current_size: int = 0
+) -> tuple[ProgressAggregator | _FileProgress | None, bool]:
+    """
+    Turn a ``progress_callback`` argument into an aggregator.
+
+    Returns:
+        The aggregator (None without a callback) and whether it was created
+        here, in which case the caller flushes it when done
+    """
+    if progress_callback is None:
+        return None, False
+    if isinstance(progress_callback, _FileProgress):
+        return progress_callback, False
+    if isinstance(progress_callback, ProgressAggregator):
+        if not progress_callback.total:
+            progress_callback.total = total_size
+        return progress_callback, False
+
+    def legacy_callback(event: ProgressEvent) -> None:
+        progress_callback(event.current, event.total, message=event.message)
+
+    return ProgressAggregator(legacy_callback, total_size, current_size), True
+
+
+class _CRC32:
+    """hashlib-style wrapper around ``zlib.crc32``."""
+
+    name = "crc32"
+
+    def __init__(self):
+        self._value = 0
+
+    def update(self, data) -> None:
+        self._value = zlib.crc32(data, self._value)
+
+    def combine(self, crc: int, length: int) -> None:
+        """Append ``length`` bytes whose CRC32 ``crc`` was computed apart."""
+        self._value = _crc32_combine(self._value, crc, length)
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def hexdigest(self) -> str:
+        return format(self._value, "08x")
+
+
+def _gf2_times(matrix: list[int], vector: int) -> int:
+    total = 0
+    for row in matrix:
+        if not vector:
+            break
+        if vector & 1:
+            total ^= row
+        vector >>= 1
+    return total
+
+
+def _crc32_combine(crc1: int, crc2: int, length2: int) -> int:
+    """
+    CRC32 of two byte strings joined, from their CRC32s (zlib's algorithm).
+
+    ``crc1`` is advanced over ``length2`` zero bytes by repeatedly squaring
+    the GF(2) operator of one zero bit, then xored with ``crc2``.
+    """
+    if length2 <= 0:
+        return crc1
+    # Operator of one zero bit: the reflected polynomial, then shifts
+    odd = [0xEDB88320] + [1 << i for i in range(31)]
+    even = [_gf2_times(odd, row) for row in odd]  # two zero bits
+    odd = [_gf2_times(even, row) for row in even]  # four zero bits
+    while True:
+        even = [_gf2_times(odd, row) for row in odd]
+        if length2 & 1:
+            crc1 = _gf2_times(even, crc1)
+        length2 >>= 1
+        if not length2:
+            break
+        odd = [_gf2_times(even, row) for row in even]
+        if length2 & 1:
+            crc1 = _gf2_times(odd, crc1)
+        length2 >>= 1
+        if not length2:
+            break
+    return crc1 ^ crc2
+
+
+def _new_hash(algorithm: str | Callable):
+    """Create a hash object from a hashlib name or a constructor."""
+    if callable(algorithm):
+        return algorithm()
+    if algorithm.lower() == "crc32":
+        return _CRC32()
+    return hashlib.new(algorithm)
+
+
+class InlineHasher:
+    """
+    Hash the chunks of a transfer on a background thread.
+
+    ``update`` only queues the chunk, so the thread reading the data
+    connection is not held up by the hash computation; at most
+    ``max_pending`` chunks wait to be hashed. The thread is started with the
+    first chunk and stopped by ``hexdigest`` or ``close``. If hashing
+    fails, the thread keeps draining the queue so ``update`` never blocks,
+    and the error is raised by the next ``update``, ``close`` or
+    ``hexdigest``.
+
+    Args:
+        algorithm: hashlib algorithm name, ``"crc32"``, or a callable
+            returning an object with ``update`` and ``hexdigest``
+        max_pending: Maximum number of chunks queued for hashing
+    """
+
+    def __init__(self, algorithm: str | Callable = "sha256", max_pending=64):
+        self._hash = _new_hash(algorithm)
+        self._chunks = queue.Queue(max_pending)
+        self._thread = None
+        self._error: BaseException | None = None
+
+    @property
+    def name(self) -> str:
+        """Name of the hash algorithm."""
+        return getattr(self._hash, "name", "custom")
+
+    def update(self, data) -> None:
+        """Queue a chunk to be hashed."""
+        if self._error is not None:
+            raise self._error
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="ftp-hash", daemon=True
+            )
+            self._thread.start()
+        self._chunks.put(data)
+
+    def _run(self) -> None:
+        while True:
+            data = self._chunks.get()
+            if data is None:
+                return
+            if self._error is not None:
+                continue
             try:
-                # Try to change to the item (to check if it's a directory)
-                ftp.cwd(item)
-                # If successful, it's a directory, so change back and recurse
-                ftp.cwd(original_dir)
-                total_size += get_ftp_folder_size(ftp, f"{remote_path}/{item}")
-            except (error_perm, error_temp):
-                # If changing directory fails, it's likely a file
-                # Try to get its size
-                try:
-                    size = ftp.size(item)
-                    if size is not None:
-                        total_size += size
-                except (error_perm, error_temp):
-                    # If we can't get the size, we skip this item
-                    logger.debug("Could not get size for item: %s", item)
+                self._hash.update(data)
+            except BaseException as e:  # pylint: disable=broad-except
+                self._error = e
+
+    def combine_crc32(self, crc: int, length: int) -> None:
+        """
+        Append ``length`` bytes whose CRC32 ``crc`` was computed apart, e.g.
+        a segment downloaded concurrently.
+
+        Raises:
+            ValueError: If the algorithm is not ``"crc32"``
+        """
+        if not isinstance(self._hash, _CRC32):
+            raise ValueError(f"Cannot combine CRC32s into {self.name}")
+        self.close()
+        self._hash.combine(crc, length)
+
+    def close(self) -> None:
+        """Hash the queued chunks and stop the background thread."""
+        if self._thread is not None:
+            self._chunks.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._error is not None:
+            raise self._error
+
+    def hexdigest(self) -> str:
+        """Digest of all chunks passed to ``update``."""
+        self.close()
+        return self._hash.hexdigest()
+
+
+# Names of hashlib algorithms in the HASH command (draft-bryan-ftpext-hash)
+_HASH_COMMAND_NAMES = {
+    "sha1": "SHA-1",
+    "sha256": "SHA-256",
+    "sha512": "SHA-512",
+    "md5": "MD5",
+    "crc32": "CRC32",
+}
+
+# Older single-algorithm commands
+_X_HASH_COMMANDS = {
+    "md5": "XMD5",
+    "crc32": "XCRC",
+    "sha1": "XSHA1",
+    "sha256": "XSHA256",
+    "sha512": "XSHA512",
+}
+
+# Hash commands known per connection, so FEAT is only sent once
+_hash_support: "weakref.WeakKeyDictionary[FTP, dict]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _server_hash_support(ftp: FTP) -> dict:
+    """Parse the HASH algorithms advertised in the FEAT reply."""
+    support = _hash_support.get(ftp)
+    if support is not None:
+        return support
+
+    support = {"hash": set(), "selected": None, "unsupported": set()}
+    try:
+        features = ftp.sendcmd("FEAT")
+    except all_errors as e:
+        logger.debug("FEAT not supported: %s", e)
+        features = ""
+    for line in features.splitlines()[1:]:
+        feature, _, args = line.strip().partition(" ")
+        if feature.upper() != "HASH":
+            continue
+        for name in args.split(";"):
+            name = name.strip().upper()
+            if name.endswith("*"):
+                # The algorithm marked with "*" is the one currently selected
+                name = name.rstrip("*")
+                support["selected"] = name
+            if name:
+                support["hash"].add(name)
+    _hash_support[ftp] = support
+    return support
+
+
+def get_server_digest(
+    ftp: FTP, remote_file: str, algorithm: str = "sha256"
+) -> str | None:
+    """
+    Ask the server for the digest of a remote file.
 
-        # Return to the original directory
-        ftp.cwd(original_dir)
-    except (error_perm, error_temp) as fallback_error:
+    Uses the HASH command when the server advertises ``algorithm`` in FEAT,
+    otherwise the matching XMD5/XCRC/XSHA* command. Commands the server
+    rejects are remembered per connection and not sent again.
+
+    Args:
+        ftp: FTP connection
+        remote_file: Remote file path
+        algorithm: hashlib algorithm name or ``"crc32"``
+
+    Returns:
+        Lower case hex digest, or None if the server cannot compute it
+    """
+    algorithm = algorithm.lower()
+    support = _server_hash_support(ftp)
+    hash_name = _HASH_COMMAND_NAMES.get(algorithm)
+
+    try:
+        if hash_name in support["hash"]:
+            if support["selected"] != hash_name:
+                ftp.sendcmd(f"OPTS HASH {hash_name}")
+                support["selected"] = hash_name
+            # 213 <algorithm> <start>-<end> <digest> <path>
+            return ftp.sendcmd(f"HASH {remote_file}").split()[3].lower()
+
+        command = _X_HASH_COMMANDS.get(algorithm)
+        if command is None or command in support["unsupported"]:
+            return None
+        try:
+            resp = ftp.sendcmd(f"{command} {remote_file}")
+        except error_perm as e:
+            if not e.args[0].startswith("550"):
+                # 500/502: unknown command, 550 is about the file
+                support["unsupported"].add(command)
+            raise
+        # 250 <digest>, some servers append the path
+        return resp.split()[1].lower()
+    except (error_perm, error_temp, IndexError) as e:
         logger.debug(
-            "Fallback method failed for %s: %s", remote_path, fallback_error
+            "No server %s digest for %s: %s", algorithm, remote_file, e
         )
+        return None
+
+
+def _same_digest(a: str, b: str) -> bool:
+    """Compare hex digests, ignoring case and CRC zero padding."""
+    return a.lower().lstrip("0") == b.lower().lstrip("0")
+
+
+class ChecksumMismatchError(OSError):
+    """The digest of transferred data differs from the server's digest."""
+
+
+class LocalFileError(OSError):
+    """
+    A local file could not be read or written during a transfer.
+
+    Raised from the original error, whose errno, message and file name it
+    copies. Transfers retrying failed sessions never retry it.
+    """
+
+    @classmethod
+    def wrap(cls, error: OSError, filename=None) -> "LocalFileError":
+        """Copy ``error``, naming ``filename`` if it names no file."""
+        return cls(error.errno, error.strerror, error.filename or filename)
+
+
+class TransferManifest:
+    """
+    Digests of the files moved by a transfer.
+
+    Passed as ``manifest`` to the download and upload helpers, every file is
+    hashed with an ``InlineHasher`` while it is transferred and, when
+    ``verify`` is set, compared against the digest computed by the server.
+    A mismatch raises ``ChecksumMismatchError``. ``download_ftp`` and
+    ``upload_ftp`` write the manifest to ``path`` when they finish.
+
+    Args:
+        algorithm: hashlib algorithm name, ``"crc32"``, or a callable
+            returning an object with ``update`` and ``hexdigest``
+        verify: Compare against the server's digest where supported
+        path: JSON file written by ``save``
+    """
+
+    def __init__(
+        self,
+        algorithm: str | Callable = "sha256",
+        verify: bool = True,
+        path: str | Path | None = None,
+    ):
+        self.algorithm = algorithm
+        self.verify = verify
+        self.path = Path(path) if path is not None else None
+        self.files: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def hasher(self) -> InlineHasher:
+        """New hasher for one file."""
+        return InlineHasher(self.algorithm)
+
+    def record(
+        self,
+        remote_file: str,
+        local_file: Path,
+        size: int,
+        digest: str,
+        server_digest: str | None,
+    ) -> None:
+        """Add the digests of one transferred file."""
+        with self._lock:
+            self.files[remote_file] = {
+                "local": str(local_file),
+                "size": size,
+                "digest": digest,
+                "server_digest": server_digest,
+            }
+
+    def save(self, path: str | Path | None = None) -> None:
+        """Atomically write the manifest as JSON."""
+        path = Path(path) if path is not None else self.path
+        if path is None:
+            raise ValueError("No manifest path given")
+        with self._lock:
+            files = dict(sorted(self.files.items()))
+        name = self.hasher().name
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"algorithm": name, "files": files}, f, indent=1)
+        os.replace(tmp_path, path)
+
+
+@contextmanager
+def _hashing(
+    manifest: TransferManifest | None,
+    ftp: FTP | FTPConnectionPool,
+    remote_file: str,
+    local_file: Path,
+) -> Iterator[InlineHasher | None]:
+    """
+    Hash the transfer run in the block and record it in ``manifest``.
+
+    Yields None without a manifest. After the block the digest is compared
+    with the server's digest of ``remote_file`` when the manifest asks for
+    verification.
+    """
+    if manifest is None:
+        yield None
+        return
+
+    hasher = manifest.hasher()
+    try:
+        yield hasher
+    except BaseException:
+        # The transfer error is the one to report, not a hashing error
+        try:
+            hasher.close()
+        except Exception as e:  # pylint: disable=broad-except
+            logger.debug("Hashing %s failed as well: %s", local_file, e)
         raise
+    digest = hasher.hexdigest()
 
-    return total_size
+    server_digest = None
+    if manifest.verify:
+        with _ftp_session(ftp) as session:
+            server_digest = get_server_digest(
+                session, remote_file, hasher.name
+            )
+    manifest.record(
+        remote_file,
+        local_file,
+        os.path.getsize(local_file),
+        digest,
+        server_digest,
+    )
+    if server_digest is not None and not _same_digest(digest, server_digest):
+        raise ChecksumMismatchError(
+            f"{hasher.name} of {local_file} is {digest}, "
+            f"server has {server_digest} for {remote_file}"
+        )
 
 
+@_accepts_pool
 def download_ftp_file(
-    ftp: FTP,
+    ftp: FTP | FTPConnectionPool,
     remote_file: str,
     local_file: Path,
     progress_callback=None,
     total_size=0,
     current_size=0,
+    offset: int = 0,
+    file_size: int | None = None,
+    blocksize: int = DEFAULT_BLOCKSIZE,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+    hasher: InlineHasher | None = None,
+    compress: bool = False,
 ) -> int:
     """
     Download a single file from FTP server.
 
+    With a non-zero ``offset`` the transfer is restarted with REST at that
+    byte and appended to the already written part of ``local_file``. When
+    the remote ``file_size`` is known, the local file is preallocated with
+    ``os.posix_fallocate`` where available. With ``compress`` the data
+    channel is switched to MODE Z and inflated on the fly, falling back to
+    stream mode if the server does not support it or when resuming.
+
     Args:
-        ftp: FTP connection
+        ftp: FTP connection or FTPConnectionPool
         remote_file: Remote file path
         local_file: Local file path
-        progress_callback: Callback function for progress updates
+        progress_callback: Callback function or ProgressAggregator for
+            progress updates
         total_size: Total size of all files (for progress)
         current_size: Current downloaded size
+        offset: Byte offset to resume the download from
+        file_size: Remote file size, used to preallocate the local file
+        blocksize: Maximum bytes read from the data connection per callback
+        buffer_size: Size of the local write buffer
+        hasher: InlineHasher fed with the whole file content, including
+            the part already on disk when resuming
+        compress: Transfer the data deflated with MODE Z when supported
 
     Returns:
         Updated current size after download
     """
     logger.info("Downloading file %s to %s", remote_file, local_file)
 
+    progress, owned = _as_progress(progress_callback, total_size, current_size)
+    # REST offsets are not defined on a deflated stream
+    compressed = compress and not offset and _set_transfer_mode(ftp, "Z")
+    if not compressed:
+        _set_transfer_mode(ftp, "S")
+
     # Open file in binary write mode using with statement
-    with open(local_file, "wb") as f:
-
-        def write_callback(data, file=f, total_size=total_size):
-            nonlocal current_size
-            current_size += len(data)
-            file.write(data)
-            if progress_callback:
-                progress_callback(
-                    current_size,
-                    total_size,
-                    message=f"Downloading file: {remote_file} to {local_file} - {current_size}/{total_size} bytes",
-                )
+    with open(
+        local_file, "r+b" if offset else "wb", buffering=buffer_size
+    ) as f:
+        if offset:
+            # Drop anything written past the resume point
+            f.seek(offset)
+            f.truncate()
+            if hasher is not None:
+                f.seek(0)
+                while f.tell() < offset:
+                    hasher.update(f.read(min(buffer_size, offset - f.tell())))
+        preallocated = _preallocate(f, offset, file_size)
+
+        write = f.write
+        if progress is None and hasher is None:
+            write_callback = write
+        elif hasher is None:
+            update = progress.update
+
+            def write_callback(data):
+                write(data)
+                update(len(data), remote_file)
+
+        else:
+            hash_update = hasher.update
+            update = progress.update if progress is not None else None
+
+            def write_callback(data):
+                write(data)
+                hash_update(data)
+                if update is not None:
+                    update(len(data), remote_file)
+
+        if compressed:
+            decompressor = zlib.decompressobj()
+            write_inflated = write_callback
 
-        ftp.retrbinary(f"RETR {remote_file}", write_callback)
+            def write_callback(data):
+                data = decompressor.decompress(data)
+                if data:
+                    write_inflated(data)
+
+        try:
+            ftp.retrbinary(
+                f"RETR {remote_file}",
+                write_callback,
+                blocksize=blocksize,
+                rest=offset or None,
+            )
+            if compressed:
+                tail = decompressor.flush()
+                if tail:
+                    write_inflated(tail)
+            current_size += f.tell() - offset
+        finally:
+            if preallocated:
+                # Cut the reserved space after the last byte received, so an
+                # interrupted file resumes from its size and a remote file
+                # that shrank since it was listed is not padded
+                f.truncate()
+    if owned:
+        progress.flush()
     return current_size
 
 
-def download_ftp_folder(
+# Files smaller than this per segment are not worth an extra session
+MIN_SEGMENT_SIZE = 8 * 1024 * 1024
+
+
+_seek_lock = threading.Lock()
+
+
+def _pwrite(fd: int, data: bytes, offset: int) -> None:
+    """Write all of ``data`` at ``offset`` without moving a shared position."""
+    view = memoryview(data)
+    while view:
+        if hasattr(os, "pwrite"):
+            written = os.pwrite(fd, view, offset)
+        else:
+            # No positional write on this platform, serialise seek and write
+            with _seek_lock:
+                os.lseek(fd, offset, os.SEEK_SET)
+                written = os.write(fd, view)
+        view = view[written:]
+        offset += written
+
+
+def _download_segment(
     ftp: FTP,
+    remote_file: str,
+    fd: int,
+    start: int,
+    end: int,
+    progress: _FileProgress,
+    blocksize: int = DEFAULT_BLOCKSIZE,
+    crc: _CRC32 | None = None,
+) -> None:
+    """
+    Download bytes ``[start, end)`` of a remote file into ``fd``.
+
+    The transfer is restarted with REST at ``start`` and the data connection
+    is closed as soon as ``end`` is reached. ``crc`` is updated with every
+    byte written.
+    """
+    _set_transfer_mode(ftp, "S")
+    # Servers refuse REST, or count it in converted bytes, in ASCII type
+    ftp.voidcmd("TYPE I")
+    conn = ftp.transfercmd(f"RETR {remote_file}", rest=start)
+    offset = start
+    try:
+        while offset < end:
+            data = conn.recv(min(blocksize, end - offset))
+            if not data:
+                break
+            try:
+                _pwrite(fd, data, offset)
+            except OSError as e:
+                raise LocalFileError.wrap(e) from e
+            if crc is not None:
+                crc.update(data)
+            offset += len(data)
+            progress.update(len(data), remote_file)
+    finally:
+        conn.close()
+
+    try:
+        ftp.voidresp()
+    except (error_perm, error_temp) as e:
+        # Closing the data connection early makes most servers answer 426
+        if offset < end or not str(e).startswith(("426", "451")):
+            raise
+    if offset < end:
+        raise EOFError(
+            f"Data connection for {remote_file} closed at byte {offset}, "
+            f"expected {end}"
+        )
+
+
+def download_ftp_file_segmented(
+    ftp_factory: Callable[[], FTP] | FTPConnectionPool,
+    remote_file: str,
+    local_file: Path,
+    segments: int = 4,
+    progress_callback=None,
+    total_size=0,
+    current_size=0,
+    file_size: int | None = None,
+    retries: int = 3,
+    retry_delay: float = 1.0,
+    hasher: InlineHasher | None = None,
+) -> int:
+    """
+    Download a single large file as byte ranges over concurrent sessions.
+
+    The file is split into ``segments`` ranges, each fetched on its own FTP
+    session from ``ftp_factory`` using a REST offset, and written with
+    positional writes into a local file preallocated to the remote size. A
+    failed segment is resumed from its last written byte, up to ``retries``
+    times. If the download still fails, the local file is cut after the
+    bytes received without a gap.
+
+    Args:
+        ftp_factory: Callable returning a new logged-in FTP connection, or
+            an FTPConnectionPool to check sessions out of
+        remote_file: Remote file path
+        local_file: Local file path
+        segments: Number of byte ranges fetched concurrently
+        progress_callback: Callback function or ProgressAggregator for
+            aggregated progress updates
+        total_size: Total size of all files (for progress)
+        current_size: Current downloaded size
+        file_size: Remote file size, queried with SIZE when not given
+        retries: Number of extra attempts per segment
+        retry_delay: Seconds to wait before the first retry, doubled each time
+        hasher: InlineHasher fed with the whole file content; only
+            ``"crc32"`` is supported, each segment's CRC32 being combined
+            in order once all have arrived
+
+    Returns:
+        Updated current size after download
+
+    Raises:
+        ValueError: If ``hasher`` does not compute CRC32
+    """
+    if segments < 1:
+        raise ValueError(f"segments must be at least 1, got {segments}")
+    if hasher is not None and hasher.name != "crc32":
+        raise ValueError(
+            f"Segmented downloads can only be hashed with crc32, "
+            f"not {hasher.name}"
+        )
+
+    sessions = _ThreadSessions(ftp_factory)
+    segments = sessions.limit_workers(segments)
+    progress, owned = _as_progress(progress_callback, total_size, current_size)
+
+    def fetch(
+        start: int, end: int, segment_progress: _FileProgress, crc: _CRC32
+    ) -> None:
+        delay = retry_delay
+        for attempt in range(retries + 1):
+            # Resume after the bytes already written by earlier attempts
+            resume_at = start + segment_progress.current
+            try:
+                with sessions.session() as ftp:
+                    _download_segment(
+                        ftp,
+                        remote_file,
+                        fd,
+                        resume_at,
+                        end,
+                        segment_progress,
+                        crc=crc,
+                    )
+                return
+            except LocalFileError:
+                raise
+            except (error_temp, OSError, EOFError) as e:
+                if attempt == retries:
+                    raise
+                logger.warning(
+                    "Segment %d-%d of %s failed (attempt %d/%d), retrying: %s",
+                    resume_at,
+                    end,
+                    remote_file,
+                    attempt + 1,
+                    retries + 1,
+                    e,
+                )
+                time.sleep(delay)
+                delay *= 2
+
+    try:
+        if file_size is None:
+            with sessions.session() as ftp:
+                file_size = _binary_size(ftp, remote_file)
+        if file_size is None:
+            raise FileNotFoundError(f"Could not get size of {remote_file}")
+
+        segments = max(1, min(segments, file_size // MIN_SEGMENT_SIZE))
+        bounds = [file_size * i // segments for i in range(segments + 1)]
+
+        logger.info(
+            "Downloading file %s to %s in %d segments",
+            remote_file,
+            local_file,
+            segments,
+        )
+
+        with open(local_file, "wb") as f:
+            # Preallocate so every segment can write at its own offset
+            if not _preallocate(f, 0, file_size):
+                f.truncate(file_size)
+            fd = f.fileno()
+            ranges = [
+                (start, end, _FileProgress(progress), _CRC32())
+                for start, end in zip(bounds[:-1], bounds[1:])
+                if end > start
+            ]
+            try:
+                with ThreadPoolExecutor(max_workers=segments) as executor:
+                    futures = [
+                        executor.submit(fetch, *segment) for segment in ranges
+                    ]
+                    for future in futures:
+                        future.result()
+            except BaseException:
+                # Keep only the bytes received without a gap, so a resume
+                # from the local size never trusts unwritten zeros
+                received = 0
+                for start, end, segment_progress, _ in ranges:
+                    received = start + segment_progress.current
+                    if received < end:
+                        break
+                f.truncate(received)
+                raise
+    finally:
+        sessions.close_all()
+
+    if hasher is not None:
+        for start, end, _, crc in ranges:
+            hasher.combine_crc32(crc.value, end - start)
+    if owned:
+        progress.flush()
+    return current_size + file_size
+
+
+@_accepts_pool
+def download_ftp_folder(
+    ftp: FTP | FTPConnectionPool,
     remote_path: str,
     local_base_path: str,
     progress_callback=None,
     total_size=0,
     current_size=0,
+    tree: RemoteTree | None = None,
+    manifest: TransferManifest | None = None,
+    compress: bool = False,
+    file_filter: RemoteFilter | None = None,
 ) -> int:
     """
     Recursively download a folder from FTP server.
 
-    This function first checks if MLSD is supported. If so, it uses MLSD (RFC 3659)
-    which provides type information directly. Otherwise, it falls back to using
-    NLST and CWD commands to determine file and directory types.
+    The folder is walked once into a ``RemoteTree`` snapshot (MLSD when
+    supported, NLST and CWD probing otherwise) unless one is passed in,
+    then the local folders are created and the files downloaded in order.
 
     Args:
-        ftp: FTP connection
+        ftp: FTP connection or FTPConnectionPool
         remote_path: Remote folder path
         local_base_path: Base path where to create the folder
-        progress_callback: Callback function for progress updates
+        progress_callback: Callback function or ProgressAggregator for
+            progress updates
         total_size: Total size of all files (for progress)
         current_size: Current downloaded size
+        tree: Snapshot of ``remote_path`` to reuse instead of walking again
+        manifest: TransferManifest recording and verifying the digest of
+            every file
+        compress: Transfer the data deflated with MODE Z when supported
+        file_filter: RemoteFilter selecting the files to download when
+            the folder is walked here
 
     Returns:
         Total size of downloaded files
     """
-    # Extract folder name from remote path and create local path
-    remote_folder_name = Path(remote_path).name
-    local_path = Path(local_base_path) / remote_folder_name
+    if tree is None:
+        tree = build_remote_tree(ftp, remote_path, file_filter)
+    local_dirs, local_files = tree.download_plan(local_base_path)
 
-    logger.info("Downloading folder %s to %s", remote_path, local_path)
+    logger.info("Downloading folder %s to %s", remote_path, local_dirs[0])
 
-    if not local_path.exists():
-        local_path.mkdir(parents=True)
+    for local_dir in local_dirs:
+        local_dir.mkdir(parents=True, exist_ok=True)
 
-    if is_mlsd_supported(ftp):
-        # Use MLSD method (modern approach with type information)
+    progress, owned = _as_progress(progress_callback, total_size, current_size)
+    for entry, local_file in local_files:
+        with _hashing(manifest, ftp, entry.path, local_file) as hasher:
+            current_size = download_ftp_file(
+                ftp,
+                entry.path,
+                local_file,
+                progress,
+                total_size,
+                current_size,
+                file_size=entry.size,
+                hasher=hasher,
+                compress=compress,
+            )
+
+    if owned:
+        progress.flush()
+    return current_size
+
+
+class _ThreadSessions:
+    """
+    One FTP session per worker thread, created lazily by a factory.
+
+    With an ``FTPConnectionPool`` as factory, sessions are checked out of the
+    pool and handed back instead of being logged out. Tasks should take them
+    with ``session()``, which hands a pooled session back as soon as the task
+    ends, so concurrent calls sharing one pool never hold more sessions than
+    they are using and cannot starve each other.
+    """
+
+    def __init__(self, ftp_factory: "Callable[[], FTP] | FTPConnectionPool"):
+        self.ftp_factory = ftp_factory
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self) -> "FTPConnectionPool | None":
+        """The connection pool sessions come from, if any."""
+        if isinstance(self.ftp_factory, FTPConnectionPool):
+            return self.ftp_factory
+        return None
+
+    def limit_workers(self, workers: int) -> int:
+        """Cap a worker count to the sessions the pool can hand out."""
+        if self.pool is not None:
+            return min(workers, self.pool.max_sessions)
+        return workers
+
+    @contextmanager
+    def session(self, discard_on_error: bool = False) -> Iterator[FTP]:
+        """
+        Session for one task of the calling thread.
+
+        A pooled session is checked out for the task only. A session from a
+        plain factory stays with the thread until ``close_all``. Either is
+        discarded if it raised a connection error or an unexpected reply,
+        or any error with ``discard_on_error``.
+        """
+        pool = self.pool
+        if pool is None:
+            try:
+                yield self.get()
+            except (OSError, EOFError, error_reply, error_proto):
+                self.discard()
+                raise
+            except BaseException:
+                if discard_on_error:
+                    self.discard()
+                raise
+            return
+
+        ftp = pool.acquire(pool.acquire_timeout)
         try:
-            for item in ftp.mlsd(remote_path):
-                name, facts = item
-                if facts["type"] == "dir":
-                    # Recursively download subdirectories
-                    new_remote = f"{remote_path}/{name}"
-                    current_size = download_ftp_folder(
-                        ftp,
-                        new_remote,
-                        str(
-                            local_path
-                        ),  # Convert Path to str for recursive calls
-                        progress_callback,
-                        total_size,
-                        current_size,
-                    )
-                else:
-                    # Download file
-                    remote_file = f"{remote_path}/{name}"
-                    local_file = local_path / name
+            yield ftp
+        except (OSError, EOFError, error_reply, error_proto):
+            pool.release(ftp, discard=True)
+            raise
+        except BaseException:
+            pool.release(ftp, discard=discard_on_error, check=True)
+            raise
+        else:
+            pool.release(ftp)
+
+    def get(self) -> FTP:
+        """Return the calling thread's session, connecting if needed."""
+        ftp = getattr(self._local, "ftp", None)
+        if ftp is None:
+            ftp = self.ftp_factory()
+            self._local.ftp = ftp
+            with self._lock:
+                self._sessions.append(ftp)
+        return ftp
+
+    def _close(self, ftp: FTP, discard: bool) -> None:
+        if self.pool is not None:
+            self.pool.release(ftp, discard=discard)
+        elif discard:
+            ftp.close()
+        else:
+            try:
+                ftp.quit()
+            except Exception:  # pylint: disable=broad-except
+                ftp.close()
+
+    def _pop(self) -> FTP | None:
+        ftp = getattr(self._local, "ftp", None)
+        if ftp is not None:
+            self._local.ftp = None
+            with self._lock:
+                self._sessions.remove(ftp)
+        return ftp
+
+    def discard(self) -> None:
+        """Drop the calling thread's session so the next ``get`` reconnects."""
+        ftp = self._pop()
+        if ftp is not None:
+            self._close(ftp, discard=True)
+
+    def close_all(self) -> None:
+        """Log out of (or hand back) every session created so far."""
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for ftp in sessions:
+            self._close(ftp, discard=False)
+
+
+def _walk_listings(
+    ftp_factory: Callable[[], FTP] | FTPConnectionPool,
+    remote_path: str,
+    workers: int,
+    file_filter: RemoteFilter | None = None,
+) -> Iterator[tuple[list[RemoteEntry], int]]:
+    """
+    List a remote tree breadth-first over several concurrent sessions.
 
-                    current_size = download_ftp_file(
-                        ftp,
-                        remote_file,
-                        local_file,
-                        progress_callback,
-                        total_size,
-                        current_size,
-                    )
-        except (error_perm, error_temp) as e:
-            logger.debug(
-                "MLSD failed for %s despite being supported: %s",
-                remote_path,
-                e,
-            )
-            # Fall through to fallback method
-    else:
-        # Fallback to using NLST and CWD commands
+    With a ``file_filter`` only selected files are yielded and pruned
+    directories are not listed.
+
+    Yields:
+        The entries of each listed directory, as soon as its listing
+        completes, and the number of directories still being listed
+    """
+    sessions = _ThreadSessions(ftp_factory)
+    workers = sessions.limit_workers(workers)
+
+    def list_dir(path: str) -> list[RemoteEntry]:
+        with sessions.session() as ftp:
+            return _list_remote_dir(ftp, path)
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = {executor.submit(list_dir, remote_path)}
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            done = list(done)
+            for i, future in enumerate(done):
+                entries = future.result()
+                if file_filter is not None:
+                    entries = file_filter.apply(remote_path, entries)
+                for entry in entries:
+                    if entry.is_dir:
+                        pending.add(executor.submit(list_dir, entry.path))
+                # Listings completed but not yielded yet are still pending
+                yield entries, len(pending) + len(done) - i - 1
+    finally:
+        # Also reached when the caller stops iterating early
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+        sessions.close_all()
+
+
+def walk_ftp_tree(
+    ftp_factory: Callable[[], FTP] | FTPConnectionPool,
+    remote_path: str,
+    workers: int = 4,
+    file_filter: RemoteFilter | None = None,
+) -> Iterator[RemoteEntry]:
+    """
+    Walk a remote folder issuing MLSD for many directories at once.
+
+    Directories are listed breadth-first over ``workers`` concurrent
+    sessions, and entries are streamed back as each listing completes, so
+    their order is not deterministic.
+
+    Args:
+        ftp_factory: Callable returning a new logged-in FTP connection, or
+            an FTPConnectionPool to check sessions out of
+        remote_path: Remote folder path
+        workers: Number of concurrent listing sessions
+        file_filter: RemoteFilter selecting files and pruning directories
+            during the walk
+
+    Yields:
+        RemoteEntry: Every file and directory below ``remote_path``
+    """
+    for entries, _ in _walk_listings(
+        ftp_factory, remote_path, workers, file_filter
+    ):
+        yield from entries
+
+
+@dataclass(frozen=True)
+class FolderSizeEstimate:
+    """Running totals reported by ``estimate_ftp_folder_size``."""
+
+    size: int
+    files: int
+    dirs_listed: int
+    dirs_pending: int
+
+    @property
+    def complete(self) -> bool:
+        """True once every directory has been listed."""
+        return self.dirs_pending == 0
+
+    @property
+    def projected_size(self) -> int:
+        """Size extrapolated from the average per listed directory."""
+        if self.complete:
+            return self.size
+        listed = max(self.dirs_listed, 1)
+        return self.size * (listed + self.dirs_pending) // listed
+
+
+def estimate_ftp_folder_size(
+    ftp_factory: Callable[[], FTP] | FTPConnectionPool,
+    remote_path: str,
+    workers: int = 4,
+    interval: float = 0.5,
+    file_filter: RemoteFilter | None = None,
+) -> Iterator[FolderSizeEstimate]:
+    """
+    Size a remote folder, reporting running totals before the walk finishes.
+
+    Args:
+        ftp_factory: Callable returning a new logged-in FTP connection, or
+            an FTPConnectionPool to check sessions out of
+        remote_path: Remote folder path
+        workers: Number of concurrent listing sessions
+        interval: Minimum seconds between two intermediate estimates
+        file_filter: RemoteFilter selecting the files to count
+
+    Yields:
+        FolderSizeEstimate: Totals so far, the last one with ``complete``
+    """
+    size = files = dirs_listed = 0
+    last_report = time.monotonic()
+    for entries, dirs_pending in _walk_listings(
+        ftp_factory, remote_path, workers, file_filter
+    ):
+        dirs_listed += 1
+        for entry in entries:
+            if not entry.is_dir:
+                files += 1
+                size += entry.size or 0
+        now = time.monotonic()
+        if dirs_pending == 0 or now - last_report >= interval:
+            last_report = now
+            yield FolderSizeEstimate(size, files, dirs_listed, dirs_pending)
+
+
+def build_remote_tree_concurrent(
+    ftp_factory: Callable[[], FTP] | FTPConnectionPool,
+    remote_path: str,
+    workers: int = 4,
+    file_filter: RemoteFilter | None = None,
+) -> RemoteTree:
+    """
+    Snapshot a remote file or folder with a concurrent breadth-first walk.
+
+    Same result as ``build_remote_tree``, with the directories listed over
+    ``workers`` sessions by ``walk_ftp_tree``.
+
+    Args:
+        ftp_factory: Callable returning a new logged-in FTP connection, or
+            an FTPConnectionPool to check sessions out of
+        remote_path: Remote file or folder path
+        workers: Number of concurrent listing sessions
+        file_filter: RemoteFilter selecting files and pruning directories
+            during the walk
+
+    Returns:
+        RemoteTree: Snapshot of the path and, for folders, everything below
+    """
+    entries = []
+    try:
+        entries.extend(
+            walk_ftp_tree(ftp_factory, remote_path, workers, file_filter)
+        )
+    except (error_perm, error_temp):
+        if entries:
+            raise
+        # The root itself could not be listed, it may be a file
+        sessions = _ThreadSessions(ftp_factory)
         try:
-            original_dir = ftp.pwd()
+            with sessions.session() as ftp:
+                return build_remote_tree(ftp, remote_path, file_filter)
+        finally:
+            sessions.close_all()
+
+    # Sorting by path puts every directory before its contents
+    entries.sort(key=lambda entry: entry.path)
+    if file_filter is not None:
+        entries = _drop_empty_dirs(entries)
+    return RemoteTree(RemoteEntry(remote_path, "dir"), entries)
+
+
+def download_ftp_folder_parallel(
+    ftp_factory: Callable[[], FTP] | FTPConnectionPool,
+    remote_path: str,
+    local_base_path: str,
+    workers: int = 4,
+    progress_callback=None,
+    total_size=0,
+    current_size=0,
+    tree: RemoteTree | None = None,
+    manifest: TransferManifest | None = None,
+    compress: bool = False,
+    file_filter: RemoteFilter | None = None,
+) -> int:
+    """
+    Download a folder from FTP server over several concurrent sessions.
+
+    The remote tree is walked once on a single session (or taken from
+    ``tree``), then the files are spread over a pool of ``workers`` threads,
+    each with its own logged-in FTP session created by ``ftp_factory``.
+
+    Args:
+        ftp_factory: Callable returning a new logged-in FTP connection, or
+            an FTPConnectionPool to check sessions out of
+        remote_path: Remote folder path
+        local_base_path: Base path where to create the folder
+        workers: Number of concurrent FTP sessions
+        progress_callback: Callback function or ProgressAggregator for
+            aggregated progress updates
+        total_size: Total size of all files (for progress)
+        current_size: Current downloaded size
+        tree: Snapshot of ``remote_path`` to reuse instead of walking again
+        manifest: TransferManifest recording and verifying the digest of
+            every file
+        compress: Transfer the data deflated with MODE Z when supported
+        file_filter: RemoteFilter selecting the files to download when
+            the folder is walked here
+
+    Returns:
+        Total size of downloaded files
+    """
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+
+    sessions = _ThreadSessions(ftp_factory)
+    workers = sessions.limit_workers(workers)
+    progress, owned = _as_progress(progress_callback, total_size, current_size)
+
+    def download_one(entry: RemoteEntry, local_file: Path) -> int:
+        with sessions.session() as ftp, _hashing(
+            manifest, ftp, entry.path, local_file
+        ) as hasher:
+            return download_ftp_file(
+                ftp,
+                entry.path,
+                local_file,
+                progress_callback=progress,
+                total_size=total_size,
+                file_size=entry.size,
+                hasher=hasher,
+                compress=compress,
+            )
+
+    try:
+        if tree is None:
+            with sessions.session() as ftp:
+                tree = build_remote_tree(ftp, remote_path, file_filter)
+        local_dirs, local_files = tree.download_plan(local_base_path)
+
+        logger.info(
+            "Downloading folder %s to %s with %d sessions",
+            remote_path,
+            local_dirs[0],
+            workers,
+        )
+
+        for local_dir in local_dirs:
+            local_dir.mkdir(parents=True, exist_ok=True)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(download_one, entry, local_file)
+                for entry, local_file in local_files
+            ]
+            try:
+                for future in futures:
+                    current_size += future.result()
+            except BaseException:
+                # Stop scheduling the remaining files on first failure
+                for future in futures:
+                    future.cancel()
+                raise
+    finally:
+        sessions.close_all()
+
+    if owned:
+        progress.flush()
+    return current_size
+
+
+SYNC_MANIFEST_SUFFIX = ".ftp-manifest.json"
+
+
+@dataclass
+class SyncResult:
+    """Outcome of a ``sync_ftp_folder`` run."""
+
+    files_transferred: int = 0
+    files_resumed: int = 0
+    files_skipped: int = 0
+    bytes_transferred: int = 0
+    bytes_skipped: int = 0
+
+
+def _load_sync_manifest(manifest_path: Path, remote_path: str) -> dict:
+    """Read the per-file facts recorded by a previous sync of the folder."""
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable manifest %s: %s", manifest_path, e)
+        return {}
+
+    if manifest.get("remote_path") != remote_path:
+        logger.info(
+            "Manifest %s belongs to %s, starting over",
+            manifest_path,
+            manifest.get("remote_path"),
+        )
+        return {}
+    return manifest.get("files", {})
+
+
+def _save_sync_manifest(
+    manifest_path: Path, remote_path: str, files: dict
+) -> None:
+    """Atomically write the per-file facts of the folder being synced."""
+    tmp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"remote_path": remote_path, "files": files}, f)
+    os.replace(tmp_path, manifest_path)
+
+
+@_accepts_pool
+def sync_ftp_folder(
+    ftp: FTP | FTPConnectionPool,
+    remote_path: str,
+    local_base_path: str,
+    manifest_path: str | None = None,
+    progress_callback=None,
+    tree: RemoteTree | None = None,
+    save_interval: float = 10.0,
+    save_every: int = 100,
+) -> SyncResult:
+    """
+    Incrementally mirror a folder from FTP server.
 
-            # Change to the target directory
-            ftp.cwd(remote_path)
+    A local JSON manifest records the remote size and MLSD ``modify`` fact of
+    every file. Files whose facts are unchanged since the last completed
+    download are skipped, and files left partially written by an interrupted
+    run are resumed with REST from their local size. Everything else is
+    downloaded again in full.
 
-            # List all items in the directory
-            try:
-                item_names = ftp.nlst()
-            except (error_perm, error_temp):
-                # If NLST fails, directory might be empty
-                item_names = []
+    The manifest is rewritten atomically before the first transfer, then
+    before a transfer whenever ``save_interval`` seconds or ``save_every``
+    files have gone by, and at the end, so even a killed run leaves the
+    file it was writing recorded as partial.
 
-            # Process each item
-            for name in item_names:
-                try:
-                    # Try to change to the item (to check if it's a directory)
-                    ftp.cwd(name)
-                    # If successful, it's a directory, so change back and recurse
-                    ftp.cwd("..")  # Go back one level
-                    new_remote = f"{remote_path}/{name}"
-                    current_size = download_ftp_folder(
-                        ftp,
-                        new_remote,
-                        str(
-                            local_path
-                        ),  # Convert Path to str for recursive calls
-                        progress_callback,
-                        total_size,
-                        current_size,
-                    )
-                except (error_perm, error_temp):
-                    # If changing directory fails, it's likely a file
-                    # Download the file
-                    remote_file = f"{remote_path}/{name}"
-                    local_file = local_path / name
+    Args:
+        ftp: FTP connection or FTPConnectionPool
+        remote_path: Remote folder path
+        local_base_path: Base path where to create the folder
+        manifest_path: Manifest file, defaults to
+            ``<local_base_path>/<folder name>.ftp-manifest.json``
+        progress_callback: Callback function or ProgressAggregator for
+            progress updates
+        tree: Snapshot of ``remote_path`` to reuse instead of walking again
+        save_interval: Seconds between two intermediate manifest writes
+        save_every: Files transferred between two intermediate manifest
+            writes
 
-                    # Change back to the parent directory before downloading
-                    # We need to go back to the original remote_path directory
-                    ftp.cwd("..")
+    Returns:
+        SyncResult: Counts of files and bytes transferred vs skipped
+    """
+    if tree is None:
+        tree = build_remote_tree(ftp, remote_path)
+    local_dirs, local_files = tree.download_plan(local_base_path)
 
-                    current_size = download_ftp_file(
-                        ftp,
-                        remote_file,
-                        local_file,
-                        progress_callback,
-                        total_size,
-                        current_size,
-                    )
+    if manifest_path is None:
+        manifest_path = Path(local_base_path) / (
+            PurePosixPath(remote_path).name + SYNC_MANIFEST_SUFFIX
+        )
+    manifest_path = Path(manifest_path)
+    previous = _load_sync_manifest(manifest_path, remote_path)
+    # Only files present on the server survive into the new manifest
+    files = {}
+
+    logger.info(
+        "Syncing folder %s to %s (manifest %s)",
+        remote_path,
+        local_dirs[0],
+        manifest_path,
+    )
 
-            # Return to the original directory
-            ftp.cwd(original_dir)
-        except (error_perm, error_temp) as fallback_error:
-            logger.error(
-                "Fallback method failed for %s: %s",
-                remote_path,
-                fallback_error,
-            )
-            raise
+    for local_dir in local_dirs:
+        local_dir.mkdir(parents=True, exist_ok=True)
+
+    result = SyncResult()
+    plan = []
+    for entry, local_file in local_files:
+        key = tree.relative_path(entry)
+        facts = {"size": entry.size, "modify": entry.modify}
+        record = previous.get(key)
+        unchanged = (
+            record is not None
+            and entry.modify is not None
+            and record.get("size") == entry.size
+            and record.get("modify") == entry.modify
+        )
+        local_size = local_file.stat().st_size if local_file.exists() else -1
+
+        if unchanged and record.get("complete") and local_size == entry.size:
+            files[key] = record
+            result.files_skipped += 1
+            result.bytes_skipped += entry.size or 0
+        elif unchanged and 0 < local_size < (entry.size or 0):
+            plan.append((key, facts, entry, local_file, local_size))
+        else:
+            plan.append((key, facts, entry, local_file, 0))
 
-    return current_size
+    total_size = sum(
+        (facts["size"] or 0) - offset for _, facts, _, _, offset in plan
+    )
+    current_size = 0
+
+    progress, owned = _as_progress(progress_callback, total_size)
+    if progress is not None:
+        progress.flush("Starting folder sync")
+
+    def save() -> None:
+        # Files not reached keep their previous record so they can resume
+        snapshot = dict(files)
+        for key, _, _, _, _ in plan:
+            if key not in snapshot and key in previous:
+                snapshot[key] = previous[key]
+        _save_sync_manifest(manifest_path, remote_path, snapshot)
+
+    last_save = None
+    unsaved = 0
+    try:
+        for key, facts, entry, local_file, offset in plan:
+            # Recorded before the transfer so an interrupted file can resume
+            files[key] = {**facts, "complete": False}
+            if (
+                last_save is None
+                or unsaved >= save_every
+                or time.monotonic() - last_save >= save_interval
+            ):
+                save()
+                last_save = time.monotonic()
+                unsaved = 0
+            unsaved += 1
+            if offset:
+                logger.info(
+                    "Resuming %s at byte %d of %s",
+                    entry.path,
+                    offset,
+                    entry.size,
+                )
+                result.files_resumed += 1
+                result.bytes_skipped += offset
+            else:
+                result.files_transferred += 1
+
+            done = download_ftp_file(
+                ftp,
+                entry.path,
+                local_file,
+                progress,
+                total_size,
+                current_size,
+                offset=offset,
+                file_size=entry.size,
+            )
+            result.bytes_transferred += done - current_size
+            current_size = done
+            files[key]["complete"] = True
+    finally:
+        save()
+
+    if owned:
+        progress.flush()
+    logger.info(
+        "Synced folder %s: %d bytes transferred, %d bytes skipped",
+        remote_path,
+        result.bytes_transferred,
+        result.bytes_skipped,
+    )
+    return result
 
 
 def download_ftp(
-    ftp: FTP,
+    ftp: FTP | FTPConnectionPool,
     remote_path: str,
     local_base_path: str,
     progress_callback=None,
+    ftp_factory: Callable[[], FTP] | FTPConnectionPool | None = None,
+    workers: int = 1,
+    manifest: TransferManifest | None = None,
+    compress: bool = False,
+    file_filter: RemoteFilter | None = None,
 ) -> None:
     """
     Download a file or folder from FTP server automatically detecting the type.
 
+    The remote path is walked once into a ``RemoteTree`` snapshot that
+    answers the type check, the total size and the download plan. When an
+    ``ftp_factory`` is given, the walk lists directories concurrently (see
+    ``build_remote_tree_concurrent``), folders are downloaded over
+    ``workers`` concurrent sessions (see ``download_ftp_folder_parallel``)
+    and single files as ``workers`` byte ranges (see
+    ``download_ftp_file_segmented``).
+
     Args:
-        ftp: FTP connection
+        ftp: FTP connection or FTPConnectionPool
         remote_path: Remote file or folder path
         local_base_path: Base path where to create the file or folder
-        progress_callback: Callback function for progress updates
+        progress_callback: Callback function or ProgressAggregator for
+            progress updates
+        ftp_factory: Callable returning a new logged-in FTP connection, or
+            an FTPConnectionPool to check sessions out of; defaults to
+            ``ftp`` when that is a pool
+        workers: Number of concurrent FTP sessions or file segments
+        manifest: TransferManifest recording and verifying the digest of
+            every file, written to its ``path`` at the end if set; single
+            files are only segmented with ``"crc32"``, whose per-segment
+            values combine, and downloaded in one stream otherwise
+        compress: Transfer the data deflated with MODE Z when supported;
+            single files are then downloaded in one stream, not segmented
+        file_filter: RemoteFilter selecting the files to download; pruned
+            directories are not even listed and the progress total only
+            counts selected files
 
     Returns:
         None
     """
+    if isinstance(ftp, FTPConnectionPool) and ftp_factory is None:
+        ftp_factory = ftp
+
     try:
+        if ftp_factory is not None and workers > 1:
+            tree = build_remote_tree_concurrent(
+                ftp_factory, remote_path, workers, file_filter
+            )
+        else:
+            tree = build_remote_tree(ftp, remote_path, file_filter)
+
+        if tree.is_dir and tree.total_size == 0:
+            if file_filter:
+                reason = "has no file matching the filter"
+            else:
+                reason = "is empty"
+            raise FileNotFoundError(
+                f"Folder {remote_path} {reason} on FTP server "
+                f"{_server_location(ftp)}"
+            )
+        if (
+            not tree.is_dir
+            and file_filter is not None
+            and not file_filter.selects(
+                tree.root, PurePosixPath(remote_path).name
+            )
+        ):
+            raise FileNotFoundError(
+                f"File {remote_path} does not match the filter"
+            )
+        if not tree.is_dir and tree.root.size is None:
+            raise FileNotFoundError(
+                f"File {remote_path} not found on FTP server "
+                f"{_server_location(ftp)}"
+            )
+
         # Check if it's a folder
-        if is_remote_folder(ftp, remote_path):
+        if tree.is_dir:
             logger.info(
                 "Starting folder download task for %s (%s)",
                 remote_path,
@@ -365,27 +2679,36 @@ def download_ftp(
             )
 
             # Calculate total size for progress tracking
-            total_size = get_ftp_folder_size(ftp, remote_path)
-
-            if total_size == 0:
-                raise FileNotFoundError(
-                    f"Folder {remote_path} is empty on FTP server "
-                    f"{ftp.host}:{ftp.port}/{ftp.pwd()}"
-                )
+            total_size = tree.total_size
 
             # Call initial progress update
-            if progress_callback:
-                progress_callback(
-                    0, total_size, message="Starting folder download"
+            progress, owned = _as_progress(progress_callback, total_size)
+            if progress is not None:
+                progress.flush("Starting folder download")
+
+            if ftp_factory is not None and workers > 1:
+                download_ftp_folder_parallel(
+                    ftp_factory,
+                    remote_path,
+                    local_base_path,
+                    workers=workers,
+                    progress_callback=progress,
+                    total_size=total_size,
+                    tree=tree,
+                    manifest=manifest,
+                    compress=compress,
+                )
+            else:
+                download_ftp_folder(
+                    ftp,
+                    remote_path,
+                    local_base_path,
+                    progress_callback=progress,
+                    total_size=total_size,
+                    tree=tree,
+                    manifest=manifest,
+                    compress=compress,
                 )
-
-            download_ftp_folder(
-                ftp,
-                remote_path,
-                local_base_path,
-                progress_callback=progress_callback,
-                total_size=total_size,
-            )
         else:
             # It's a file, use download_ftp_file
             logger.info(
@@ -395,26 +2718,47 @@ def download_ftp(
             )
             local_path = Path(local_base_path) / Path(remote_path).name
 
-            total_size = ftp.size(remote_path)
-            if total_size is None:
-                raise FileNotFoundError(
-                    f"File {remote_path} not found on FTP server "
-                    f"{ftp.host}:{ftp.port}/{ftp.pwd()}"
-                )
+            total_size = tree.total_size
 
             # Call initial progress update
-            if progress_callback:
-                progress_callback(
-                    0, total_size, message="Starting file download"
-                )
+            progress, owned = _as_progress(progress_callback, total_size)
+            if progress is not None:
+                progress.flush("Starting file download")
+
+            with _hashing(manifest, ftp, remote_path, local_path) as hasher:
+                if (
+                    ftp_factory is not None
+                    and workers > 1
+                    and not compress
+                    # Only CRC32s of ranges hashed apart can be combined
+                    and (hasher is None or hasher.name == "crc32")
+                ):
+                    download_ftp_file_segmented(
+                        ftp_factory,
+                        remote_path,
+                        local_path,
+                        segments=workers,
+                        progress_callback=progress,
+                        total_size=total_size,
+                        file_size=total_size,
+                        hasher=hasher,
+                    )
+                else:
+                    download_ftp_file(
+                        ftp,
+                        remote_path,
+                        local_path,
+                        progress_callback=progress,
+                        total_size=total_size,
+                        file_size=total_size,
+                        hasher=hasher,
+                        compress=compress,
+                    )
 
-            download_ftp_file(
-                ftp,
-                remote_path,
-                local_path,
-                progress_callback=progress_callback,
-                total_size=total_size,
-            )
+        if owned:
+            progress.flush()
+        if manifest is not None and manifest.path is not None:
+            manifest.save()
     except Exception as e:
         logger.error(
             "Error downloading %s: %s",
@@ -425,64 +2769,151 @@ def download_ftp(
         raise e
 
 
+class _LocalReader:
+    """Binary file whose read errors are raised as ``LocalFileError``."""
+
+    def __init__(self, f):
+        self._f = f
+
+    def read(self, size: int = -1) -> bytes:
+        try:
+            return self._f.read(size)
+        except OSError as e:
+            raise LocalFileError.wrap(e, self._f.name) from e
+
+
+class _DeflateReader:
+    """File-like object deflating a local file as ``storbinary`` reads it."""
+
+    def __init__(self, f, callback: Callable[[bytes], None] | None = None):
+        self._f = f
+        self._callback = callback
+        self._compressor = zlib.compressobj()
+
+    def read(self, size: int = -1) -> bytes:
+        """Return the next non-empty deflated chunk, ``b""`` at the end."""
+        while self._compressor is not None:
+            data = self._f.read(size)
+            if not data:
+                tail = self._compressor.flush()
+                self._compressor = None
+                return tail
+            if self._callback is not None:
+                self._callback(data)
+            deflated = self._compressor.compress(data)
+            if deflated:
+                return deflated
+        return b""
+
+
+@_accepts_pool
 def upload_ftp_file(
-    ftp: FTP,
+    ftp: FTP | FTPConnectionPool,
     local_file: Path,
     remote_file: str,
     progress_callback=None,
     total_size=0,
     current_size=0,
+    blocksize: int = DEFAULT_BLOCKSIZE,
+    hasher: InlineHasher | None = None,
+    compress: bool = False,
 ) -> int:
     """
     Upload a single file to FTP server.
 
+    With ``compress`` the data channel is switched to MODE Z and the file
+    deflated as it is read, falling back to stream mode if the server does
+    not support it.
+
     Args:
-        ftp: FTP connection
+        ftp: FTP connection or FTPConnectionPool
         local_file: Local file path
         remote_file: Remote file path
-        progress_callback: Callback function for progress updates
+        progress_callback: Callback function or ProgressAggregator for
+            progress updates
         total_size: Total size of all files (for progress)
         current_size: Current uploaded size
+        blocksize: Bytes read from the local file and sent per write
+        hasher: InlineHasher fed with every block as it is sent
+        compress: Transfer the data deflated with MODE Z when supported
 
     Returns:
         Updated current size after upload
+
+    Raises:
+        LocalFileError: If ``local_file`` cannot be opened or read
     """
 
     logger.info("Uploading file %s to %s", local_file, remote_file)
 
-    def upload_callback(data, total_size=total_size):
-        nonlocal current_size
-        current_size += len(data)
-        if progress_callback:
-            progress_callback(
-                current_size,
-                total_size,
-                message=f"Starting file upload: {local_file.name} to {remote_file} - {current_size}/{total_size} bytes",
-            )
+    progress, owned = _as_progress(progress_callback, total_size, current_size)
+
+    upload_callback = None
+    if progress is not None or hasher is not None:
+        update = progress.update if progress is not None else None
+        hash_update = hasher.update if hasher is not None else None
+
+        def upload_callback(data):
+            if hash_update is not None:
+                hash_update(data)
+            if update is not None:
+                update(len(data), remote_file)
+
+    compressed = compress and _set_transfer_mode(ftp, "Z")
+    if not compressed:
+        _set_transfer_mode(ftp, "S")
 
-    with open(local_file, "rb") as f:
-        ftp.storbinary(f"STOR {remote_file}", f, callback=upload_callback)
+    try:
+        f = open(local_file, "rb")
+    except OSError as e:
+        raise LocalFileError.wrap(e, local_file) from e
+    with f:
+        reader = _LocalReader(f)
+        if compressed:
+            # Progress and hashes count the uncompressed blocks as read
+            ftp.storbinary(
+                f"STOR {remote_file}",
+                _DeflateReader(reader, upload_callback),
+                blocksize=blocksize,
+            )
+        else:
+            ftp.storbinary(
+                f"STOR {remote_file}",
+                reader,
+                blocksize=blocksize,
+                callback=upload_callback,
+            )
+        current_size += f.tell()
+    if owned:
+        progress.flush()
     return current_size
 
 
+@_accepts_pool
 def upload_ftp_folder(
-    ftp: FTP,
+    ftp: FTP | FTPConnectionPool,
     local_path: str,
     remote_base_path: str,
     progress_callback=None,
     total_size=0,
     current_size=0,
+    manifest: TransferManifest | None = None,
+    compress: bool = False,
 ) -> int:
     """
     Recursively upload a folder to FTP server.
 
     Args:
-        ftp: FTP connection
+        ftp: FTP connection or FTPConnectionPool
         local_path: Local folder path to upload
         remote_base_path: Base path on remote server where to upload the folder
-        progress_callback: Callback function for progress updates
+        progress_callback: Callback function or ProgressAggregator for
+            progress updates
         total_size: Total size of all files (for progress)
         current_size: Current uploaded size
+        manifest: TransferManifest recording and verifying the digest of
+            every file
+        compress: Transfer the data deflated with MODE Z when supported
 
     Returns:
         Total size of uploaded files
@@ -507,6 +2938,10 @@ def upload_ftp_folder(
     # Save current directory and change to the remote directory
     original_cwd = ftp.pwd()
     ftp.cwd(remote_path)
+    # Absolute path to ask the server for digests, manifests use it as key
+    remote_dir = ftp.pwd() if manifest is not None else remote_path
+
+    progress, owned = _as_progress(progress_callback, total_size, current_size)
 
     try:
         # Iterate through local directory contents
@@ -517,45 +2952,211 @@ def upload_ftp_folder(
                     ftp,
                     str(item),
                     "",  # Empty string as we've already changed to the remote directory
-                    progress_callback,
+                    progress,
                     total_size,
                     current_size,
+                    manifest,
+                    compress,
                 )
             else:
                 # Upload file
-                current_size = upload_ftp_file(
-                    ftp,
-                    item,
-                    item.name,
-                    progress_callback,
-                    total_size,
-                    current_size,
-                )
+                with _hashing(
+                    manifest, ftp, _join_remote(remote_dir, item.name), item
+                ) as hasher:
+                    current_size = upload_ftp_file(
+                        ftp,
+                        item,
+                        item.name,
+                        progress,
+                        total_size,
+                        current_size,
+                        hasher=hasher,
+                        compress=compress,
+                    )
     finally:
         # Always return to the original directory
         ftp.cwd(original_cwd)
 
+    if owned:
+        progress.flush()
+    return current_size
+
+
+def _make_remote_dirs(ftp: FTP, remote_dirs: list[str]) -> None:
+    """Create remote directories in order, ignoring ones that already exist."""
+    for remote_dir in remote_dirs:
+        try:
+            ftp.mkd(remote_dir)
+        except error_perm:
+            # Directory might already exist, that's fine
+            pass
+
+
+def upload_ftp_folder_parallel(
+    ftp_factory: Callable[[], FTP] | FTPConnectionPool,
+    local_path: str,
+    remote_base_path: str,
+    workers: int = 4,
+    progress_callback=None,
+    total_size=0,
+    current_size=0,
+    retries: int = 3,
+    retry_delay: float = 1.0,
+    manifest: TransferManifest | None = None,
+    compress: bool = False,
+) -> int:
+    """
+    Upload a folder to FTP server over several concurrent sessions.
+
+    The whole remote directory skeleton is created up front on one session,
+    then the file STORs are spread over a pool of ``workers`` threads, each
+    with its own logged-in FTP session created by ``ftp_factory``. A file
+    failing with a temporary (4xx) error, a dropped connection or a checksum
+    mismatch is uploaded again from the start, up to ``retries`` times. A
+    local file that cannot be read fails the upload at once.
+
+    Args:
+        ftp_factory: Callable returning a new logged-in FTP connection, or
+            an FTPConnectionPool to check sessions out of
+        local_path: Local folder path to upload
+        remote_base_path: Base path on remote server where to upload the folder
+        workers: Number of concurrent FTP sessions
+        progress_callback: Callback function or ProgressAggregator for
+            aggregated progress updates
+        total_size: Total size of all files (for progress)
+        current_size: Current uploaded size
+        retries: Number of extra attempts per file
+        retry_delay: Seconds to wait before the first retry, doubled each time
+        manifest: TransferManifest recording and verifying the digest of
+            every file
+        compress: Transfer the data deflated with MODE Z when supported
+
+    Returns:
+        Total size of uploaded files
+    """
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+
+    local_root = Path(local_path)
+    remote_path = _join_remote(remote_base_path, local_root.name)
+
+    logger.info(
+        "Uploading folder %s to %s with %d sessions",
+        local_path,
+        remote_path,
+        workers,
+    )
+
+    remote_dirs = [remote_path]
+    local_files = []
+    for item in sorted(local_root.rglob("*")):
+        remote_item = _join_remote(
+            remote_path, item.relative_to(local_root).as_posix()
+        )
+        if item.is_dir():
+            remote_dirs.append(remote_item)
+        else:
+            local_files.append((item, remote_item))
+
+    sessions = _ThreadSessions(ftp_factory)
+    workers = sessions.limit_workers(workers)
+    progress, owned = _as_progress(progress_callback, total_size, current_size)
+
+    def upload_one(local_file: Path, remote_file: str) -> int:
+        file_progress = _FileProgress(progress)
+        delay = retry_delay
+        for attempt in range(retries + 1):
+            try:
+                with sessions.session() as ftp, _hashing(
+                    manifest, ftp, remote_file, local_file
+                ) as hasher:
+                    return upload_ftp_file(
+                        ftp,
+                        local_file,
+                        remote_file,
+                        progress_callback=file_progress,
+                        total_size=total_size,
+                        hasher=hasher,
+                        compress=compress,
+                    )
+            except LocalFileError:
+                # Another attempt would read the same file again
+                raise
+            except all_errors as e:
+                if attempt == retries or isinstance(e, error_perm):
+                    raise
+                logger.warning(
+                    "Upload of %s failed (attempt %d/%d), retrying: %s",
+                    local_file,
+                    attempt + 1,
+                    retries + 1,
+                    e,
+                )
+                file_progress.rollback()
+                time.sleep(delay)
+                delay *= 2
+
+    try:
+        with sessions.session() as ftp:
+            _make_remote_dirs(ftp, remote_dirs)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(upload_one, local_file, remote_file)
+                for local_file, remote_file in local_files
+            ]
+            try:
+                for future in futures:
+                    current_size += future.result()
+            except BaseException:
+                # Stop scheduling the remaining files on first failure
+                for future in futures:
+                    future.cancel()
+                raise
+    finally:
+        sessions.close_all()
+
+    if owned:
+        progress.flush()
     return current_size
 
 
 def upload_ftp(
-    ftp: FTP,
+    ftp: FTP | FTPConnectionPool,
     local_path: str,
     remote_base_path: str,
     progress_callback=None,
+    ftp_factory: Callable[[], FTP] | FTPConnectionPool | None = None,
+    workers: int = 1,
+    manifest: TransferManifest | None = None,
+    compress: bool = False,
 ) -> None:
     """
     Upload a file or folder to FTP server automatically detecting the type.
 
+    Folders are uploaded over ``workers`` concurrent sessions when an
+    ``ftp_factory`` is given, see ``upload_ftp_folder_parallel``.
+
     Args:
-        ftp: FTP connection
+        ftp: FTP connection or FTPConnectionPool
         local_path: Local file or folder path
         remote_base_path: Base path on remote server where to upload
-        progress_callback: Callback function for progress updates (current, total)
+        progress_callback: Callback function (current, total, message) or
+            ProgressAggregator for progress updates
+        ftp_factory: Callable returning a new logged-in FTP connection, or
+            an FTPConnectionPool to check sessions out of; defaults to
+            ``ftp`` when that is a pool
+        workers: Number of concurrent FTP sessions for folder uploads
+        manifest: TransferManifest recording and verifying the digest of
+            every file, written to its ``path`` at the end if set
+        compress: Transfer the data deflated with MODE Z when supported
 
     Returns:
         None
     """
+    if isinstance(ftp, FTPConnectionPool) and ftp_factory is None:
+        ftp_factory = ftp
+
     try:
         path = Path(local_path)
 
@@ -578,18 +3179,31 @@ def upload_ftp(
                 )
 
             # Call initial progress update
-            if progress_callback:
-                progress_callback(
-                    0, total_size, message="Starting folder upload"
+            progress, owned = _as_progress(progress_callback, total_size)
+            if progress is not None:
+                progress.flush("Starting folder upload")
+
+            if ftp_factory is not None and workers > 1:
+                upload_ftp_folder_parallel(
+                    ftp_factory,
+                    local_path,
+                    remote_base_path,
+                    workers=workers,
+                    progress_callback=progress,
+                    total_size=total_size,
+                    manifest=manifest,
+                    compress=compress,
+                )
+            else:
+                upload_ftp_folder(
+                    ftp,
+                    local_path,
+                    remote_base_path,
+                    progress_callback=progress,
+                    total_size=total_size,
+                    manifest=manifest,
+                    compress=compress,
                 )
-
-            upload_ftp_folder(
-                ftp,
-                local_path,
-                remote_base_path,
-                progress_callback=progress_callback,
-                total_size=total_size,
-            )
         else:
             # It's a file, use upload_ftp_file
             logger.info(
@@ -604,22 +3218,30 @@ def upload_ftp(
                 )
 
             # Call initial progress update
-            if progress_callback:
-                progress_callback(
-                    0, total_size, message="Starting file upload"
+            progress, owned = _as_progress(progress_callback, total_size)
+            if progress is not None:
+                progress.flush("Starting file upload")
+
+            remote_file = (
+                path.name
+                if not remote_base_path
+                else f"{remote_base_path}/{path.name}"
+            )
+            with _hashing(manifest, ftp, remote_file, path) as hasher:
+                upload_ftp_file(
+                    ftp,
+                    path,
+                    remote_file,
+                    progress_callback=progress,
+                    total_size=total_size,
+                    hasher=hasher,
+                    compress=compress,
                 )
 
-            upload_ftp_file(
-                ftp,
-                path,
-                (
-                    path.name
-                    if not remote_base_path
-                    else f"{remote_base_path}/{path.name}"
-                ),
-                progress_callback=progress_callback,
-                total_size=total_size,
-            )
+        if owned:
+            progress.flush()
+        if manifest is not None and manifest.path is not None:
+            manifest.save()
     except Exception as e:
         logger.error(
             "Error uploading %s: %s",
@@ -628,3 +3250,355 @@ def upload_ftp(
             exc_info=True,
         )
         raise e
+
+
+class _RelayCancelled(Exception):
+    """Raised in the reading side of a relay when the writing side failed."""
+
+
+class _ChunkPipe:
+    """
+    Bounded queue of data chunks read like a file by ``storbinary``.
+
+    The reading side of a relay ``put``s chunks, the writing side ``read``s
+    them. Errors on either side are handed over so neither blocks forever.
+    """
+
+    _EOF = object()
+
+    def __init__(self, maxsize: int):
+        self._chunks = queue.Queue(maxsize)
+        self._cancelled = threading.Event()
+        self._eof = False
+
+    def put(self, data) -> None:
+        """Queue a chunk, waiting while the queue is full."""
+        while True:
+            if self._cancelled.is_set():
+                raise _RelayCancelled()
+            try:
+                self._chunks.put(data, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def close(self, error: BaseException | None = None) -> None:
+        """Mark the end of the data, or hand over the reading side's error."""
+        try:
+            self.put(self._EOF if error is None else error)
+        except _RelayCancelled:
+            pass
+
+    def cancel(self) -> None:
+        """Make the reading side stop at its next chunk."""
+        self._cancelled.set()
+
+    def read(self, size: int = -1) -> bytes:
+        """Return the next chunk, ``b""`` at the end of the data."""
+        if self._eof:
+            return b""
+        chunk = self._chunks.get()
+        if chunk is self._EOF:
+            self._eof = True
+            return b""
+        if isinstance(chunk, BaseException):
+            self._eof = True
+            raise chunk
+        return chunk
+
+
+def relay_ftp_file(
+    src_ftp: FTP,
+    dst_ftp: FTP,
+    src_file: str,
+    dst_file: str,
+    progress_callback=None,
+    total_size=0,
+    current_size=0,
+    queue_size: int = 16,
+    blocksize: int = DEFAULT_BLOCKSIZE,
+) -> int:
+    """
+    Copy a file from one FTP server to another without touching local disk.
+
+    ``retrbinary`` chunks from the source session are handed through a
+    bounded in-memory queue straight into ``storbinary`` on the destination
+    session, so at most ``queue_size`` blocks are buffered. If either side
+    fails the transfer is abandoned and both sessions should be discarded.
+
+    Args:
+        src_ftp: FTP connection to read from
+        dst_ftp: FTP connection to write to
+        src_file: Remote file path on the source server
+        dst_file: Remote file path on the destination server
+        progress_callback: Callback function or ProgressAggregator for
+            progress updates
+        total_size: Total size of all files (for progress)
+        current_size: Current relayed size
+        queue_size: Maximum number of blocks buffered in memory
+        blocksize: Maximum bytes per block
+
+    Returns:
+        Updated current size after the relay
+    """
+    logger.info("Relaying file %s to %s", src_file, dst_file)
+
+    progress, owned = _as_progress(progress_callback, total_size, current_size)
+    _set_transfer_mode(src_ftp, "S")
+    _set_transfer_mode(dst_ftp, "S")
+    pipe = _ChunkPipe(queue_size)
+    relayed = 0
+
+    def read_source() -> None:
+        try:
+            src_ftp.retrbinary(f"RETR {src_file}", pipe.put, blocksize)
+        except _RelayCancelled:
+            return
+        except BaseException as e:  # pylint: disable=broad-except
+            pipe.close(e)
+            return
+        pipe.close()
+
+    def write_callback(data):
+        nonlocal relayed
+        relayed += len(data)
+        if progress is not None:
+            progress.update(len(data), dst_file)
+
+    reader = threading.Thread(
+        target=read_source, name=f"ftp-relay-{src_file}", daemon=True
+    )
+    reader.start()
+    try:
+        dst_ftp.storbinary(
+            f"STOR {dst_file}", pipe, blocksize, callback=write_callback
+        )
+    except BaseException:
+        pipe.cancel()
+        raise
+    finally:
+        reader.join()
+
+    if owned:
+        progress.flush()
+    return current_size + relayed
+
+
+def relay_ftp(
+    src_factory: Callable[[], FTP] | FTPConnectionPool,
+    dst_factory: Callable[[], FTP] | FTPConnectionPool,
+    remote_path: str,
+    remote_base_path: str,
+    workers: int = 4,
+    progress_callback=None,
+    queue_size: int = 16,
+) -> int:
+    """
+    Copy a file or folder from one FTP server to another through memory.
+
+    The source is walked once, the destination directory skeleton is
+    created up front, then up to ``workers`` files are relayed at once with
+    ``relay_ftp_file``, each over its own pair of source and destination
+    sessions. Nothing is staged on local disk.
+
+    Args:
+        src_factory: Callable returning a new logged-in connection to the
+            source server, or an FTPConnectionPool for it
+        dst_factory: Callable returning a new logged-in connection to the
+            destination server, or an FTPConnectionPool for it
+        remote_path: Source file or folder path
+        remote_base_path: Base path on the destination server
+        workers: Number of files relayed concurrently
+        progress_callback: Callback function or ProgressAggregator for
+            aggregated progress updates
+        queue_size: Maximum number of blocks buffered per file
+
+    Returns:
+        Total size of relayed files
+    """
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+
+    src_sessions = _ThreadSessions(src_factory)
+    dst_sessions = _ThreadSessions(dst_factory)
+    workers = dst_sessions.limit_workers(src_sessions.limit_workers(workers))
+    pool = src_sessions.pool
+    if pool is not None and pool is dst_sessions.pool:
+        # Every file holds a source and a destination session of one pool
+        workers = max(1, min(workers, pool.max_sessions // 2))
+
+    tree = build_remote_tree_concurrent(src_factory, remote_path, workers)
+    dst_root = _join_remote(remote_base_path, PurePosixPath(remote_path).name)
+    if tree.is_dir:
+        dst_dirs = [dst_root] + [
+            _join_remote(dst_root, tree.relative_path(entry))
+            for entry in tree.dirs()
+        ]
+        files = [
+            (entry.path, _join_remote(dst_root, tree.relative_path(entry)))
+            for entry in tree.files()
+        ]
+    else:
+        dst_dirs = []
+        files = [(tree.root.path, dst_root)]
+
+    logger.info(
+        "Relaying %s to %s with %d concurrent files",
+        remote_path,
+        dst_root,
+        workers,
+    )
+
+    total_size = tree.total_size
+    progress, owned = _as_progress(progress_callback, total_size)
+
+    def relay_one(src_file: str, dst_file: str) -> int:
+        # A half finished transfer leaves both sessions out of sync
+        with src_sessions.session(discard_on_error=True) as src_ftp:
+            with dst_sessions.session(discard_on_error=True) as dst_ftp:
+                return relay_ftp_file(
+                    src_ftp,
+                    dst_ftp,
+                    src_file,
+                    dst_file,
+                    progress_callback=progress,
+                    total_size=total_size,
+                    queue_size=queue_size,
+                )
+
+    current_size = 0
+    try:
+        with dst_sessions.session() as dst_ftp:
+            _make_remote_dirs(dst_ftp, dst_dirs)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(relay_one, src_file, dst_file)
+                for src_file, dst_file in files
+            ]
+            try:
+                for future in futures:
+                    current_size += future.result()
+            except BaseException:
+                # Stop scheduling the remaining files on first failure
+                for future in futures:
+                    future.cancel()
+                raise
+    finally:
+        src_sessions.close_all()
+        dst_sessions.close_all()
+
+    if owned:
+        progress.flush()
+    return current_size
+
+
+class AsyncFTPClient:
+    """
+    Asyncio facade over the blocking helpers, backed by a connection pool.
+
+    Every call runs on a small thread pool sized to the connection pool, so
+    any number of coroutines can await transfers at once while at most
+    ``max_sessions`` of them touch the network. Calls with ``workers > 1``
+    check sessions out per file, so they queue for the pool alongside the
+    other calls. Cancelling an awaiting coroutine does not interrupt a
+    transfer that has already started.
+
+    Plain progress callbacks ``(current, total, message=...)`` are called on
+    the event loop; a ``ProgressAggregator`` is used as is from the worker
+    threads.
+
+    Args:
+        pool: Connection pool the sessions are checked out of
+        max_workers: Number of worker threads, defaults to the pool size
+    """
+
+    def __init__(
+        self, pool: FTPConnectionPool, max_workers: int | None = None
+    ):
+        self.pool = pool
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or pool.max_sessions,
+            thread_name_prefix="ftp-async",
+        )
+
+    async def __aenter__(self) -> "AsyncFTPClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+    @staticmethod
+    def _loop_progress(progress_callback):
+        """Wrap a plain callback so it runs on the calling event loop."""
+        if progress_callback is None or isinstance(
+            progress_callback, ProgressAggregator
+        ):
+            return progress_callback
+        loop = asyncio.get_running_loop()
+
+        def threadsafe_callback(current, total, message=None):
+            loop.call_soon_threadsafe(
+                functools.partial(
+                    progress_callback, current, total, message=message
+                )
+            )
+
+        return threadsafe_callback
+
+    async def remote_tree(self, remote_path: str) -> RemoteTree:
+        """Snapshot a remote path, see ``build_remote_tree``."""
+        return await self._run(build_remote_tree, self.pool, remote_path)
+
+    async def get_folder_size(self, remote_path: str, workers: int = 1) -> int:
+        """Total size of a remote folder, see ``get_ftp_folder_size``."""
+        return await self._run(
+            get_ftp_folder_size, self.pool, remote_path, workers=workers
+        )
+
+    async def download(
+        self,
+        remote_path: str,
+        local_base_path: str,
+        progress_callback=None,
+        workers: int = 1,
+    ) -> None:
+        """Download a remote file or folder, see ``download_ftp``."""
+        await self._run(
+            download_ftp,
+            self.pool,
+            remote_path,
+            local_base_path,
+            progress_callback=self._loop_progress(progress_callback),
+            workers=workers,
+        )
+
+    async def upload(
+        self,
+        local_path: str,
+        remote_base_path: str,
+        progress_callback=None,
+        workers: int = 1,
+    ) -> None:
+        """Upload a local file or folder, see ``upload_ftp``."""
+        await self._run(
+            upload_ftp,
+            self.pool,
+            local_path,
+            remote_base_path,
+            progress_callback=self._loop_progress(progress_callback),
+            workers=workers,
+        )
+
+    async def close(self) -> None:
+        """Wait for running calls, then close the worker threads and pool."""
+        await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self._executor.shutdown, wait=True)
+        )
+        self.pool.close()
@@ -3,13 +3,24 @@
 
 """ pybaseline.py:  Returns baseline from noisy quantal signal """
 
+import os
 import numpy as np
 import cmath
 import matplotlib.pyplot as plt
 import time
-from numba import jit
-
-def pybaseline(data, Rsqd, sigma_xi2, current, multiplier = 1, updateR2 = False, Nch = 1):
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from collections import deque
+from multiprocessing import shared_memory
+import numba
+from numba import jit, njit, prange
+
+logger = logging.getLogger(__name__)
+# Silent unless the application configures logging
+logger.addHandler(logging.NullHandler())
+
+def pybaseline(data, Rsqd, sigma_xi2, current, multiplier = 1, updateR2 = False, Nch = 1, background = None, max_iter = 10000, tol = 1e-4, accelerate = False):
 	"""
 	Parameters
 	----------
@@ -25,80 +36,582 @@ def pybaseline(data, Rsqd, sigma_xi2, current, multiplier = 1, updateR2 = False,
 	updateR2 : Boolean
 	Nch : Integer
 		Number of levels
+	background : 1D numpy array
+		Initial baseline, e.g. the one fitted on a similar trace, instead
+		of 0.95 * data
+	max_iter : Integer
+		Maximum number of EM iterations
+	tol : Double
+		Convergence threshold on the change of the log likelihood
+	accelerate : Boolean
+		Extrapolate the EM iterations with SQUAREM
+
+	Returns
+	-------
+	1D numpy array
+		Extracted baseline
+	"""
+	background, _ = fit_baseline(data, Rsqd, sigma_xi2, current, multiplier, updateR2, Nch, background, max_iter, tol, accelerate)
+	return background
+
+def fit_baseline(data, Rsqd, sigma_xi2, current, multiplier = 1, updateR2 = False, Nch = 1, background = None, max_iter = 10000, tol = 1e-4, accelerate = False):
+	"""
+	Same as `pybaseline`, also returning how the EM iterations converged.
+
+	Passing the `background`, and the current, Rsqd and sigma_xi2 returned
+	for a previous, similar trace warm-starts the fit. Progress is logged to
+	the "pybaseline" logger, at DEBUG level for every iteration and at INFO
+	level at the end; stopping at `max_iter`, or early on a non-finite
+	likelihood, is only reported in the "converged" stat.
 
 	Returns
 	-------
 	1D numpy array
 		Extracted baseline
+	dict
+		"iterations" (the number of EM steps evaluated), "converged", the
+		final "logL", the fitted "current", "Rsqd" and "sigma_xi2",
+		"seconds" spent, and the "trace" of "logL", "current" and
+		"sigma_xi2" after every iteration, or every SQUAREM cycle
+
+	Raises
+	------
+	ValueError
+		If `max_iter` is below 1 or `background` does not match `data`
 	"""
+	if max_iter < 1:
+		raise ValueError("max_iter must be at least 1, got %s" % max_iter)
+	t0 = time.perf_counter()
 	logLold = 1.e50
-	n = 0
 
 	size = len(data)
 
 	data = multiply_array(data, multiplier)
 
 	# initial guess
-	background = init_b(data, current)
+	if background is None:
+		background = init_b(data, current)
+	else:
+		background = np.array(background, dtype = np.float64)
+		if len(background) != size:
+			raise ValueError("background has %d samples for %d in data" % (len(background), size))
 
-	davg = np.mean(data)
-
-	main_d, lower_d, upper_d = set_matrix(size, Rsqd)
+	work = EMWorkspace(size)
+	trace = {"logL": [], "current": [], "sigma_xi2": []}
 
 	j = 0
-	not_converged = True
-	while not_converged:
-		t0 = time.time()
-		j += 1
+	converged = False
+	while j < max_iter:
+		# The first iteration keeps current and Rsqd, as em_step does, and
+		# leaves fewer than 3 steps for a SQUAREM cycle
+		if accelerate and j > 0 and j + 3 <= max_iter:
+			current, Rsqd, sigma_xi2, logL, steps = squarem_step(data, background, current, Rsqd, sigma_xi2, Nch, updateR2, work)
+			j += steps
+		else:
+			j += 1
+			current, Rsqd, sigma_xi2, logL = em_step(data, background, current, Rsqd, sigma_xi2, Nch, j, updateR2, work)
+
+		trace["logL"].append(logL)
+		trace["current"].append(current)
+		trace["sigma_xi2"].append(sigma_xi2)
+		logger.debug("Iteration %d logL: %s", j, logL)
+
+		if not np.isfinite(logL):
+			# Diverged, further iterations cannot recover
+			break
+		if np.abs(logL - logLold) > tol:
+			logLold = logL
+		else:
+			converged = True
+			break
+
+	stats = {
+		"iterations": j,
+		"converged": converged,
+		"logL": logL,
+		"current": current,
+		"Rsqd": Rsqd,
+		"sigma_xi2": sigma_xi2,
+		"seconds": time.perf_counter() - t0,
+		"trace": trace,
+	}
+	logger.info("%s after %d iterations, logL: %s", "converged" if converged else "not converged", j, logL)
+
+	return background, stats
+
+class EMWorkspace:
+	"""
+	Preallocated buffers for the EM iterations on a signal of `size` samples.
 
-		p, p2 = set_n2(data, background, current, Rsqd, size, Nch, sigma_xi2)
+	Holds <n>, <n^2> and the right-hand side of the baseline equations, and
+	the forward elimination of the tridiagonal matrix of `set_matrix`, which
+	only depends on Rsqd and is redone only when Rsqd changes.
+	"""
 
-		rhs = set_rhs(p, data, current, Rsqd)
+	def __init__(self, size):
+		self.size = size
+		self.p = np.empty(size)
+		self.p2 = np.empty(size)
+		self.rhs = np.empty(size)
+		self.mult = np.empty(size)
+		self.main_f = np.empty(size)
+		self.Rsqd = None
+		# Start of a SQUAREM cycle and its first and second differences,
+		# only allocated when accelerating
+		self.b0 = None
+		self.r = None
+		self.v = None
+
+	def factor(self, Rsqd):
+		if Rsqd != self.Rsqd:
+			factor_matrix(self.size, Rsqd, self.mult, self.main_f)
+			self.Rsqd = Rsqd
+
+	def squarem_buffers(self):
+		if self.b0 is None:
+			self.b0 = np.empty(self.size)
+			self.r = np.empty(self.size)
+			self.v = np.empty(self.size)
+		return self.b0, self.r, self.v
+
+def em_step(data, background, current, Rsqd, sigma_xi2, Nch, j, updateR2, work, likelihood = True):
+	"""
+	One EM iteration, updating `background` in place.
 
-		if j % 250 == 0:
-			print("Iteration = ", j)
+	Parameters
+	----------
+	data : 1D numpy array
+		Raw data signal, already multiplied
+	background : 1D numpy array
+		Current baseline estimate, overwritten with the new one
+	current, Rsqd, sigma_xi2 : Double
+		Current parameter estimates
+	Nch : Integer
+		Number of levels
+	j : Integer
+		Iteration number, starting at 1
+	updateR2 : Boolean
+	work : EMWorkspace
+		Buffers for the signal length
+	likelihood : Boolean
+		Evaluate the log likelihood, which is None otherwise
+
+	Returns
+	-------
+	tuple
+		Updated current, Rsqd and sigma_xi2, and the log likelihood
+	"""
+	size = len(data)
 
-		main_d, lower_d, upper_d = set_matrix(size, Rsqd)
+	set_n2_into(data, background, current, size, Nch, sigma_xi2, work.p, work.p2)
 
-		background, main_d, rhs = solveMatrix(size, lower_d, main_d, upper_d, rhs, background)
+	work.factor(Rsqd)
+	solve_factored(work.mult, work.main_f, data, work.p, current, Rsqd, work.rhs, background)
 
-		main_d, lower_d, upper_d = set_matrix(size, Rsqd)
-		tmp = A_minus_B(data, background)
+	pdot, ddot, sum_p2, GRADBSQRD = em_sums(data, background, work.p, work.p2)
 
-		if j > 1:
-			if np.sum(p2) > 0:
-				current = AdotB(p, tmp) / np.sum(p2)
+	if j > 1:
+		if sum_p2 > 0:
+			current = pdot / sum_p2
 
-		D2 = AdotB(tmp, tmp) - 2 * current * AdotB(tmp, p) + current * current * np.sum(p2)
+	D2 = ddot - 2 * current * pdot + current * current * sum_p2
 
-		GRADBSQRD = gradbsquared(background)
+	BRsqd = (GRADBSQRD/ ((size - 1) * sigma_xi2)) ** 2
 
-		BRsqd = (GRADBSQRD/ ((size - 1) * sigma_xi2)) ** 2
+	if j > 1 and updateR2 == True:
+		Rsqd = updatedRsqd(BRsqd)
 
-		
+	sigma_xi2 = (GRADBSQRD/Rsqd + D2)/(size - 1)
+	logL = lL(background, data,  Rsqd,  sigma_xi2,  current, size, Nch) if likelihood else None
 
-		if j > 1 and updateR2 == True:
-			Rsqd = updatedRsqd(BRsqd)
+	return current, Rsqd, sigma_xi2, logL
 
-		sigma_xi2 = (GRADBSQRD/Rsqd + D2)/(size - 1)
-		logL = lL(background, data,  Rsqd,  sigma_xi2,  current, size, Nch)
+def squarem_step(data, background, current, Rsqd, sigma_xi2, Nch, updateR2, work):
+	"""
+	One SQUAREM cycle (Varadhan & Roland 2008, scheme S3) over the EM map
+	of `em_step`, updating `background` in place.
 
-		print('logL: ', logL)
+	Two EM steps give the first and second differences r and v of the
+	baseline and the parameters, the iterate is extrapolated to
+	x0 - 2 * alpha * r + alpha^2 * v with alpha = -|r| / |v|, and one more
+	EM step from there keeps it stable. If that does not lower the negative
+	log likelihood below the one after the two plain EM steps, the cycle
+	falls back to those.
 
-		if np.abs(logL - logLold) > 0.0001:
-			logLold = logL
-		else:
-			not_converged = False
-	print("converged")
+	Returns
+	-------
+	tuple
+		Updated current, Rsqd and sigma_xi2, the log likelihood and the
+		number of EM steps evaluated
+	"""
+	b0, r, v = work.squarem_buffers()
+	b0[:] = background
+	theta0 = np.array([current, Rsqd, sigma_xi2])
+
+	current, Rsqd, sigma_xi2, _ = em_step(data, background, current, Rsqd, sigma_xi2, Nch, 2, updateR2, work, likelihood = False)
+	np.subtract(background, b0, out = r)
+	theta1 = np.array([current, Rsqd, sigma_xi2])
+
+	current, Rsqd, sigma_xi2, logL = em_step(data, background, current, Rsqd, sigma_xi2, Nch, 2, updateR2, work)
+	np.subtract(background, b0, out = v)
+	v -= r
+	v -= r
+	theta2 = np.array([current, Rsqd, sigma_xi2])
+
+	r_theta = theta1 - theta0
+	v_theta = theta2 - 2 * theta1 + theta0
+	v_norm2 = np.dot(v, v) + np.dot(v_theta, v_theta)
+	if v_norm2 == 0:
+		return current, Rsqd, sigma_xi2, logL, 2
+
+	alpha = min(-np.sqrt((np.dot(r, r) + np.dot(r_theta, r_theta)) / v_norm2), -1.0)
+	if alpha == -1.0:
+		# The extrapolation is the second EM iterate itself
+		return current, Rsqd, sigma_xi2, logL, 2
+
+	theta = theta0 - 2 * alpha * r_theta + alpha * alpha * v_theta
+	if theta[1] <= 0 or theta[2] <= 0:
+		return current, Rsqd, sigma_xi2, logL, 2
+
+	# The extrapolated baseline goes to v and the second EM iterate, still in
+	# background, to b0 so the cycle can fall back to it
+	r *= -2 * alpha
+	r += b0
+	v *= alpha * alpha
+	v += r
+	b0[:] = background
+	background[:] = v
+
+	current, Rsqd, sigma_xi2, logL3 = em_step(data, background, theta[0], theta[1], theta[2], Nch, 2, updateR2, work)
+	if not np.isfinite(logL3) or logL3 > logL:
+		background[:] = b0
+		return theta2[0], theta2[1], theta2[2], logL, 3
+
+	return current, Rsqd, sigma_xi2, logL3, 3
+
+def _stream_chunks(data, step):
+	"""Yield consecutive 1-D float chunks of an array, memmap or iterable."""
+	if hasattr(data, "shape"):
+		# Slicing a memmap only reads the requested part from disk
+		for start in range(0, len(data), step):
+			yield np.asarray(data[start:start + step], dtype=float)
+	else:
+		for chunk in data:
+			yield np.asarray(chunk, dtype=float).ravel()
+
+def pybaseline_stream(data, Rsqd, sigma_xi2, current, window = 1000000, overlap = 10000, multiplier = 1, updateR2 = False, Nch = 1):
+	"""
+	Baseline of an arbitrarily long signal computed in overlapping windows.
+
+	Windows of `window` samples overlapping by `overlap` samples are fitted
+	one at a time with `pybaseline`. Over each seam the baselines of the two
+	windows are cross-faded linearly, which removes the edge effects of both
+	fits. Only about one window of input and output is held in memory, so
+	`data` can be a memory-mapped array or a generator of chunks of any
+	size. The overlap should span many times the baseline correlation
+	length, about 1 / sqrt(Rsqd) samples. A last window that would bring
+	fewer than `overlap` (and at least 2) new samples is not fitted on its
+	own, its samples are fitted with the window before.
 
-	print('Iteration Total: ', j)
+	Parameters
+	----------
+	data : 1D numpy array, numpy.memmap or iterable of 1D arrays
+		Raw data signal, or consecutive chunks of it
+	Rsqd : Double
+		Noise estimate
+	sigma_xi2 : Double
+	current : Double
+		Signal amplitude estimate
+	window : Integer
+		Number of samples fitted at once
+	overlap : Integer
+		Number of samples shared by consecutive windows
+	multiplier : Double
+		Signal multiplier value
+	updateR2 : Boolean
+	Nch : Integer
+		Number of levels
 
-	p, p2 = set_n2(data, background, current, Rsqd, size, Nch, sigma_xi2)
-	
-	tmp1 = set_reconstruction(p, background, current)
-	tmp2 = set_res(p, data, background, current)
+	Yields
+	------
+	1D numpy array
+		Consecutive pieces of the extracted baseline, together as long as
+		the input signal
+	"""
+	if overlap < 0 or 2 * overlap >= window:
+		raise ValueError("overlap must be between 0 and window / 2, got %d for a window of %d" % (overlap, window))
+
+	# Samples not fitted yet, starting with the overlap of the last window
+	buffer = np.empty(0)
+	# Baseline of the last window over the overlap, to cross-fade
+	tail = None
+	fade_in = np.arange(1, overlap + 1) / (overlap + 1)
+	# Shortest tail fitted as a window of its own
+	min_tail = max(overlap, 2)
+
+	chunks = _stream_chunks(data, window - overlap)
+	exhausted = False
+	while True:
+		pieces = [buffer]
+		length = len(buffer)
+		# Read ahead far enough to tell whether the tail is too short
+		while length < window + min_tail and not exhausted:
+			chunk = next(chunks, None)
+			if chunk is None:
+				exhausted = True
+			else:
+				pieces.append(chunk)
+				length += len(chunk)
+		if len(pieces) > 1:
+			buffer = np.concatenate(pieces)
+
+		fitted = min(len(buffer), window)
+		if exhausted and len(buffer) - fitted < min_tail:
+			fitted = len(buffer)
+		if tail is not None and fitted <= overlap:
+			# Nothing after the last overlap
+			yield tail
+			return
+		if fitted == 0:
+			return
+
+		baseline = pybaseline(buffer[:fitted], Rsqd, sigma_xi2, current, multiplier, updateR2, Nch)
+
+		head = 0
+		if tail is not None:
+			yield (1 - fade_in) * tail + fade_in * baseline[:overlap]
+			head = overlap
+
+		if exhausted and fitted == len(buffer):
+			yield baseline[head:]
+			return
+
+		yield baseline[head:fitted - overlap]
+		tail = baseline[fitted - overlap:]
+		buffer = buffer[fitted - overlap:]
+
+def _per_trace(value, count, name):
+	"""Repeat a scalar parameter for every trace, or check a per-trace sequence."""
+	if value is None or np.isscalar(value):
+		return [value] * count
+	value = list(value)
+	if len(value) != count:
+		raise ValueError("%s has %d values for %d traces" % (name, len(value), count))
+	return value
+
+_batch_memory = {}
+
+def _attach_batch(names):
+	"""Pool initializer, maps the shared input and output blocks once per worker."""
+	# Every worker is one of the pool processes already, so numba should not
+	# start as many threads again inside each one
+	numba.set_num_threads(1)
+	for key, name in names.items():
+		_batch_memory[key] = shared_memory.SharedMemory(name = name)
+
+def _fit_shared(start, stop, params):
+	"""Fit one trace read from, and written back to, the shared blocks."""
+	data = np.ndarray(stop - start, dtype = np.float64, buffer = _batch_memory["data"].buf, offset = start * 8)
+	out = np.ndarray(stop - start, dtype = np.float64, buffer = _batch_memory["out"].buf, offset = start * 8)
+	background, stats = fit_baseline(data, *params)
+	out[:] = background
+	return stats
+
+def pybaseline_batch(traces, Rsqd, sigma_xi2, current, multiplier = 1, updateR2 = False, Nch = 1, background = None, max_iter = 10000, tol = 1e-4, accelerate = False, processes = None):
+	"""
+	Extract the baselines of many independent traces over a process pool.
 
-	return background
+	The traces are copied once into a shared memory block that the workers
+	read in place, and they write the baselines into a second one, so no
+	signal is pickled to or from the pool. Every parameter is either a
+	single value for all traces or a sequence with one value per trace.
+	Progress goes to the "pybaseline" logger only, which is quiet unless
+	logging is configured.
+
+	Parameters
+	----------
+	traces : 2D numpy array or iterable of 1D numpy arrays
+		One trace per row, traces of an iterable may differ in length
+	Rsqd, sigma_xi2, current, multiplier, updateR2, Nch, max_iter, tol, accelerate
+		As in `pybaseline`, scalars or per-trace sequences
+	background : 2D numpy array or sequence of 1D numpy arrays
+		Initial baselines, one per trace, see `fit_baseline`
+	processes : Integer
+		Number of worker processes, the CPU count by default. With 1 the
+		traces are fitted one after the other in this process. Workers are
+		spawned, so a calling script needs an `if __name__ == "__main__"`
+		guard.
+
+	Returns
+	-------
+	2D numpy array or list of 1D numpy arrays
+		Baselines, a 2D array if `traces` was one
+	list of dict
+		Convergence stats of every trace, as returned by `fit_baseline`
+	"""
+	as_array = isinstance(traces, np.ndarray) and traces.ndim == 2
+	traces = [np.asarray(trace, dtype = np.float64) for trace in traces]
+	count = len(traces)
+	if not count:
+		return (np.empty((0, 0)) if as_array else []), []
+
+	params = list(zip(*(_per_trace(value, count, name) for name, value in (
+		("Rsqd", Rsqd), ("sigma_xi2", sigma_xi2), ("current", current),
+		("multiplier", multiplier), ("updateR2", updateR2), ("Nch", Nch),
+		("background", background), ("max_iter", max_iter), ("tol", tol),
+		("accelerate", accelerate)))))
+
+	bounds = np.concatenate(([0], np.cumsum([len(trace) for trace in traces])))
+	processes = min(processes or os.cpu_count() or 1, count)
+
+	if processes == 1:
+		results = [fit_baseline(trace, *p) for trace, p in zip(traces, params)]
+		baselines = [background for background, _ in results]
+		stats = [s for _, s in results]
+	else:
+		nbytes = max(int(bounds[-1]) * 8, 1)
+		blocks = {key: shared_memory.SharedMemory(create = True, size = nbytes) for key in ("data", "out")}
+		try:
+			# Only temporary views of the blocks, which must all be gone
+			# before the blocks can be closed
+			for i, trace in enumerate(traces):
+				np.ndarray(len(trace), dtype = np.float64, buffer = blocks["data"].buf, offset = bounds[i] * 8)[:] = trace
+
+			names = {key: block.name for key, block in blocks.items()}
+			# Forking after numba started its thread pool can deadlock the
+			# workers, so they are always spawned
+			context = multiprocessing.get_context("spawn")
+			with ProcessPoolExecutor(processes, mp_context = context, initializer = _attach_batch, initargs = (names,)) as pool:
+				futures = [pool.submit(_fit_shared, int(bounds[i]), int(bounds[i + 1]), params[i]) for i in range(count)]
+				stats = []
+				for i, future in enumerate(futures):
+					stats.append(future.result())
+					logger.info("trace %d/%d: %d iterations", i + 1, count, stats[-1]["iterations"])
+
+			baselines = [np.ndarray(len(trace), dtype = np.float64, buffer = blocks["out"].buf, offset = bounds[i] * 8).copy() for i, trace in enumerate(traces)]
+		finally:
+			for block in blocks.values():
+				block.close()
+				block.unlink()
+
+	if as_array:
+		baselines = np.stack(baselines)
+	return baselines, stats
+
+class BaselineTracker:
+	"""
+	Baseline of a signal arriving in blocks, for live acquisition.
+
+	Every block is appended to a trailing window of the last `window`
+	samples, and the baseline of that window is refitted starting from the
+	previous one, extended flat over the new samples, and from the current,
+	Rsqd and sigma_xi2 fitted for the previous block. At most `max_iter`
+	EM steps are run per block, so the cost of a block is bounded by the
+	window length however long the signal has been running.
+
+	Parameters
+	----------
+	Rsqd, sigma_xi2, current, multiplier, updateR2, Nch
+		As in `pybaseline`, the estimates for the first block
+	window : Integer
+		Number of trailing samples refitted for every block
+	max_iter, tol, accelerate
+		As in `fit_baseline`, for every block
+	history : Integer
+		Number of blocks kept in the latency metrics
+	"""
+
+	def __init__(self, Rsqd, sigma_xi2, current, window = 100000, multiplier = 1, updateR2 = False, Nch = 1, max_iter = 50, tol = 1e-4, accelerate = True, history = 1000):
+		self.Rsqd = Rsqd
+		self.sigma_xi2 = sigma_xi2
+		self.current = current
+		self.window = window
+		self.multiplier = multiplier
+		self.updateR2 = updateR2
+		self.Nch = Nch
+		self.max_iter = max_iter
+		self.tol = tol
+		self.accelerate = accelerate
+
+		self.data = np.empty(window)
+		self.background = np.empty(window)
+		self.filled = 0
+		self.fitted = False
+
+		self.blocks = 0
+		self.samples = 0
+		self.latencies = deque(maxlen = history)
+		self.iterations = deque(maxlen = history)
+		self.not_converged = 0
+
+	def update(self, block):
+		"""
+		Add a block of samples.
+
+		Returns
+		-------
+		1D numpy array
+			Baseline of the samples of `block`, as fitted with the window
+			ending with them
+		"""
+		block = np.asarray(block, dtype = np.float64).ravel()
+		if len(block) > self.window:
+			return np.concatenate([self.update(block[i:i + self.window]) for i in range(0, len(block), self.window)])
+
+		t0 = time.perf_counter()
+		n = len(block)
+		# The last baseline value, even when a full window of new samples
+		# pushes every previous one out
+		last = self.background[self.filled - 1] if self.filled else None
+		keep = min(self.filled, self.window - n)
+		self.data[:keep] = self.data[self.filled - keep:self.filled]
+		self.background[:keep] = self.background[self.filled - keep:self.filled]
+		self.data[keep:keep + n] = block
+		if last is not None:
+			self.background[keep:keep + n] = last
+		self.filled = keep + n
+
+		if self.filled < 2:
+			# Too short to fit anything yet
+			baseline = init_b(multiply_array(block, self.multiplier), self.current)
+			self.background[keep:keep + n] = baseline
+		else:
+			background, stats = fit_baseline(self.data[:self.filled], self.Rsqd, self.sigma_xi2, self.current, self.multiplier, self.updateR2, self.Nch,
+				self.background[:self.filled] if self.fitted else None, self.max_iter, self.tol, self.accelerate)
+			self.background[:self.filled] = background
+			self.fitted = True
+			self.current = stats["current"]
+			self.Rsqd = stats["Rsqd"]
+			self.sigma_xi2 = stats["sigma_xi2"]
+			self.iterations.append(stats["iterations"])
+			self.not_converged += not stats["converged"]
+			baseline = background[keep:]
+
+		self.blocks += 1
+		self.samples += n
+		self.latencies.append(time.perf_counter() - t0)
+		return baseline.copy()
+
+	def metrics(self):
+		"""
+		Returns
+		-------
+		dict
+			Number of "blocks" and "samples" so far and of blocks that
+			stopped at max_iter ("not_converged"), and once blocks were
+			processed the "last", "mean", "p95" and "max" seconds per block
+			and the "mean_iterations" per block over the recent history
+		"""
+		metrics = {"blocks": self.blocks, "samples": self.samples, "not_converged": self.not_converged}
+		if self.latencies:
+			latencies = np.array(self.latencies)
+			metrics["last"] = float(latencies[-1])
+			metrics["mean"] = float(latencies.mean())
+			metrics["p95"] = float(np.percentile(latencies, 95))
+			metrics["max"] = float(latencies.max())
+		if self.iterations:
+			metrics["mean_iterations"] = float(np.mean(self.iterations))
+		return metrics
 
 def set_res(p, d, b, current):
 	res = d - b - current * p
@@ -156,50 +669,45 @@ def set_matrix(size, Rsqd):
 	upper = np.ones(size)
 	return main, lower, upper
 
-@jit
+@njit
 def set_n2(d, background, current, Rsqd, T, Nch, sigma_xi2):
-	
-	"""
-	eta_list = []
-	for j in range(Nch+1):
-		eta_tmp = (d - background - j * current) * (d - background - j * current) / (2 * sigma_xi2)
-		eta_list.append(eta_tmp)
-
-	sum_ = 0
-	sum_2 = 0
-	denom_array_tmp = np.zeros(len(d))
-	for j in range(Nch+1):
-		for k in range(Nch+1):
-			denom_array_tmp += np.exp(eta_list[j] - eta_list[k])
-		sum_ += j/denom_array_tmp
-		sum_2  += j*j/denom_array_tmp
-
-	n = sum_
-	n2 = sum_2
-
-	
-	"""
 	n = np.empty(T)
 	n2 = np.empty(T)
-	for t in range(T):
-		eta = np.empty(Nch+1)
-		for j in range(Nch+1):
-			eta[j] = (d[t] - background[t] - j * current) * (d[t] - background[t] - j * current)/(2 * sigma_xi2)
-
-		sum_ = 0
-		sum_2 = 0
-
-		for j in range(Nch+1):
-			denom = 0
-			for k in range(Nch+1):
-				denom += np.exp(eta[j] - eta[k])
-			sum_ += j/denom
-			sum_2 += j*j/denom
+	set_n2_into(d, background, current, T, Nch, sigma_xi2, n, n2)
+	return n, n2
 
-		n[t] = sum_
-		n2[t] = sum_2
+@njit(parallel=True)
+def set_n2_into(d, background, current, T, Nch, sigma_xi2, n, n2):
+	"""
+	Expected number of open channels <n> and <n^2> at every sample.
 
-	return n, n2
+	The weight of level j, 1 / sum_k exp(eta_j - eta_k) with
+	eta_j = (d - b - j * current)^2 / (2 * sigma_xi2), is the softmax of
+	-eta. It is computed shifted by the smallest eta, so no exponential can
+	overflow, in O(Nch) per sample instead of O(Nch^2). Samples are split
+	over threads with prange and no (T, Nch + 1) temporaries are allocated.
+	"""
+	inv_2sigma = 1.0 / (2 * sigma_xi2)
+	for t in prange(T):
+		r = d[t] - background[t]
+
+		eta_min = np.inf
+		for j in range(Nch + 1):
+			eta = (r - j * current) * (r - j * current) * inv_2sigma
+			if eta < eta_min:
+				eta_min = eta
+
+		denom = 0.0
+		sum_ = 0.0
+		sum_2 = 0.0
+		for j in range(Nch + 1):
+			w = np.exp(eta_min - (r - j * current) * (r - j * current) * inv_2sigma)
+			denom += w
+			sum_ += j * w
+			sum_2 += j * j * w
+
+		n[t] = sum_ / denom
+		n2[t] = sum_2 / denom
 
 def set_rhs(p, d, current, Rsqd):
 	rhs = -1 * Rsqd * (d - current * p)
@@ -219,6 +727,58 @@ def solveMatrix(n, a, b, c, v, x):
 
 	return x, b, v
 
+@jit
+def factor_matrix(n, Rsqd, mult, main_f):
+	"""
+	Forward elimination of the matrix of `set_matrix` into `mult` and
+	`main_f`, the same steps `solveMatrix` applies to its diagonal.
+	"""
+	main_f[0] = -1 * Rsqd - 1
+	mult[0] = 0.0
+	for i in range(1, n):
+		main_f[i] = -1 * Rsqd - 2.0
+	main_f[n - 1] = -1 * Rsqd - 1
+	for i in range(1, n):
+		mult[i] = 1.0 / main_f[i - 1]
+		main_f[i] = main_f[i] - mult[i]
+
+@jit
+def solve_factored(mult, main_f, d, p, current, Rsqd, v, x):
+	"""
+	Solve for the baseline `x` with the right-hand side of `set_rhs`, using
+	a matrix factored by `factor_matrix`. `v` is a work buffer.
+	"""
+	n = len(d)
+	v[0] = -1 * Rsqd * (d[0] - current * p[0])
+	for i in range(1, n):
+		v[i] = -1 * Rsqd * (d[i] - current * p[i]) - mult[i] * v[i - 1]
+
+	x[n - 1] = v[n - 1] / main_f[n - 1]
+
+	for i in range(n-2, -1, -1):
+		x[i] = (v[i] - x[i+1])/main_f[i]
+
+@jit
+def em_sums(d, b, p, p2):
+	"""
+	Sums over the residual d - b needed by an EM iteration, in one pass.
+
+	Returns AdotB(p, d - b), AdotB(d - b, d - b), np.sum(p2) and
+	gradbsquared(b).
+	"""
+	pdot = 0.0
+	ddot = 0.0
+	sum_p2 = 0.0
+	grad = 0.0
+	for t in range(len(d)):
+		r = d[t] - b[t]
+		pdot += p[t] * r
+		ddot += r * r
+		sum_p2 += p2[t]
+		if t:
+			grad += (b[t] - b[t - 1]) ** 2
+	return pdot, ddot, sum_p2, grad
+
 def A_minus_B(A, B):
 	AmB = A - B
 	return AmB
@@ -241,20 +801,34 @@ def updatedRsqd(BRsqd):
 	ret = Fnum/Fdenom
 	return ret.real
 
-@jit
+@njit(parallel=True)
 def lL(background, data, Rsqd, sigma_xi2, current, T, Nch):
-	retval = 0
+	"""
+	Negative log likelihood of the baseline.
+
+	log sum_i exp(-eta_i) is evaluated as a log-sum-exp shifted by the
+	smallest eta, which stays finite where the plain sum underflows to 0.
+	"""
+	retval = 0.0
 	sigma_b2 = Rsqd * sigma_xi2
-	
-	for t in range(T):
+	inv_2sigma = 1.0 / (2 * sigma_xi2)
+
+	for t in prange(T):
 		if t:
 			retval += ((background[t] - background[t - 1]) ** 2) / (2 * sigma_b2)
-		tmp = 0
 
+		r = data[t] - background[t]
+		eta_min = np.inf
 		for i in range(Nch + 1):
-			tmp += np.exp((-1 * (data[t] - background[t] - i * current) ** 2)/(2 * sigma_xi2))
-		retval -= np.log(tmp)
-	
+			eta = (r - i * current) * (r - i * current) * inv_2sigma
+			if eta < eta_min:
+				eta_min = eta
+
+		tmp = 0.0
+		for i in range(Nch + 1):
+			tmp += np.exp(eta_min - (r - i * current) * (r - i * current) * inv_2sigma)
+		retval += eta_min - np.log(tmp)
+
 	retval += 0.5 * (T - 1) * np.log(sigma_xi2)
 
 	tmp = 0.5 * (np.sqrt(Rsqd + 4) + np.sqrt(Rsqd))
@@ -0,0 +1,98 @@
+""" pybaseline_benchmark.py:  Time and allocations per EM iteration of pybaseline """
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+import pybaseline as pb
+
+def legacy_iteration(data, background, current, Rsqd, sigma_xi2, Nch, j, updateR2):
+	"""One iteration as the loop of pybaseline did it before EMWorkspace."""
+	size = len(data)
+
+	p, p2 = pb.set_n2(data, background, current, Rsqd, size, Nch, sigma_xi2)
+
+	rhs = pb.set_rhs(p, data, current, Rsqd)
+
+	main_d, lower_d, upper_d = pb.set_matrix(size, Rsqd)
+
+	background, main_d, rhs = pb.solveMatrix(size, lower_d, main_d, upper_d, rhs, background)
+
+	main_d, lower_d, upper_d = pb.set_matrix(size, Rsqd)
+	tmp = pb.A_minus_B(data, background)
+
+	if j > 1:
+		if np.sum(p2) > 0:
+			current = pb.AdotB(p, tmp) / np.sum(p2)
+
+	D2 = pb.AdotB(tmp, tmp) - 2 * current * pb.AdotB(tmp, p) + current * current * np.sum(p2)
+
+	GRADBSQRD = pb.gradbsquared(background)
+
+	BRsqd = (GRADBSQRD/ ((size - 1) * sigma_xi2)) ** 2
+
+	if j > 1 and updateR2 == True:
+		Rsqd = pb.updatedRsqd(BRsqd)
+
+	sigma_xi2 = (GRADBSQRD/Rsqd + D2)/(size - 1)
+	logL = pb.lL(background, data,  Rsqd,  sigma_xi2,  current, size, Nch)
+
+	return current, Rsqd, sigma_xi2, logL
+
+def synthetic_trace(size, Nch, current, seed = 0):
+	"""Drifting baseline plus random channel openings and white noise."""
+	rng = np.random.default_rng(seed)
+	t = np.arange(size)
+	baseline = 5 + 2 * np.sin(t / (size / 7 + 1))
+	levels = rng.integers(0, Nch + 1, size) * (rng.random(size) < 0.1)
+	return baseline + levels * current + rng.normal(size = size) * 0.3
+
+def bench(size, Nch, iterations, Rsqd = 0.001, sigma_xi2 = 0.1, current = 3.0):
+	"""
+	Returns
+	-------
+	dict
+		Seconds and peak bytes allocated per iteration, for the legacy loop
+		body and for em_step
+	"""
+	data = synthetic_trace(size, Nch, current)
+
+	work = pb.EMWorkspace(size)
+	# Compile the numba kernels outside of the measurement
+	legacy_iteration(data, pb.init_b(data, current), current, Rsqd, sigma_xi2, Nch, 1, False)
+	pb.em_step(data, pb.init_b(data, current), current, Rsqd, sigma_xi2, Nch, 1, False, work)
+
+	results = {}
+	for name in ("legacy", "em_step"):
+		background = pb.init_b(data, current)
+		state = (current, Rsqd, sigma_xi2)
+		seconds = []
+		allocated = []
+		for j in range(1, iterations + 1):
+			tracemalloc.start()
+			before = tracemalloc.get_traced_memory()[0]
+			t0 = time.perf_counter()
+			if name == "legacy":
+				out = legacy_iteration(data, background, *state, Nch, j, False)
+			else:
+				out = pb.em_step(data, background, *state, Nch, j, False, work)
+			seconds.append(time.perf_counter() - t0)
+			allocated.append(tracemalloc.get_traced_memory()[1] - before)
+			tracemalloc.stop()
+			state = out[:3]
+		results[name] = (np.median(seconds), np.median(allocated))
+	return results
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Time and allocations per EM iteration of pybaseline")
+	parser.add_argument("--sizes", type = lambda s: [int(float(x)) for x in s.split(",")], default = [10**4, 10**5, 10**6], help = "comma separated signal lengths")
+	parser.add_argument("--nch", type = int, default = 1)
+	parser.add_argument("--iterations", type = int, default = 10)
+	args = parser.parse_args()
+
+	print("%10s %8s %12s %12s" % ("size", "loop", "ms/iter", "MB/iter"))
+	for size in args.sizes:
+		for name, (seconds, allocated) in bench(size, args.nch, args.iterations).items():
+			print("%10d %8s %12.2f %12.2f" % (size, name, seconds * 1e3, allocated / 1e6))
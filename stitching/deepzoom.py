@@ -0,0 +1,134 @@
+import math
+import os
+import numpy as np
+from PIL import Image
+
+# Deep Zoom (DZI) pyramid written from horizontal strips given top to bottom,
+# as PNGStripWriter in stitching.py takes them. Every level keeps only the
+# rows of its current row of tiles, plus the overlap, and passes its rows on
+# to the next smaller level halved, so memory stays around one row of tiles
+# per level however large the image is.
+#
+# Layout: <name>.dzi and <name>_files/<level>/<column>_<row>.<format>, level 0
+# being 1x1 pixel and the last level the full image.
+
+DZI_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" Format="{format}" Overlap="{overlap}" TileSize="{tile_size}">
+  <Size Width="{width}" Height="{height}"/>
+</Image>
+'''
+
+
+def halve(rows):
+    # 2x2 box filter of an even number of rows; an odd last column is doubled
+    if rows.shape[1] % 2:
+        rows = np.concatenate((rows, rows[:, -1:]), axis=1)
+    h, w, c = rows.shape
+    summed = rows.reshape(h // 2, 2, w // 2, 2, c).sum(axis=(1, 3), dtype=np.uint16)
+    return ((summed + 2) // 4).astype(np.uint8)
+
+
+class DeepZoomLevel:
+    def __init__(self, writer, level, width, height):
+        self.writer = writer
+        self.level = level
+        self.width = width
+        self.height = height
+        self.folder = os.path.join(writer.files, str(level))
+        os.makedirs(self.folder, exist_ok=True)
+        self.next = DeepZoomLevel(writer, level - 1, math.ceil(width / 2), math.ceil(height / 2)) if level else None
+        self.rows = np.empty((0, width, writer.channels), dtype=np.uint8)
+        self.top = 0  # image row of self.rows[0]
+        self.tile_row = 0
+        self.odd = None  # last row of an odd count, waiting for its pair
+
+    def add(self, rows):
+        self.rows = np.concatenate((self.rows, rows))
+        self.save_tiles()
+        if self.next is not None:
+            if self.odd is not None:
+                rows = np.concatenate((self.odd, rows))
+                self.odd = None
+            if len(rows) % 2:
+                self.odd = rows[-1:]
+                rows = rows[:-1]
+            if len(rows):
+                self.next.add(halve(rows))
+
+    def save_tiles(self):
+        tile_size, overlap = self.writer.tile_size, self.writer.overlap
+        while self.tile_row * tile_size < self.height:
+            y0 = self.tile_row * tile_size
+            y1 = min(y0 + tile_size + overlap, self.height)
+            if self.top + len(self.rows) < y1:
+                return
+            band = self.rows[max(y0 - overlap, 0) - self.top:y1 - self.top]
+            for column in range(math.ceil(self.width / tile_size)):
+                x0 = column * tile_size
+                tile = band[:, max(x0 - overlap, 0):min(x0 + tile_size + overlap, self.width)]
+                self.writer.save_tile(Image.fromarray(tile, self.writer.mode),
+                                      os.path.join(self.folder, f'{column}_{self.tile_row}.{self.writer.format}'))
+            self.tile_row += 1
+            # the next row of tiles starts `overlap` rows above its edge
+            keep = max(self.tile_row * tile_size - overlap, 0)
+            self.rows = self.rows[keep - self.top:]
+            self.top = keep
+
+    def close(self):
+        if self.tile_row * self.writer.tile_size < self.height:
+            raise ValueError(f"Level {self.level} got {self.top + len(self.rows)} rows of {self.height}")
+        if self.next is not None:
+            if self.odd is not None:
+                self.next.add(halve(np.concatenate((self.odd, self.odd))))
+            self.next.close()
+
+
+class DeepZoomWriter:
+    """
+    Writes the Deep Zoom pyramid `<base>.dzi` of a width x height image from
+    horizontal strips, as they come.
+    """
+    def __init__(self, base, width, height, tile_size=254, overlap=1, format='jpg', quality=90):
+        self.base = base
+        self.files = base + '_files'
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.format = format
+        self.quality = quality
+        self.mode = 'RGB' if format in ('jpg', 'jpeg') else 'RGBA'
+        self.channels = len(self.mode)
+        self.rows = 0
+        max_level = math.ceil(math.log2(max(width, height, 1)))
+        self.levels = DeepZoomLevel(self, max_level, width, height)
+
+    def save_tile(self, tile, path):
+        if self.mode == 'RGB':
+            tile.save(path, quality=self.quality)
+        else:
+            tile.save(path)
+
+    def write(self, strip):
+        if strip.size[0] != self.width or self.rows + strip.size[1] > self.height:
+            raise ValueError(f"Strip of {strip.size} does not fit rows {self.rows}+ of a {self.width}x{self.height} image")
+        if not strip.size[1]:
+            return
+        self.levels.add(np.asarray(strip.convert(self.mode)))
+        self.rows += strip.size[1]
+
+    def close(self):
+        if self.rows != self.height:
+            raise ValueError(f"Wrote {self.rows} rows of {self.height}")
+        self.levels.close()
+        # the descriptor last, so viewers never open a half written pyramid
+        with open(self.base + '.dzi', 'w') as f:
+            f.write(DZI_XML.format(format=self.format, overlap=self.overlap, tile_size=self.tile_size,
+                                   width=self.width, height=self.height))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
@@ -15,6 +15,7 @@ vipsbin = os.path.join(os.getcwd(), r'vips-dev-8.16\bin')
 
 os.environ['PATH'] = os.pathsep.join((vipsbin, os.environ['PATH']))
 import pyvips
+from tile_loader import iter_ordered
 
 # | YYYY_XXXX |           |           |     |
 # |-----------|-----------|-----------|-----|
@@ -25,15 +26,17 @@ import pyvips
 
 argv = sys.argv[1:]
 
-options = "i:o:x:y:d:v"
-longoptions = ["help", "in=", "out=", "xsize=", "ysize=", "dpi=", "verbose"]
+options = "i:o:x:y:d:w:pv"
+longoptions = ["help", "in=", "out=", "xsize=", "ysize=", "dpi=", "workers=", "pyramid", "verbose"]
 helptext = [
     "--help or -h: Print this help list.", 
     "--in or -i: Specify file input folder.", 
     "--out or -o: Specify output file location.",
     "--xsize or -x: Specify tile grid size in the X direction.",
     "--ysize or -y: Specify tile grid size in the Y direction.",
-    "--dpi or -d: Specify output image DPI (does not affect pixel size)."
+    "--dpi or -d: Specify output image DPI (does not affect pixel size).",
+    "--workers or -w: Number of threads decoding tiles (default: CPU count).",
+    "--pyramid or -p: Also write a Deep Zoom pyramid of the mosaic (<out>.dzi and <out>_files).",
     "--verbose or -v: Write debug info to console during operation.",
     "If there are not enough images available to reach the desired grid size,",
     "random tiles will be selected from the set to pad the input image list."
@@ -52,6 +55,8 @@ GRIDSIZE_X = 0
 GRIDSIZE_Y = 0
 DPI = 300
 DEBUGLOG = False
+WORKERS = None
+PYRAMID = False
 RANDOMIZE = False
 SEED = random.random()
 OUTPUT_WIDTH = 2048
@@ -74,6 +79,10 @@ for opt, arg in opts:
         GRIDSIZE_Y = int(arg)
     elif opt in ['-d', '--dpi']:
         DPI = int(arg)
+    elif opt in ['-w', '--workers']:
+        WORKERS = int(arg)
+    elif opt in ['-p', '--pyramid']:
+        PYRAMID = True
     elif opt in ['-v', '--verbose']:
         DEBUGLOG = True
     else:
@@ -124,13 +133,37 @@ def pad_image_list(input_list, newsize):
     return input_list
 
 
+# Tiles are decoded by WORKERS threads ahead of placement: copy_memory() makes
+# libvips run the lazy load and shrink in the worker instead of at write time
+def thumbnail_tile(filename, width):
+    return pyvips.Image.thumbnail(os.path.join(INPUT_PATH, filename), width).copy_memory()
+
+
+def shrink_tile(filename, scale):
+    # JPEG shrink-on-load by 2, 4 or 8 in the DCT domain, as far as it stays
+    # above `scale`, leaving only the rest to resize()
+    shrink = 1
+    while shrink < 8 and scale * shrink * 2 <= 1:
+        shrink *= 2
+    image = pyvips.Image.new_from_file(os.path.join(INPUT_PATH, filename), shrink=shrink)
+    return image.resize(scale * shrink).copy_memory()
+
+
+# dzsave streams the image through libvips once and writes every level of the
+# pyramid as it goes, at the resolution the tiles were loaded at
+def write_pyramid(image):
+    if PYRAMID:
+        base = os.path.splitext(OUTPUT_PATH)[0]
+        image.dzsave(base, suffix='.jpg[Q=90]')
+        print(f"Exported {image.width}x{image.height} Deep Zoom pyramid to {base}.dzi and {base}_files.")
+
+
 # simple stitching
 def merge_images(filelist, gridsize_x, gridsize_y):
-    image_objects = [pyvips.Image.thumbnail(os.path.join(INPUT_PATH, filename), 100) for filename in filelist]
-
-    if (gridsize_x * gridsize_y) > len(image_objects):
-        print(f"Expected {gridsize_x * gridsize_y} images while {len(image_objects)} were provided!")
-        image_objects = pad_image_list(image_objects, (gridsize_x * gridsize_y))
+    if (gridsize_x * gridsize_y) > len(filelist):
+        print(f"Expected {gridsize_x * gridsize_y} images while {len(filelist)} were provided!")
+        filelist = pad_image_list(list(filelist), (gridsize_x * gridsize_y))
+    image_objects = iter_ordered(thumbnail_tile, ((filename, 100) for filename in filelist), WORKERS, 2 * gridsize_x)
 
     image_index = 0
     merged = None
@@ -138,9 +171,11 @@ def merge_images(filelist, gridsize_x, gridsize_y):
         merged_row = None
         for _ in range(0, gridsize_x):
             # up left - 0, 0
-            merged_row = image_objects[image_index] if not merged_row else merged_row.join(image_objects[image_index], "horizontal")
+            image = next(image_objects)
+            merged_row = image if not merged_row else merged_row.join(image, "horizontal")
             image_index += 1
         merged = merged_row if not merged else merged.join(merged_row, "vertical")
+    write_pyramid(merged)
     merged = merged.resize(2048 / merged.width)
     merged.write_to_file(OUTPUT_PATH)
 
@@ -149,14 +184,14 @@ def merge_images(filelist, gridsize_x, gridsize_y):
 # can not use thumnail due to the error `VipsJpeg: out of order read at line 308`
 # https://libvips.github.io/pyvips/vimage.html#pyvips.Image.mosaic
 def mosaic_images(filelist, gridsize_x, gridsize_y):
-    image_objects = [pyvips.Image.new_from_file(os.path.join(INPUT_PATH, filename)).resize(0.3) for filename in filelist]
-
-    if (gridsize_x * gridsize_y) > len(image_objects):
-        print(f"Expected {gridsize_x * gridsize_y} images while {len(image_objects)} were provided!")
-        image_objects = pad_image_list(image_objects, (gridsize_x * gridsize_y))
+    if (gridsize_x * gridsize_y) > len(filelist):
+        print(f"Expected {gridsize_x * gridsize_y} images while {len(filelist)} were provided!")
+        filelist = pad_image_list(list(filelist), (gridsize_x * gridsize_y))
+    image_objects = iter_ordered(shrink_tile, ((filename, 0.3) for filename in filelist), WORKERS, 2 * gridsize_x)
 
-    image_width = image_objects[0].width
-    image_height = image_objects[0].height
+    first = next(image_objects)
+    image_width = first.width
+    image_height = first.height
 
     image_index = 0
     mosaic = None
@@ -165,12 +200,14 @@ def mosaic_images(filelist, gridsize_x, gridsize_y):
         mosaic_row = None
         for _ in range(0, gridsize_x):
             # up left - 0, 0
-            mosaic_row = image_objects[image_index] if not mosaic_row else mosaic_row.mosaic(image_objects[image_index], "horizontal", 0, 0, (1 - overlap) * image_width, 0)
+            image = first if image_index == 0 else next(image_objects)
+            mosaic_row = image if not mosaic_row else mosaic_row.mosaic(image, "horizontal", 0, 0, (1 - overlap) * image_width, 0)
             image_index += 1
         mosaic = mosaic_row if not mosaic else mosaic.mosaic(mosaic_row, "vertical", 0, 0, 0, (1 - overlap) * image_height)
         print(f'row {y}')
         mosaic.write_to_file(os.getcwd()+f'\\output\\row_{y}.png')
     #mosaic = mosaic.globalbalance()
+    write_pyramid(mosaic)
     mosaic = mosaic.resize(2048 / mosaic.width)
     mosaic.write_to_file(OUTPUT_PATH)
 
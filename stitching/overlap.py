@@ -4,6 +4,7 @@ import getopt
 import random
 from PIL import Image
 import math
+from tile_loader import iter_tiles
 
 # | YYYY_XXXX |           |           |     |
 # |-----------|-----------|-----------|-----|
@@ -14,15 +15,16 @@ import math
 
 argv = sys.argv[1:]
 
-options = "i:o:x:y:d:v"
-longoptions = ["help", "in=", "out=", "xsize=", "ysize=", "dpi=", "verbose"]
+options = "i:o:x:y:d:w:v"
+longoptions = ["help", "in=", "out=", "xsize=", "ysize=", "dpi=", "workers=", "verbose"]
 helptext = [
     "--help or -h: Print this help list.", 
     "--in or -i: Specify file input folder.", 
     "--out or -o: Specify output file location.",
     "--xsize or -x: Specify tile grid size in the X direction.",
     "--ysize or -y: Specify tile grid size in the Y direction.",
-    "--dpi or -d: Specify output image DPI (does not affect pixel size)."
+    "--dpi or -d: Specify output image DPI (does not affect pixel size).",
+    "--workers or -w: Number of threads decoding tiles (default: CPU count).",
     "--verbose or -v: Write debug info to console during operation.",
     "If there are not enough images available to reach the desired grid size,",
     "random tiles will be selected from the set to pad the input image list."
@@ -42,6 +44,7 @@ GRIDSIZE_X = 0
 GRIDSIZE_Y = 0
 DPI = 300
 DEBUGLOG = False
+WORKERS = None
 RANDOMIZE = False
 SEED = random.random()
 OUTPUT_WIDTH = 2048
@@ -64,6 +67,8 @@ for opt, arg in opts:
         GRIDSIZE_Y = int(arg)
     elif opt in ['-d', '--dpi']:
         DPI = int(arg)
+    elif opt in ['-w', '--workers']:
+        WORKERS = int(arg)
     elif opt in ['-v', '--verbose']:
         DEBUGLOG = True
     else:
@@ -110,9 +115,11 @@ def parse_img_and_txt(fn):
         sz = [float(l) for l in f.readlines()]
         sx = sz[0]
         sy = sz[1]
-    return ((sx, sy), Image.open(img_f))
+    return ((sx, sy), img_f)
 
 
+# Tiles are decoded and shrunk to the output scale by WORKERS threads ahead of
+# placement, and blended straight into a canvas of the output size
 def overlap_images(filelist, gridsize_x, gridsize_y):
     image_objects = [i for i in (parse_img_and_txt(filename) for filename in filelist) if i is not None]
 
@@ -120,31 +127,37 @@ def overlap_images(filelist, gridsize_x, gridsize_y):
         print(f"Expected {gridsize_x * gridsize_y} images while {len(image_objects)} were provided!")
         return None
 
-    # assuming all images have the same size
-    (sx, sy), img = image_objects[0]
-    (image_width, image_height) = img.size
+    # assuming all images have the same size, only the header is read here
+    (sx, sy), img_f = image_objects[0]
+    with Image.open(img_f) as img:
+        (image_width, image_height) = img.size
     (sx1, sy1), _ = image_objects[-1]
 
     resulting_width = math.ceil((sx1 - sx) * dx + image_width)
     resulting_height = math.ceil((sy1 - sy) * dy + image_height)
 
-    image_combined = Image.new('RGBA', (resulting_width, resulting_height))
+    scale = OUTPUT_WIDTH / resulting_width
+    tile_size = (max(round(image_width * scale), 1), max(round(image_height * scale), 1))
+
+    image_combined = Image.new('RGBA', (OUTPUT_WIDTH, int(resulting_height / resulting_width * OUTPUT_WIDTH)))
+    tiles = iter_tiles(((img_f, tile_size) for _, img_f in image_objects), 'RGB', WORKERS, 2 * gridsize_x)
 
     image_index = 0
     for y_index in range(gridsize_y):
         for x_index in range(gridsize_x):
-            (sx1, sy1), img = image_objects[image_index]
+            (sx1, sy1), img_f = image_objects[image_index]
+            img = next(tiles)
             # up left - 0, 0
-            xx = math.floor((sx1 - sx) * dx)
-            yy = math.floor((sy1 - sy) * dy)
-            img0 = image_combined.crop((xx, yy, xx + image_width, yy + image_height)).convert('RGB')
+            xx = math.floor((sx1 - sx) * dx * scale)
+            yy = math.floor((sy1 - sy) * dy * scale)
+            img0 = image_combined.crop((xx, yy, xx + tile_size[0], yy + tile_size[1])).convert('RGB')
             img1 = Image.blend(img0, img, 0.5) # blending to show overlapping part
             image_combined.paste(im=img1, box=(xx, yy))
             if DEBUGLOG == True:
-                print(f"X: {x_index} Y: {y_index}, index: {image_index}, image: {image_objects[image_index]}")
+                print(f"X: {x_index} Y: {y_index}, index: {image_index}, image: {img_f}")
             image_index += 1
 
-    return image_combined.resize((OUTPUT_WIDTH, int(resulting_height / resulting_width * OUTPUT_WIDTH)))
+    return image_combined
 
 overlapped = overlap_images(input_filenames, GRIDSIZE_X, GRIDSIZE_Y) 
 print(f"Exporting tiled image...")
@@ -2,7 +2,12 @@ import os
 import sys
 import getopt
 import random
+import struct
+import zlib
+import numpy as np
 from PIL import Image
+from tile_loader import iter_tiles
+from deepzoom import DeepZoomWriter
 
 # | YYYY_XXXX |           |           |     |
 # |-----------|-----------|-----------|-----|
@@ -13,15 +18,17 @@ from PIL import Image
 
 argv = sys.argv[1:]
 
-options = "i:o:x:y:d:v"
-longoptions = ["help", "in=", "out=", "xsize=", "ysize=", "dpi=", "verbose"]
+options = "i:o:x:y:d:w:pv"
+longoptions = ["help", "in=", "out=", "xsize=", "ysize=", "dpi=", "workers=", "pyramid", "verbose"]
 helptext = [
     "--help or -h: Print this help list.", 
     "--in or -i: Specify file input folder.", 
     "--out or -o: Specify output file location.",
     "--xsize or -x: Specify tile grid size in the X direction.",
     "--ysize or -y: Specify tile grid size in the Y direction.",
-    "--dpi or -d: Specify output image DPI (does not affect pixel size)."
+    "--dpi or -d: Specify output image DPI (does not affect pixel size).",
+    "--workers or -w: Number of threads decoding tiles (default: CPU count).",
+    "--pyramid or -p: Write a full resolution Deep Zoom pyramid (<out>.dzi and <out>_files) instead of a PNG.",
     "--verbose or -v: Write debug info to console during operation.",
     "If there are not enough images available to reach the desired grid size,",
     "random tiles will be selected from the set to pad the input image list."
@@ -41,6 +48,8 @@ GRIDSIZE_X = 0
 GRIDSIZE_Y = 0
 DPI = 300
 DEBUGLOG = False
+WORKERS = None
+PYRAMID = False
 RANDOMIZE = False
 SEED = random.random()
 OUTPUT_WIDTH = 2048
@@ -63,6 +72,10 @@ for opt, arg in opts:
         GRIDSIZE_Y = int(arg)
     elif opt in ['-d', '--dpi']:
         DPI = int(arg)
+    elif opt in ['-w', '--workers']:
+        WORKERS = int(arg)
+    elif opt in ['-p', '--pyramid']:
+        PYRAMID = True
     elif opt in ['-v', '--verbose']:
         DEBUGLOG = True
     else:
@@ -142,9 +155,137 @@ def merge_images(filelist, gridsize_x, gridsize_y):
 
     return image_combined.resize((OUTPUT_WIDTH, int(resulting_height / resulting_width * OUTPUT_WIDTH)))
 
-merged = merge_images(input_filenames, GRIDSIZE_X, GRIDSIZE_Y) 
+class PNGStripWriter:
+    """
+    Writes a PNG from horizontal strips given top to bottom, compressing
+    each one as it arrives so the whole image is never held in memory.
+    """
+    MODES = {'L': (0, 1), 'RGB': (2, 3), 'RGBA': (6, 4)}
+
+    def __init__(self, path, width, height, mode='RGBA', dpi=None, compress_level=5):
+        color_type, channels = self.MODES[mode]
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.rows = 0
+        self.previous = np.zeros(width * channels, dtype=np.uint8)
+        self.compressor = zlib.compressobj(compress_level)
+        self.pending = []
+        self.pending_size = 0
+        self.file = open(path, 'wb')
+        self.file.write(b'\x89PNG\r\n\x1a\n')
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0))
+        if dpi:
+            # pixels per metre, rounded as PIL does
+            ppm = [int(d / 0.0254 + 0.5) for d in dpi]
+            self._chunk(b'pHYs', struct.pack('>IIB', ppm[0], ppm[1], 1))
+
+    def _chunk(self, kind, data):
+        self.file.write(struct.pack('>I', len(data)) + kind + data)
+        self.file.write(struct.pack('>I', zlib.crc32(kind + data)))
+
+    def _idat(self, data):
+        # gather compressed output into IDAT chunks of at least 64 KiB
+        self.pending.append(data)
+        self.pending_size += len(data)
+        if self.pending_size >= 1 << 16:
+            self._chunk(b'IDAT', b''.join(self.pending))
+            self.pending = []
+            self.pending_size = 0
+
+    def write(self, strip):
+        if strip.size[0] != self.width or self.rows + strip.size[1] > self.height:
+            raise ValueError(f"Strip of {strip.size} does not fit rows {self.rows}+ of a {self.width}x{self.height} image")
+        if not strip.size[1]:
+            return
+        rows = np.asarray(strip.convert(self.mode)).reshape(strip.size[1], -1)
+        # "Up" filter: every row is stored as its difference to the row above
+        filtered = np.empty((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 2
+        filtered[0, 1:] = rows[0] - self.previous
+        filtered[1:, 1:] = rows[1:] - rows[:-1]
+        self.previous = rows[-1].copy()
+        self.rows += strip.size[1]
+        self._idat(self.compressor.compress(filtered.tobytes()))
+
+    def close(self):
+        if self.rows != self.height:
+            raise ValueError(f"Wrote {self.rows} rows of {self.height}")
+        self._idat(self.compressor.flush())
+        if self.pending:
+            self._chunk(b'IDAT', b''.join(self.pending))
+        self._chunk(b'IEND', b'')
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+
+# Same output as merge_images, but only one row of tiles, already resized to
+# the output scale, is in memory at a time. Tiles are decoded and resized
+# ahead of placement by WORKERS threads.
+def stream_merge_images(filelist, gridsize_x, gridsize_y, writer_factory, output_width=None):
+    if (gridsize_x * gridsize_y) > len(filelist):
+        print(f"Expected {gridsize_x * gridsize_y} images while {len(filelist)} were provided!")
+        filelist = pad_image_list(list(filelist), (gridsize_x * gridsize_y))
+
+    # assuming all images have the same size, only the header is read here
+    with Image.open(os.path.join(INPUT_PATH, filelist[0])) as first:
+        (image_width, image_height) = first.size
+
+    resulting_width = image_width * gridsize_x
+    resulting_height = image_height * gridsize_y
+    # OUTPUT_WIDTH unless given, `resulting_width` for full resolution
+    output_width = output_width or OUTPUT_WIDTH
+    if output_width == resulting_width:
+        output_height = resulting_height
+    else:
+        output_height = int(resulting_height / resulting_width * output_width)
+
+    # tile edges in the output, rounded so the footprints add up exactly
+    x_edges = [round(x * output_width / gridsize_x) for x in range(gridsize_x + 1)]
+    y_edges = [round(y * output_height / gridsize_y) for y in range(gridsize_y + 1)]
+
+    # footprints of 0 pixels are still decoded at 1 pixel, to keep the order
+    sizes = [(max(x_edges[x + 1] - x_edges[x], 1), max(y_edges[y + 1] - y_edges[y], 1))
+             for y in range(gridsize_y) for x in range(gridsize_x)]
+    tiles = iter_tiles(((os.path.join(INPUT_PATH, filename), size) for filename, size in zip(filelist, sizes)),
+                       'RGBA', WORKERS, 2 * gridsize_x)
+
+    with writer_factory(output_width, output_height) as writer:
+        image_index = 0
+        for y_index in range(0, gridsize_y):
+            strip = Image.new('RGBA', (output_width, y_edges[y_index + 1] - y_edges[y_index]))
+            for x_index in range(0, gridsize_x):
+                tile = next(tiles)
+                if x_edges[x_index + 1] > x_edges[x_index] and strip.height:
+                    strip.paste(im=tile, box=(x_edges[x_index], 0))
+                if DEBUGLOG == True:
+                    print(f"X: {x_index} Y: {y_index}, index: {image_index}, image: {filelist[image_index]}")
+                image_index += 1
+            writer.write(strip)
+
+    return output_width, output_height
+
 print(f"Exporting tiled image...")
+if PYRAMID:
+    # full resolution, so every level down to the whole grid in one tile
+    with Image.open(os.path.join(INPUT_PATH, input_filenames[0])) as first:
+        full_width = first.width * GRIDSIZE_X
+    OUTPUT_PATH = os.path.splitext(OUTPUT_PATH)[0]
+    width, height = stream_merge_images(input_filenames, GRIDSIZE_X, GRIDSIZE_Y,
+        lambda width, height: DeepZoomWriter(OUTPUT_PATH, width, height), full_width)
+    print(f"Exported {width}x{height} Deep Zoom pyramid to {OUTPUT_PATH}.dzi and {OUTPUT_PATH}_files.")
+    sys.exit()
+
+width, height = stream_merge_images(input_filenames, GRIDSIZE_X, GRIDSIZE_Y,
+    lambda width, height: PNGStripWriter(OUTPUT_PATH, width, height, dpi=(DPI, DPI)))
 
-merged.save(OUTPUT_PATH, compress_level=5, dpi=(DPI, DPI))
 if os.path.exists(OUTPUT_PATH):
-    print(f"Exported image with dimensions {merged.width}x{merged.height} ({round(os.stat(OUTPUT_PATH).st_size/1E6,2)}MB, {DPI}dpi) to {OUTPUT_PATH}.")
+    print(f"Exported image with dimensions {width}x{height} ({round(os.stat(OUTPUT_PATH).st_size/1E6,2)}MB, {DPI}dpi) to {OUTPUT_PATH}.")
@@ -0,0 +1,50 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+# Decoding JPEG tiles dominates the run time of the stitching scripts. The
+# helpers here decode and shrink tiles on a thread pool (PIL and libvips
+# release the GIL while decoding and resampling) and hand them back in grid
+# order, never more than `prefetch` tiles ahead of the placement loop.
+
+
+def decode_tile(path, size=None, mode=None):
+    # With a target size, draft() lets the JPEG decoder scale by 1/2, 1/4 or
+    # 1/8 in the DCT domain, to the smallest scale still at least `size`, so
+    # most pixels of a heavily reduced tile are never decoded at all
+    with Image.open(path) as img:
+        if size:
+            img.draft(img.mode, size)
+        img.load()
+        if size and img.size != tuple(size):
+            img = img.resize(size)
+        if mode and img.mode != mode:
+            img = img.convert(mode)
+        return img
+
+
+def iter_ordered(function, jobs, workers=None, prefetch=None):
+    # Yields function(*job) for every job in order, computed on `workers`
+    # threads; at most `prefetch` results are queued or in flight, so memory
+    # stays bounded however many jobs there are
+    workers = workers or os.cpu_count() or 1
+    prefetch = max(prefetch or 2 * workers, 1)
+    with ThreadPoolExecutor(workers) as pool:
+        pending = deque()
+        try:
+            for job in jobs:
+                pending.append(pool.submit(function, *job))
+                if len(pending) >= prefetch:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # stop decoding tiles nobody will place
+            for future in pending:
+                future.cancel()
+
+
+def iter_tiles(paths_and_sizes, mode=None, workers=None, prefetch=None):
+    # decode_tile over (path, size) pairs, in order
+    return iter_ordered(decode_tile, ((path, size, mode) for path, size in paths_and_sizes), workers, prefetch)
@@ -0,0 +1,25 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+# The modules under test are top level scripts, not an installed package
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "stitching"))
+
+
+@pytest.fixture
+def served(tmp_path):
+    """Folder served as ``/`` by ``ftp_server``."""
+    root = tmp_path / "served"
+    root.mkdir()
+    return root
+
+
+@pytest.fixture
+def ftp_server(served):
+    from ftp_loopback_server import LoopbackFTPServer
+
+    with LoopbackFTPServer(served) as server:
+        yield server
@@ -0,0 +1,80 @@
+import math
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from deepzoom import DeepZoomWriter
+
+
+def reference_halve(image):
+    """2x2 mean rounded half up, an odd last row or column doubled."""
+    if image.shape[0] % 2:
+        image = np.concatenate((image, image[-1:]), axis=0)
+    if image.shape[1] % 2:
+        image = np.concatenate((image, image[:, -1:]), axis=1)
+    summed = (
+        image[0::2, 0::2].astype(np.uint16)
+        + image[1::2, 0::2]
+        + image[0::2, 1::2]
+        + image[1::2, 1::2]
+    )
+    return ((summed + 2) // 4).astype(np.uint8)
+
+
+def read_level(folder, width, height, tile_size, overlap, channels):
+    level = np.zeros((height, width, channels), dtype=np.uint8)
+    for row in range(math.ceil(height / tile_size)):
+        for column in range(math.ceil(width / tile_size)):
+            x0 = max(column * tile_size - overlap, 0)
+            y0 = max(row * tile_size - overlap, 0)
+            x1 = min((column + 1) * tile_size + overlap, width)
+            y1 = min((row + 1) * tile_size + overlap, height)
+            with Image.open(folder / f"{column}_{row}.png") as tile:
+                assert tile.size == (x1 - x0, y1 - y0)
+                level[y0:y1, x0:x1] = np.asarray(tile)
+    return level
+
+
+@pytest.mark.parametrize("width, height", [(701, 533), (256, 256), (90, 300)])
+def test_pyramid_matches_reference_downsample(tmp_path, width, height):
+    tile_size, overlap = 64, 1
+    rng = np.random.default_rng(width)
+    image = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+    base = str(tmp_path / "out")
+
+    with DeepZoomWriter(
+        base, width, height, tile_size=tile_size, overlap=overlap, format="png"
+    ) as writer:
+        # Strips of uneven, partly odd heights, as the stitching loop gives
+        y = 0
+        while y < height:
+            step = int(rng.integers(1, 80))
+            writer.write(Image.fromarray(image[y : y + step], "RGBA"))
+            y += step
+
+    descriptor = ET.parse(base + ".dzi").getroot()
+    size = descriptor[0]
+    assert (int(size.get("Width")), int(size.get("Height"))) == (width, height)
+    assert descriptor.get("TileSize") == str(tile_size)
+
+    max_level = math.ceil(math.log2(max(width, height)))
+    files = tmp_path / "out_files"
+    assert sorted(int(p.name) for p in files.iterdir()) == list(
+        range(max_level + 1)
+    )
+    expected = image
+    for level in range(max_level, -1, -1):
+        h, w = expected.shape[:2]
+        actual = read_level(files / str(level), w, h, tile_size, overlap, 4)
+        np.testing.assert_array_equal(actual, expected)
+        expected = reference_halve(expected)
+    assert actual.shape[:2] == (1, 1)
+
+
+def test_missing_rows_raise(tmp_path):
+    writer = DeepZoomWriter(str(tmp_path / "out"), 100, 100, format="png")
+    writer.write(Image.new("RGBA", (100, 60)))
+    with pytest.raises(ValueError):
+        writer.close()
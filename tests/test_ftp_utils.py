@@ -0,0 +1,700 @@
+import asyncio
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import ftp_utils
+
+
+def _write_tree(root, files=6, size=64 * 1024):
+    folder = root / "f"
+    folder.mkdir()
+    for i in range(files):
+        (folder / f"file{i}.bin").write_bytes(os.urandom(size))
+    return folder
+
+
+def _same_tree(left, right):
+    names = sorted(p.name for p in left.iterdir())
+    assert names == sorted(p.name for p in right.iterdir())
+    for name in names:
+        assert (left / name).read_bytes() == (right / name).read_bytes()
+
+
+def test_concurrent_calls_share_one_pool(ftp_server, served, tmp_path):
+    folder = _write_tree(served)
+    pool = ftp_utils.FTPConnectionPool(
+        *ftp_server.address, max_sessions=2, acquire_timeout=30
+    )
+    errors = []
+
+    def download(target):
+        try:
+            ftp_utils.download_ftp(pool, "/f", str(target), workers=2)
+        except Exception as e:  # pylint: disable=broad-except
+            errors.append(e)
+
+    with pool:
+        for _ in range(4):
+            targets = [tmp_path / f"out{i}" for i in range(3)]
+            threads = [
+                threading.Thread(target=download, args=(target,))
+                for target in targets
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(timeout=60)
+                assert not thread.is_alive(), "concurrent downloads hung"
+            assert not errors
+            for target in targets:
+                _same_tree(folder, target / "f")
+
+
+def test_keepalive_does_not_requeue_after_close(ftp_server):
+    pool = ftp_utils.FTPConnectionPool(
+        *ftp_server.address, keepalive_interval=0.05
+    )
+    checked = threading.Event()
+    is_alive = pool._is_alive
+
+    def close_while_checking(ftp):
+        # The pool is closed between the NOOP and the requeue
+        pool.close()
+        checked.set()
+        return is_alive(ftp)
+
+    pool._is_alive = close_while_checking
+    ftp = pool.acquire()
+    pool.release(ftp)
+    assert checked.wait(5)
+    pool._keepalive.join(timeout=5)
+    assert not pool._keepalive.is_alive()
+    assert not pool._idle
+    assert ftp.sock is None
+
+
+def test_async_client_concurrent_downloads(ftp_server, served, tmp_path):
+    folder = _write_tree(served)
+
+    async def run():
+        pool = ftp_utils.FTPConnectionPool(
+            *ftp_server.address, max_sessions=2, acquire_timeout=30
+        )
+        async with ftp_utils.AsyncFTPClient(pool) as client:
+            for trial in range(3):
+                await asyncio.wait_for(
+                    asyncio.gather(
+                        *(
+                            client.download(
+                                "/f", str(tmp_path / f"{trial}_{i}"), workers=2
+                            )
+                            for i in range(3)
+                        )
+                    ),
+                    timeout=60,
+                )
+
+    asyncio.run(run())
+    for trial in range(3):
+        for i in range(3):
+            _same_tree(folder, tmp_path / f"{trial}_{i}" / "f")
+
+
+def test_acquire_timeout(ftp_server):
+    pool = ftp_utils.FTPConnectionPool(
+        *ftp_server.address, max_sessions=1, acquire_timeout=0.2
+    )
+    with pool, pool.session():
+        with pytest.raises(TimeoutError):
+            pool()
+
+
+class _Interrupt(ftp_utils.ProgressAggregator):
+    """Aggregator that breaks the transfer once ``limit`` bytes arrived."""
+
+    def __init__(self, limit):
+        super().__init__(lambda event: None)
+        self.limit = limit
+
+    def update(self, nbytes, name=None):
+        super().update(nbytes, name)
+        if self.current >= self.limit:
+            raise ConnectionResetError("interrupted by the test")
+
+
+def test_interrupted_sync_resumes(ftp_server, served, tmp_path):
+    folder = _write_tree(served, files=1, size=2 * 1024 * 1024)
+    remote = folder / "file0.bin"
+    local = tmp_path / "out" / "f" / "file0.bin"
+    pool = ftp_utils.FTPConnectionPool(*ftp_server.address)
+
+    with pool:
+        with pytest.raises(ConnectionResetError):
+            ftp_utils.sync_ftp_folder(
+                pool,
+                "/f",
+                str(tmp_path / "out"),
+                progress_callback=_Interrupt(512 * 1024),
+            )
+        # No preallocated zeros past the received bytes
+        size = local.stat().st_size
+        assert 0 < size < remote.stat().st_size
+        assert local.read_bytes() == remote.read_bytes()[:size]
+
+        result = ftp_utils.sync_ftp_folder(pool, "/f", str(tmp_path / "out"))
+    assert result.files_resumed == 1
+    assert result.bytes_skipped == size
+    assert local.read_bytes() == remote.read_bytes()
+
+
+def test_failed_segmented_download_keeps_gapless_prefix(
+    ftp_server, served, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(ftp_utils, "MIN_SEGMENT_SIZE", 256 * 1024)
+    folder = _write_tree(served, files=1, size=4 * 1024 * 1024)
+    remote = (folder / "file0.bin").read_bytes()
+    local = tmp_path / "file0.bin"
+    pool = ftp_utils.FTPConnectionPool(*ftp_server.address, max_sessions=4)
+
+    with pool, pytest.raises(ConnectionResetError):
+        ftp_utils.download_ftp_file_segmented(
+            pool,
+            "/f/file0.bin",
+            local,
+            segments=4,
+            progress_callback=_Interrupt(2 * 1024 * 1024),
+            retries=0,
+        )
+    data = local.read_bytes()
+    assert len(data) < len(remote)
+    assert data == remote[: len(data)]
+
+
+def test_segmented_download_from_strict_ascii_server(
+    served, tmp_path, monkeypatch
+):
+    from ftp_loopback_server import LoopbackFTPServer
+
+    monkeypatch.setattr(ftp_utils, "MIN_SEGMENT_SIZE", 256 * 1024)
+    folder = _write_tree(served, files=1, size=2 * 1024 * 1024 + 7)
+    with LoopbackFTPServer(served, strict_type=True) as server:
+        pool = ftp_utils.FTPConnectionPool(*server.address, max_sessions=4)
+        with pool:
+            ftp_utils.download_ftp(
+                pool, "/f/file0.bin", str(tmp_path), workers=4
+            )
+        assert server.stats.get("REST", 0) >= 3
+    assert (tmp_path / "file0.bin").read_bytes() == (
+        folder / "file0.bin"
+    ).read_bytes()
+
+
+def test_sync_manifest_saved_during_run(ftp_server, served, tmp_path):
+    _write_tree(served, files=3)
+    manifest = tmp_path / "sync.json"
+    seen = {}
+
+    class Snapshot(ftp_utils.ProgressAggregator):
+        def update(self, nbytes, name=None):
+            super().update(nbytes, name)
+            if name not in seen:
+                # What a killed run would leave on disk at this point
+                seen[name] = json.loads(manifest.read_text())["files"]
+
+    pool = ftp_utils.FTPConnectionPool(*ftp_server.address)
+    with pool:
+        ftp_utils.sync_ftp_folder(
+            pool,
+            "/f",
+            str(tmp_path / "out"),
+            manifest_path=str(manifest),
+            progress_callback=Snapshot(lambda event: None),
+            save_every=1,
+        )
+    in_flight = seen["/f/file1.bin"]
+    assert in_flight["file0.bin"]["complete"] is True
+    assert in_flight["file1.bin"]["complete"] is False
+
+
+@pytest.mark.parametrize("algorithm", ["crc32", "sha256"])
+def test_hashed_single_file_download(
+    ftp_server, served, tmp_path, monkeypatch, algorithm
+):
+    monkeypatch.setattr(ftp_utils, "MIN_SEGMENT_SIZE", 256 * 1024)
+    folder = _write_tree(served, files=1, size=2 * 1024 * 1024 + 3)
+    data = (folder / "file0.bin").read_bytes()
+    manifest = ftp_utils.TransferManifest(algorithm)
+    pool = ftp_utils.FTPConnectionPool(*ftp_server.address, max_sessions=4)
+    with pool:
+        ftp_utils.download_ftp(
+            pool, "/f/file0.bin", str(tmp_path), workers=4, manifest=manifest
+        )
+    record = manifest.files["/f/file0.bin"]
+    expected = ftp_utils._new_hash(algorithm)
+    expected.update(data)
+    assert record["digest"] == expected.hexdigest()
+    assert record["server_digest"] == expected.hexdigest()
+    # Only CRC32s of concurrently fetched segments can be combined
+    assert (ftp_server.stats.get("REST", 0) >= 3) == (algorithm == "crc32")
+    assert (tmp_path / "file0.bin").read_bytes() == data
+
+
+class _BrokenHash:
+    name = "broken"
+
+    def update(self, data):
+        raise RuntimeError("hash failed")
+
+    def hexdigest(self):
+        return ""
+
+
+def test_inline_hasher_failure_does_not_block():
+    hasher = ftp_utils.InlineHasher(_BrokenHash, max_pending=1)
+    with pytest.raises(RuntimeError, match="hash failed"):
+        # Would block on the full queue if the thread had died
+        for _ in range(100):
+            hasher.update(b"x")
+    with pytest.raises(RuntimeError, match="hash failed"):
+        hasher.close()
+
+
+def test_parallel_upload_does_not_retry_local_errors(
+    ftp_server, tmp_path, monkeypatch
+):
+    local = _write_tree(tmp_path, files=3)
+    broken = local / "file1.bin"
+    opened = []
+
+    def flaky_open(file, *args, **kwargs):
+        opened.append(Path(file))
+        if Path(file) == broken:
+            raise PermissionError(13, "Permission denied", str(file))
+        return open(file, *args, **kwargs)
+
+    monkeypatch.setattr(ftp_utils, "open", flaky_open, raising=False)
+    pool = ftp_utils.FTPConnectionPool(*ftp_server.address, max_sessions=2)
+    with pool, pytest.raises(ftp_utils.LocalFileError) as info:
+        ftp_utils.upload_ftp_folder_parallel(
+            pool, str(local), "/", workers=2, retry_delay=5
+        )
+    assert isinstance(info.value.__cause__, PermissionError)
+    assert info.value.filename == str(broken)
+    assert opened.count(broken) == 1
+
+
+def test_filter_reads_list_times_in_server_tz():
+    paris_summer = timezone(timedelta(hours=2))
+    # 12:00 on the server clock is 10:00 UTC
+    listed = ftp_utils.RemoteEntry(
+        "/f/a.bin", "file", 1, "20240601120000", modify_utc=False
+    )
+    mlsd = ftp_utils.RemoteEntry("/f/a.bin", "file", 1, "20240601120000")
+    bound = datetime(2024, 6, 1, 11, 0, tzinfo=timezone.utc)
+
+    assert ftp_utils.RemoteFilter(newer_than=bound).selects(listed, "a.bin")
+    in_tz = ftp_utils.RemoteFilter(newer_than=bound, server_tz=paris_summer)
+    assert not in_tz.selects(listed, "a.bin")
+    assert in_tz.selects(mlsd, "a.bin")
+
+
+def test_list_fallback_marks_local_times(ftp_server, served):
+    from ftp_loopback_server import LoopbackFTPServer
+
+    _write_tree(served, files=2)
+    with LoopbackFTPServer(served, disabled=("MLSD",)) as server:
+        with ftp_utils.FTPConnectionPool(*server.address) as pool:
+            tree = ftp_utils.build_remote_tree(pool, "/f")
+    files = [entry for entry in tree.entries if not entry.is_dir]
+    assert files and all(entry.modify for entry in files)
+    assert not any(entry.modify_utc for entry in files)
+
+
+def test_size_estimate_completes_after_last_listing(ftp_server, served):
+    root = served / "f"
+    for i in range(40):
+        folder = root / f"d{i}" / "sub"
+        folder.mkdir(parents=True)
+        (folder / "a.bin").write_bytes(b"x" * (1000 + i))
+        (root / f"d{i}" / "b.bin").write_bytes(b"y" * i)
+    pool = ftp_utils.FTPConnectionPool(*ftp_server.address, max_sessions=8)
+
+    with pool:
+        expected = ftp_utils.get_ftp_folder_size(pool, "/f")
+        for _ in range(3):
+            estimates = list(
+                ftp_utils.estimate_ftp_folder_size(
+                    pool, "/f", workers=8, interval=0
+                )
+            )
+            assert [e.complete for e in estimates].count(True) == 1
+            assert estimates[-1].complete
+            assert estimates[-1].size == expected
+            assert estimates[-1].dirs_listed == 81
+
+
+def test_progress_aggregator_throttles_events(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(
+        ftp_utils, "time", SimpleNamespace(monotonic=lambda: now[0])
+    )
+    events = []
+    mb = 1024 * 1024
+    progress = ftp_utils.ProgressAggregator(
+        events.append, total=12 * mb, min_interval=0.5, min_bytes=4 * mb
+    )
+
+    # Without time passing only every min_bytes step emits
+    for _ in range(10):
+        progress.update(mb, "a.bin")
+    assert [e.current for e in events] == [4 * mb, 8 * mb]
+
+    # Past min_interval any update emits, with the rate over the interval
+    now[0] += 0.6
+    progress.update(mb, "b.bin")
+    assert len(events) == 3
+    assert events[-1].name == "b.bin"
+    assert events[-1].rate == pytest.approx(3 * mb / 0.6)
+
+    now[0] += 0.1
+    progress.update(mb)
+    assert len(events) == 3
+
+    # The final flush always reports, whatever the throttling
+    progress.flush()
+    assert len(events) == 4
+    assert events[-1].current == events[-1].total == 12 * mb
+    assert events[-1].elapsed == pytest.approx(0.7)
+
+
+def test_legacy_callback_reaches_total(ftp_server, served, tmp_path):
+    folder = _write_tree(served, files=4, size=300 * 1024)
+    calls = []
+
+    def callback(current, total, message=None):
+        calls.append((current, total))
+
+    with ftp_utils.FTPConnectionPool(*ftp_server.address) as pool:
+        ftp_utils.download_ftp(
+            pool, "/f", str(tmp_path), progress_callback=callback
+        )
+    total = sum(p.stat().st_size for p in folder.iterdir())
+    assert calls[-1] == (total, total)
+
+
+def _write_nested_tree(root):
+    folder = _write_tree(root, files=3, size=200 * 1024)
+    (folder / "sub").mkdir()
+    (folder / "sub" / "deep.bin").write_bytes(os.urandom(70 * 1024))
+    (folder / "empty.bin").write_bytes(b"")
+    return folder
+
+
+def _same_nested_tree(left, right):
+    def files(root):
+        return {
+            p.relative_to(root).as_posix(): p.read_bytes()
+            for p in root.rglob("*")
+            if p.is_file()
+        }
+
+    assert files(left) == files(right)
+
+
+def test_relay_between_two_servers(served, tmp_path):
+    from ftp_loopback_server import LoopbackFTPServer
+
+    folder = _write_nested_tree(served)
+    target = tmp_path / "target"
+    target.mkdir()
+    with LoopbackFTPServer(served) as src, LoopbackFTPServer(target) as dst:
+        with ftp_utils.FTPConnectionPool(
+            *src.address, max_sessions=3
+        ) as src_pool, ftp_utils.FTPConnectionPool(
+            *dst.address, max_sessions=3
+        ) as dst_pool:
+            relayed = ftp_utils.relay_ftp(src_pool, dst_pool, "/f", "/")
+    _same_nested_tree(folder, target / "f")
+    assert relayed == sum(
+        p.stat().st_size for p in folder.rglob("*") if p.is_file()
+    )
+
+
+def test_relay_within_one_shared_pool(ftp_server, served):
+    folder = _write_nested_tree(served)
+    (served / "copy").mkdir()
+    pool = ftp_utils.FTPConnectionPool(
+        *ftp_server.address, max_sessions=2, acquire_timeout=30
+    )
+    errors = []
+
+    def relay():
+        try:
+            ftp_utils.relay_ftp(pool, pool, "/f", "/copy", workers=4)
+        except Exception as e:  # pylint: disable=broad-except
+            errors.append(e)
+
+    with pool:
+        thread = threading.Thread(target=relay)
+        thread.start()
+        thread.join(timeout=60)
+        assert not thread.is_alive(), "relay on one pool hung"
+    assert not errors
+    _same_nested_tree(folder, served / "copy" / "f")
+
+
+def test_relay_single_file(served, tmp_path):
+    from ftplib import FTP
+
+    from ftp_loopback_server import LoopbackFTPServer
+
+    folder = _write_tree(served, files=1, size=1024 * 1024 + 1)
+    target = tmp_path / "target"
+    target.mkdir()
+    with LoopbackFTPServer(served) as src, LoopbackFTPServer(target) as dst:
+        src_ftp, dst_ftp = FTP(), FTP()
+        src_ftp.connect(*src.address)
+        src_ftp.login()
+        dst_ftp.connect(*dst.address)
+        dst_ftp.login()
+        try:
+            size = ftp_utils.relay_ftp_file(
+                src_ftp, dst_ftp, "/f/file0.bin", "/copy.bin", queue_size=2
+            )
+        finally:
+            src_ftp.quit()
+            dst_ftp.quit()
+    assert size == 1024 * 1024 + 1
+    assert (target / "copy.bin").read_bytes() == (
+        folder / "file0.bin"
+    ).read_bytes()
+
+
+def _write_compressible(path, size):
+    line = b"timestamp,channel,value\n2024-06-01T12:00:00,3,0.125\n"
+    data = (line * (size // len(line) + 1))[:size]
+    path.write_bytes(data)
+    return data
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_mode_z_download(served, tmp_path, workers):
+    from ftp_loopback_server import LoopbackFTPServer
+
+    folder = served / "f"
+    folder.mkdir()
+    files = {
+        f"log{i}.csv": _write_compressible(folder / f"log{i}.csv", 2 << 20)
+        for i in range(3)
+    }
+    with LoopbackFTPServer(served, mode_z=True) as server:
+        with ftp_utils.FTPConnectionPool(*server.address) as pool:
+            ftp_utils.download_ftp(
+                pool, "/f", str(tmp_path), workers=workers, compress=True
+            )
+            ftp_utils.download_ftp(
+                pool, "/f/log0.csv", str(tmp_path), compress=True
+            )
+        stats = server.reset_stats()
+    assert stats["bytes_sent"] < sum(map(len, files.values())) // 10
+    for name, data in files.items():
+        assert (tmp_path / "f" / name).read_bytes() == data
+    assert (tmp_path / "log0.csv").read_bytes() == files["log0.csv"]
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_mode_z_upload(served, tmp_path, workers):
+    from ftp_loopback_server import LoopbackFTPServer
+
+    local = tmp_path / "up"
+    local.mkdir()
+    files = {
+        f"log{i}.csv": _write_compressible(local / f"log{i}.csv", 2 << 20)
+        for i in range(3)
+    }
+    with LoopbackFTPServer(served, mode_z=True) as server:
+        with ftp_utils.FTPConnectionPool(*server.address) as pool:
+            ftp_utils.upload_ftp(
+                pool, str(local), "/", workers=workers, compress=True
+            )
+        stats = server.reset_stats()
+    assert stats["bytes_received"] < sum(map(len, files.values())) // 10
+    for name, data in files.items():
+        assert (served / "up" / name).read_bytes() == data
+
+
+def test_mode_z_falls_back_to_stream_mode(ftp_server, served, tmp_path):
+    folder = served / "f"
+    folder.mkdir()
+    files = {
+        f"log{i}.csv": _write_compressible(folder / f"log{i}.csv", 1 << 20)
+        for i in range(3)
+    }
+    with ftp_utils.FTPConnectionPool(*ftp_server.address) as pool:
+        ftp_utils.download_ftp(pool, "/f", str(tmp_path), compress=True)
+    stats = ftp_server.reset_stats()
+    # Refused with 504 once, then the session stays in stream mode
+    assert stats["MODE"] == 1
+    assert stats["bytes_sent"] == sum(map(len, files.values()))
+    for name, data in files.items():
+        assert (tmp_path / "f" / name).read_bytes() == data
+
+
+@pytest.mark.parametrize("disabled", [(), ("MLSD",)])
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_filter_prunes_directories_before_listing(
+    served, disabled, concurrent
+):
+    from ftp_loopback_server import LoopbackFTPServer
+
+    root = served / "f"
+    for name in ("keep", "cache", "keep/cache", "keep/sub"):
+        (root / name).mkdir(parents=True)
+    for name in ("a.txt", "keep/b.txt", "keep/sub/c.txt"):
+        (root / name).write_bytes(b"data")
+    for i in range(5):
+        (root / "cache" / f"junk{i}").mkdir()
+        (root / "cache" / f"junk{i}" / "x.tmp").write_bytes(b"junk")
+    (root / "keep" / "cache" / "y.tmp").write_bytes(b"junk")
+
+    command = "LIST" if disabled else "MLSD"
+
+    def walk(server, pool, file_filter):
+        server.reset_stats()
+        if concurrent:
+            tree = ftp_utils.build_remote_tree_concurrent(
+                pool, "/f", 2, file_filter
+            )
+        else:
+            tree = ftp_utils.build_remote_tree(pool, "/f", file_filter)
+        return sorted(e.path for e in tree.files()), server.reset_stats()
+
+    with LoopbackFTPServer(served, disabled=disabled) as server:
+        with ftp_utils.FTPConnectionPool(
+            *server.address, max_sessions=2
+        ) as pool:
+            # Warm both sessions up, so no MLSD support probe is counted
+            walk(server, pool, None)
+            everything, stats = walk(server, pool, None)
+            assert stats.get(command, 0) == 10
+            selected, stats = walk(
+                server, pool, ftp_utils.RemoteFilter(exclude=("cache",))
+            )
+
+    # /f, keep and keep/sub: neither cache folder nor anything below
+    assert stats.get(command, 0) == 3
+    assert selected == ["/f/a.txt", "/f/keep/b.txt", "/f/keep/sub/c.txt"]
+    assert selected == [p for p in everything if "cache" not in p]
+
+
+class _June2024(datetime):
+    """Clock for LIST lines that omit the year."""
+
+    @classmethod
+    def now(cls, tz=None):
+        return datetime(2024, 6, 15, 9, 30, tzinfo=tz)
+
+
+@pytest.mark.parametrize(
+    "line, expected",
+    [
+        # Unix, recent: the year is inferred from the clock
+        (
+            "-rw-r--r--   1 owner group      4096 Jan 31 12:00 data.bin",
+            (
+                "data.bin",
+                {"type": "file", "size": "4096", "modify": "20240131120000"},
+            ),
+        ),
+        (
+            "-rw-r--r--   1 owner group         7 Dec 24 08:05 xmas.txt",
+            (
+                "xmas.txt",
+                {"type": "file", "size": "7", "modify": "20231224080500"},
+            ),
+        ),
+        (
+            "drwxr-xr-x   2 owner group      4096 Jun 16 23:59 tomorrow",
+            (
+                "tomorrow",
+                {"type": "dir", "modify": "20240616235900"},
+            ),
+        ),
+        (
+            "lrwxrwxrwx   1 owner group        11 Feb  3 10:00 latest -> v2",
+            (
+                "latest",
+                {"type": "link", "modify": "20240203100000"},
+            ),
+        ),
+        # Unix, older than six months: the year replaces the time
+        (
+            "-rw-r--r--   1 owner group      1234 Mar  5  2019 old file.txt",
+            (
+                "old file.txt",
+                {"type": "file", "size": "1234", "modify": "20190305000000"},
+            ),
+        ),
+        (
+            "-rw-r--r--   1 ftp           100 Nov 30  1999 no-group.bin",
+            (
+                "no-group.bin",
+                {"type": "file", "size": "100", "modify": "19991130000000"},
+            ),
+        ),
+        # DOS / IIS
+        (
+            "01-31-24  12:00PM       <DIR>          folder",
+            (
+                "folder",
+                {"type": "dir", "modify": "20240131120000"},
+            ),
+        ),
+        (
+            "06-01-98  12:15AM                 1234 file name.txt",
+            (
+                "file name.txt",
+                {"type": "file", "size": "1234", "modify": "19980601001500"},
+            ),
+        ),
+        (
+            "11-02-2023  07:45PM            5 four-digit.txt",
+            (
+                "four-digit.txt",
+                {"type": "file", "size": "5", "modify": "20231102194500"},
+            ),
+        ),
+        ("total 42", None),
+    ],
+)
+def test_parse_list_line(monkeypatch, line, expected):
+    monkeypatch.setattr(ftp_utils, "datetime", _June2024)
+    assert ftp_utils.parse_list_line(line) == expected
+
+
+def test_hash_failure_does_not_mask_transfer_error(
+    ftp_server, served, tmp_path
+):
+    _write_tree(served, files=1, size=1024 * 1024)
+    manifest = ftp_utils.TransferManifest(_BrokenHash, verify=False)
+    with ftp_utils.FTPConnectionPool(*ftp_server.address) as pool:
+        with pytest.raises(ConnectionResetError):
+            ftp_utils.download_ftp(
+                pool,
+                "/f/file0.bin",
+                str(tmp_path),
+                progress_callback=_Interrupt(1),
+                manifest=manifest,
+            )
+        # With the transfer intact the hashing error is reported
+        with pytest.raises(RuntimeError, match="hash failed"):
+            ftp_utils.download_ftp(
+                pool, "/f/file0.bin", str(tmp_path), manifest=manifest
+            )
+    assert not manifest.files
@@ -0,0 +1,302 @@
+import cmath
+import logging
+
+import numpy as np
+import pytest
+from numba import jit
+
+import pybaseline as pb
+from pybaseline_benchmark import synthetic_trace
+
+RSQD, SIGMA_XI2, CURRENT = 0.001, 0.1, 3.0
+
+# Reference implementation: the EM loop and its O(Nch^2) kernels as they
+# were before the optimisations, kept here so the tests never compare the
+# module with itself.
+
+
+@jit
+def reference_set_n2(d, background, current, T, Nch, sigma_xi2):
+    n = np.empty(T)
+    n2 = np.empty(T)
+    for t in range(T):
+        eta = np.empty(Nch + 1)
+        for j in range(Nch + 1):
+            eta[j] = (d[t] - background[t] - j * current) ** 2 / (
+                2 * sigma_xi2
+            )
+        sum_ = 0.0
+        sum_2 = 0.0
+        for j in range(Nch + 1):
+            denom = 0.0
+            for k in range(Nch + 1):
+                denom += np.exp(eta[j] - eta[k])
+            sum_ += j / denom
+            sum_2 += j * j / denom
+        n[t] = sum_
+        n2[t] = sum_2
+    return n, n2
+
+
+@jit
+def reference_solve(n, a, b, c, v, x):
+    for i in range(1, n):
+        m = a[i] / b[i - 1]
+        b[i] = b[i] - m * c[i - 1]
+        v[i] = v[i] - m * v[i - 1]
+    x[n - 1] = v[n - 1] / b[n - 1]
+    for i in range(n - 2, -1, -1):
+        x[i] = (v[i] - c[i] * x[i + 1]) / b[i]
+
+
+@jit
+def reference_lL(background, data, Rsqd, sigma_xi2, current, T, Nch):
+    retval = 0.0
+    sigma_b2 = Rsqd * sigma_xi2
+    for t in range(T):
+        if t:
+            retval += (background[t] - background[t - 1]) ** 2 / (
+                2 * sigma_b2
+            )
+        tmp = 0.0
+        for i in range(Nch + 1):
+            tmp += np.exp(
+                -((data[t] - background[t] - i * current) ** 2)
+                / (2 * sigma_xi2)
+            )
+        retval -= np.log(tmp)
+    retval += 0.5 * (T - 1) * np.log(sigma_xi2)
+    retval += (T - 1) * np.log(0.5 * (np.sqrt(Rsqd + 4) + np.sqrt(Rsqd)))
+    return retval
+
+
+def reference_Rsqd(BRsqd):
+    disc = -3 * (BRsqd - 108) * BRsqd * BRsqd
+    F = 18 * BRsqd + cmath.sqrt(disc)
+    Fnum = (3**0.33333333) * BRsqd + F**0.666666666666
+    Fdenom = (3**0.66666666) * (F**0.333333333)
+    return (Fnum / Fdenom).real
+
+
+def legacy_fit(data, Nch, updateR2, tol=1e-4):
+    """The pybaseline loop as it was before EMWorkspace."""
+    size = len(data)
+    background = 0.95 * data
+    current, Rsqd, sigma_xi2 = CURRENT, RSQD, SIGMA_XI2
+    logLold = 1.0e50
+    j = 0
+    while True:
+        j += 1
+        p, p2 = reference_set_n2(
+            data, background, current, size, Nch, sigma_xi2
+        )
+        rhs = -Rsqd * (data - current * p)
+        main = np.full(size, -Rsqd - 2.0)
+        main[0] = main[-1] = -Rsqd - 1
+        ones = np.ones(size)
+        reference_solve(size, ones, main, ones, rhs, background)
+
+        tmp = data - background
+        if j > 1 and np.sum(p2) > 0:
+            current = np.sum(p * tmp) / np.sum(p2)
+        D2 = (
+            np.sum(tmp * tmp)
+            - 2 * current * np.sum(tmp * p)
+            + current * current * np.sum(p2)
+        )
+        grad = np.sum((background[1:] - background[:-1]) ** 2)
+        if j > 1 and updateR2:
+            Rsqd = reference_Rsqd((grad / ((size - 1) * sigma_xi2)) ** 2)
+        sigma_xi2 = (grad / Rsqd + D2) / (size - 1)
+        logL = reference_lL(
+            background, data, Rsqd, sigma_xi2, current, size, Nch
+        )
+        if np.abs(logL - logLold) > tol:
+            logLold = logL
+        else:
+            return background, j, logL
+
+
+@pytest.mark.parametrize("Nch, updateR2", [(1, False), (2, True), (4, False)])
+def test_fit_baseline_matches_legacy_loop(Nch, updateR2):
+    data = synthetic_trace(5000, Nch, CURRENT, seed=Nch)
+    expected, iterations, logL = legacy_fit(data, Nch, updateR2)
+
+    background, stats = pb.fit_baseline(
+        data, RSQD, SIGMA_XI2, CURRENT, 1, updateR2, Nch
+    )
+    assert stats["converged"]
+    assert stats["iterations"] == iterations
+    assert stats["logL"] == pytest.approx(logL, rel=1e-9)
+    np.testing.assert_allclose(background, expected, rtol=0, atol=1e-9)
+
+
+def test_accelerated_fit_reaches_the_same_baseline():
+    data = synthetic_trace(5000, 2, CURRENT, seed=7)
+    plain, plain_stats = pb.fit_baseline(
+        data, RSQD, SIGMA_XI2, CURRENT, Nch=2, tol=1e-8
+    )
+    fast, fast_stats = pb.fit_baseline(
+        data, RSQD, SIGMA_XI2, CURRENT, Nch=2, tol=1e-8, accelerate=True
+    )
+    assert fast_stats["converged"]
+    assert fast_stats["logL"] == pytest.approx(plain_stats["logL"], rel=1e-6)
+    np.testing.assert_allclose(fast, plain, rtol=0, atol=1e-3)
+
+
+def test_batch_matches_serial_fits():
+    traces = [
+        synthetic_trace(size, Nch, CURRENT, seed=size)
+        for size, Nch in ((3000, 1), (4000, 2), (2500, 1), (3500, 3))
+    ]
+    Nch = [1, 2, 1, 3]
+    baselines, stats = pb.pybaseline_batch(
+        traces, RSQD, SIGMA_XI2, CURRENT, Nch=Nch, processes=2
+    )
+    assert len(baselines) == len(stats) == len(traces)
+    for trace, n, baseline, trace_stats in zip(traces, Nch, baselines, stats):
+        expected, expected_stats = pb.fit_baseline(
+            trace, RSQD, SIGMA_XI2, CURRENT, Nch=n
+        )
+        assert trace_stats["iterations"] == expected_stats["iterations"]
+        np.testing.assert_allclose(baseline, expected, rtol=0, atol=1e-9)
+
+
+def test_not_converged_is_reported_in_stats_only(caplog):
+    caplog.set_level(logging.DEBUG, logger="pybaseline")
+    data = synthetic_trace(2000, 1, CURRENT)
+    _, stats = pb.fit_baseline(data, RSQD, SIGMA_XI2, CURRENT, max_iter=2)
+    assert not stats["converged"]
+    assert stats["iterations"] == 2
+    assert all(record.levelno < logging.WARNING for record in caplog.records)
+    assert any(
+        isinstance(handler, logging.NullHandler)
+        for handler in logging.getLogger("pybaseline").handlers
+    )
+
+
+def seeded_fit(tracker, block, seed):
+    """One-shot fit of a block seeded the way BaselineTracker documents."""
+    background, stats = pb.fit_baseline(
+        block,
+        tracker.Rsqd,
+        tracker.sigma_xi2,
+        tracker.current,
+        tracker.multiplier,
+        tracker.updateR2,
+        tracker.Nch,
+        None if seed is None else np.full(len(block), seed),
+        tracker.max_iter,
+        tracker.tol,
+        tracker.accelerate,
+    )
+    return background
+
+
+def test_tracker_blocks_equal_to_window():
+    data = synthetic_trace(6000, 1, CURRENT, seed=3)
+    tracker = pb.BaselineTracker(RSQD, SIGMA_XI2, CURRENT, window=1500)
+    seed = None
+    for start in range(0, len(data), 1500):
+        block = data[start : start + 1500]
+        # Nothing of the window survives, the fit starts flat at the last
+        # baseline value
+        expected = seeded_fit(tracker, block, seed)
+        baseline = tracker.update(block)
+        assert np.all(np.isfinite(baseline))
+        np.testing.assert_allclose(baseline, expected, rtol=0, atol=1e-12)
+        seed = baseline[-1]
+    assert tracker.metrics()["blocks"] == 4
+
+
+def test_tracker_first_block_matches_one_shot_fit():
+    data = synthetic_trace(2000, 2, CURRENT, seed=5)
+    tracker = pb.BaselineTracker(
+        RSQD, SIGMA_XI2, CURRENT, window=5000, Nch=2, max_iter=10000
+    )
+    expected, _ = pb.fit_baseline(
+        data, RSQD, SIGMA_XI2, CURRENT, Nch=2, accelerate=True
+    )
+    np.testing.assert_allclose(
+        tracker.update(data), expected, rtol=0, atol=1e-12
+    )
+
+
+def test_tracker_splits_blocks_larger_than_window():
+    data = synthetic_trace(3500, 1, CURRENT, seed=4)
+    whole = pb.BaselineTracker(RSQD, SIGMA_XI2, CURRENT, window=1000)
+    pieces = pb.BaselineTracker(RSQD, SIGMA_XI2, CURRENT, window=1000)
+
+    baseline = whole.update(data)
+    expected = np.concatenate(
+        [pieces.update(data[i : i + 1000]) for i in range(0, 3500, 1000)]
+    )
+    assert len(baseline) == len(data)
+    assert np.all(np.isfinite(baseline))
+    np.testing.assert_array_equal(baseline, expected)
+    assert whole.metrics()["blocks"] == 4
+    assert whole.metrics()["not_converged"] == 0
+
+
+def test_non_finite_likelihood_is_not_converged():
+    data = synthetic_trace(2000, 1, CURRENT)
+    data[100] = np.nan
+    background, stats = pb.fit_baseline(data, RSQD, SIGMA_XI2, CURRENT)
+    assert not np.isfinite(stats["logL"])
+    assert not stats["converged"]
+    assert stats["iterations"] == 1
+
+
+@pytest.mark.parametrize("max_iter", [0, -1])
+def test_fit_baseline_rejects_max_iter_below_one(max_iter):
+    data = synthetic_trace(100, 1, CURRENT)
+    with pytest.raises(ValueError, match="max_iter"):
+        pb.fit_baseline(data, RSQD, SIGMA_XI2, CURRENT, max_iter=max_iter)
+
+
+def test_stream_matches_one_shot_fit():
+    data = synthetic_trace(20000, 1, CURRENT, seed=1)
+    expected = pb.pybaseline(data, RSQD, SIGMA_XI2, CURRENT)
+    streamed = np.concatenate(
+        list(
+            pb.pybaseline_stream(
+                data, RSQD, SIGMA_XI2, CURRENT, window=6000, overlap=1000
+            )
+        )
+    )
+    # The same signal fed as uneven chunks
+    chunks = np.split(data, [1234, 5000, 5001, 13000])
+    chunked = np.concatenate(
+        list(
+            pb.pybaseline_stream(
+                iter(chunks),
+                RSQD,
+                SIGMA_XI2,
+                CURRENT,
+                window=6000,
+                overlap=1000,
+            )
+        )
+    )
+    assert len(streamed) == len(data)
+    # Cross-fading the seams leaves only small differences with one fit
+    np.testing.assert_allclose(streamed, expected, rtol=0, atol=0.01)
+    np.testing.assert_array_equal(chunked, streamed)
+
+
+@pytest.mark.parametrize(
+    "size, overlap", [(12001, 0), (12002, 0), (12500, 1000)]
+)
+def test_stream_merges_short_tail(size, overlap):
+    data = synthetic_trace(size, 1, CURRENT, seed=2)
+    streamed = np.concatenate(
+        list(
+            pb.pybaseline_stream(
+                data, RSQD, SIGMA_XI2, CURRENT, window=4000, overlap=overlap
+            )
+        )
+    )
+    assert len(streamed) == size
+    assert np.all(np.isfinite(streamed))
+    expected = pb.pybaseline(data, RSQD, SIGMA_XI2, CURRENT)
+    np.testing.assert_allclose(streamed, expected, rtol=0, atol=0.2)